@@ -4,1815 +4,2035 @@ GCC Intelligence Dashboard - Multi-tab comprehensive analysis
 Focus on buyer intelligence with accurate data from mirror imports
 """
 
-from fastapi import FastAPI, Query
-from fastapi.responses import HTMLResponse
+# Imported first so the import phase of startup can be timed
+import time
+_import_started = time.perf_counter()
+
+from fastapi import Body, FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from typing import List, Optional
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+import asyncio
+import contextvars
+import functools
+import gzip
+import hashlib
+import inspect
+import itertools
+import os
+import shutil
 import sqlite3
 import json
-from datetime import datetime
-import pandas as pd
-import numpy as np
+import tempfile
+import threading
+import uuid
+import zlib
+from datetime import datetime, date, timedelta
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Falls back to the standard library encoder
 
 app = FastAPI(title="GCC Intelligence Dashboard")
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+
+# Hashed asset URLs change whenever the content does, so they can be cached forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ASSET_HASH_LENGTH = 12
+
+@functools.lru_cache(maxsize=None)
+def asset_hash(relpath):
+    """Short content hash of a file under static/"""
+    with open(os.path.join(STATIC_DIR, relpath), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:ASSET_HASH_LENGTH]
+
+def asset_url(relpath):
+    """'css/dashboard.css' -> '/static/css/dashboard.<hash>.css'"""
+    root, ext = os.path.splitext(relpath)
+    return f"/static/{root}.{asset_hash(relpath)}{ext}"
+
+def unhashed_asset_path(path):
+    """Map a hashed asset path back to the file on disk, None if it isn't a current hashed name"""
+    root, ext = os.path.splitext(path.replace(os.sep, '/'))
+    root, dot, digest = root.rpartition('.')
+    if not dot or len(digest) != ASSET_HASH_LENGTH:
+        return None
+    try:
+        return root + ext if asset_hash(root + ext) == digest else None
+    except OSError:
+        return None
+
+class HashedStaticFiles(StaticFiles):
+    """Static files that also answer to content-hashed names with immutable cache headers"""
+
+    async def get_response(self, path, scope):
+        original = unhashed_asset_path(path)
+        response = await super().get_response(original or path, scope)
+        if original and response.status_code == 200:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+@functools.lru_cache(maxsize=None)
+def get_templates():
+    """Jinja2 environment, created on first page view"""
+    from fastapi.templating import Jinja2Templates
+    templates = Jinja2Templates(directory=TEMPLATES_DIR)
+    templates.env.globals["asset_url"] = asset_url
+    return templates
+
 # Mount static files
 try:
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    app.mount("/static", HashedStaticFiles(directory=STATIC_DIR), name="static")
 except:
     pass  # Static directory might not exist
 
-def get_db_connection():
-    """Get database connection"""
-    import os
+def get_db_path():
+    """Resolve the database file"""
     # Use local database file (in same directory for deployment)
     if os.path.exists('gcc_mirror_intelligence.db'):
-        conn = sqlite3.connect('gcc_mirror_intelligence.db')
-    else:
-        conn = sqlite3.connect('../artis-intelligence/gcc_mirror_intelligence.db')
+        return 'gcc_mirror_intelligence.db'
+    return '../artis-intelligence/gcc_mirror_intelligence.db'
+
+def get_db_connection(interruptible=True):
+    """Get database connection, bound to the current request's query budget if there is one"""
+    conn = sqlite3.connect(get_db_path())
     conn.row_factory = sqlite3.Row
+    budget = current_query_budget.get()
+    if interruptible and budget is not None:
+        budget.attach(conn)
     return conn
 
-@app.get("/", response_class=HTMLResponse)
-async def dashboard():
-    """Serve the multi-tab dashboard"""
-    return """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Artis Laminates - GCC Market Intelligence</title>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body { 
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Arial, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-        
-        .header {
-            background: white;
-            padding: 20px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }
-        
-        .header h1 {
-            color: #333;
-            font-size: 28px;
-            margin-bottom: 10px;
-        }
-        
-        /* Compact Filter Bar */
-        .filter-bar {
-            background: white;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            position: sticky;
-            top: 0;
-            z-index: 100;
-            transition: all 0.3s ease;
-        }
-        
-        .filter-bar-inner {
-            display: flex;
-            align-items: center;
-            gap: 12px;
-            padding: 12px 20px;
-            overflow-x: auto;
-        }
-        
-        .filter-bar-inner::-webkit-scrollbar {
-            height: 4px;
-        }
-        
-        .filter-bar-inner::-webkit-scrollbar-thumb {
-            background: #ddd;
-            border-radius: 2px;
-        }
-        
-        .filter-chip {
-            display: inline-flex;
-            align-items: center;
-            gap: 6px;
-            padding: 8px 14px;
-            background: #f0f4ff;
-            border: 1px solid #d4e0ff;
-            border-radius: 20px;
-            cursor: pointer;
-            white-space: nowrap;
-            font-size: 14px;
-            font-weight: 500;
-            color: #333;
-            transition: all 0.2s ease;
-            position: relative;
-        }
-        
-        .filter-chip:hover {
-            background: #e8efff;
-            border-color: #667eea;
-            transform: translateY(-1px);
-        }
-        
-        .filter-chip.active {
-            background: #667eea;
-            color: white;
-            border-color: #667eea;
-        }
-        
-        .filter-chip .icon {
-            font-size: 16px;
-        }
-        
-        .filter-chip .value {
-            color: #667eea;
-            font-weight: 600;
-        }
-        
-        .filter-chip.active .value {
-            color: white;
-        }
-        
-        .filter-chip .arrow {
-            font-size: 10px;
-            opacity: 0.6;
-        }
-        
-        /* Filter Dropdown Panel */
-        .filter-dropdown {
-            display: none;
-            position: absolute;
-            top: calc(100% + 8px);
-            left: 20px;
-            right: 20px;
-            background: white;
-            border-radius: 12px;
-            box-shadow: 0 10px 40px rgba(0,0,0,0.15);
-            z-index: 1000;
-            max-height: 0;
-            overflow: hidden;
-            transition: max-height 0.3s ease, opacity 0.3s ease;
-            opacity: 0;
-        }
-        
-        .filter-dropdown.active {
-            display: block;
-            max-height: 500px;
-            opacity: 1;
-        }
-        
-        .filter-dropdown-inner {
-            padding: 20px;
-            max-height: 450px;
-            overflow-y: auto;
-        }
-        
-        .filter-dropdown-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 15px;
-            padding-bottom: 15px;
-            border-bottom: 1px solid #eee;
-        }
-        
-        .filter-dropdown-title {
-            font-size: 16px;
-            font-weight: 600;
-            color: #333;
-        }
-        
-        .filter-dropdown-close {
-            width: 28px;
-            height: 28px;
-            border-radius: 50%;
-            background: #f5f5f5;
-            border: none;
-            cursor: pointer;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            transition: all 0.2s ease;
-        }
-        
-        .filter-dropdown-close:hover {
-            background: #e0e0e0;
-        }
-        
-        .filter-dropdown-content {
-            display: grid;
-            gap: 12px;
-        }
-        
-        .filter-overlay {
-            display: none;
-            position: fixed;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: rgba(0,0,0,0.3);
-            z-index: 99;
-        }
-        
-        .filter-overlay.active {
-            display: block;
-        }
-        
-        /* Apply Button in Bar */
-        .filter-apply-btn {
-            padding: 8px 24px;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border: none;
-            border-radius: 20px;
-            font-weight: 600;
-            font-size: 14px;
-            cursor: pointer;
-            transition: all 0.2s ease;
-            margin-left: auto;
-        }
-        
-        .filter-apply-btn:hover {
-            transform: translateY(-1px);
-            box-shadow: 0 4px 12px rgba(102,126,234,0.3);
-        }
-        
-        /* Compact Checkbox List */
-        .compact-checkbox-list {
-            display: grid;
-            grid-template-columns: repeat(2, 1fr);
-            gap: 8px;
-        }
-        
-        .compact-checkbox-item {
-            display: flex;
-            align-items: center;
-            padding: 6px;
-            border-radius: 6px;
-            cursor: pointer;
-            transition: background 0.2s ease;
-        }
-        
-        .compact-checkbox-item:hover {
-            background: #f5f7ff;
-        }
-        
-        .compact-checkbox-item input {
-            width: 18px;
-            height: 18px;
-            margin-right: 8px;
-            cursor: pointer;
-            accent-color: #667eea;
-        }
-        
-        .compact-checkbox-item label {
-            cursor: pointer;
-            font-size: 14px;
-            user-select: none;
-        }
-        
-        /* Compact Select */
-        .compact-select {
-            width: 100%;
-            padding: 10px;
-            border: 1px solid #e0e0e0;
-            border-radius: 8px;
-            font-size: 14px;
-            background: white;
-            cursor: pointer;
-        }
-        
-        .compact-select:focus {
-            outline: none;
-            border-color: #667eea;
-        }
-        
-        /* Compact Input */
-        .compact-input {
-            width: 100%;
-            padding: 10px;
-            border: 1px solid #e0e0e0;
-            border-radius: 8px;
-            font-size: 14px;
-        }
-        
-        .compact-input:focus {
-            outline: none;
-            border-color: #667eea;
-        }
-        
-        .tabs {
-            display: flex;
-            background: white;
-            margin: 0 20px;
-            border-radius: 10px 10px 0 0;
-            overflow: hidden;
-        }
-        
-        .tab {
-            flex: 1;
-            padding: 15px;
-            text-align: center;
-            cursor: pointer;
-            background: #f8f9fa;
-            border: none;
-            font-size: 14px;
-            font-weight: 600;
-            color: #666;
-            transition: all 0.3s;
-        }
-        
-        .tab.active {
-            background: white;
-            color: #667eea;
-            border-bottom: 3px solid #667eea;
-        }
-        
-        .tab:hover {
-            background: #e9ecef;
-        }
-        
-        .content {
-            background: white;
-            margin: 0 20px 20px;
-            padding: 20px;
-            border-radius: 0 0 10px 10px;
-            min-height: 500px;
-        }
-        
-        .tab-content {
-            display: none;
-            overflow-x: auto;
-        }
-        
-        .tab-content.active {
-            display: block;
-        }
-        
-        .stats-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 20px;
-            margin-bottom: 30px;
-        }
-        
-        .stat-card {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            padding: 20px;
-            border-radius: 10px;
-            color: white;
-        }
-        
-        .stat-value {
-            font-size: 32px;
-            font-weight: bold;
-            margin: 10px 0;
-        }
-        
-        .stat-label {
-            font-size: 14px;
-            opacity: 0.9;
-        }
-        
-        .table-container {
-            overflow-x: auto;
-            margin: 20px 0;
-            max-width: 100%;
-        }
-        
-        table {
-            width: 100%;
-            border-collapse: collapse;
-            table-layout: auto;
-        }
-        
-        th {
-            background: #f8f9fa;
-            padding: 12px;
-            text-align: left;
-            font-weight: 600;
-            color: #333;
-            border-bottom: 2px solid #dee2e6;
-        }
-        
-        td {
-            padding: 12px;
-            border-bottom: 1px solid #dee2e6;
-            max-width: 300px;
-            overflow: hidden;
-            text-overflow: ellipsis;
-            white-space: nowrap;
-        }
-        
-        td:hover {
-            white-space: normal;
-            word-wrap: break-word;
-        }
-        
-        tr:hover {
-            background: #f8f9fa;
-        }
-        
-        .chart-container {
-            background: white;
-            padding: 20px;
-            border-radius: 10px;
-            margin: 20px 0;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-            position: relative;
-            height: 400px;
-        }
-        
-        .chart-container canvas {
-            max-height: 350px !important;
-        }
-        
-        .loading {
-            text-align: center;
-            padding: 50px;
-            color: #666;
-        }
-        
-        /* Mobile Responsive */
-        @media (max-width: 768px) {
-            .filter-bar-inner {
-                padding: 10px;
-            }
-            
-            .filter-chip {
-                font-size: 13px;
-                padding: 6px 12px;
-            }
-            
-            .compact-checkbox-list {
-                grid-template-columns: 1fr;
-            }
-            
-            .filter-dropdown {
-                left: 10px;
-                right: 10px;
-            }
-        }
-        
-        .buyer-card {
-            background: #f8f9fa;
-            padding: 15px;
-            border-radius: 8px;
-            margin-bottom: 15px;
-            border-left: 4px solid #667eea;
-        }
-        
-        .buyer-name {
-            font-size: 18px;
-            font-weight: 600;
-            color: #333;
-            margin-bottom: 10px;
-        }
-        
-        .buyer-details {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
-            gap: 10px;
-            font-size: 14px;
-        }
-        
-        .buyer-stat {
-            display: flex;
-            flex-direction: column;
-        }
-        
-        .buyer-stat-label {
-            color: #666;
-            font-size: 12px;
-        }
-        
-        .buyer-stat-value {
-            font-weight: 600;
-            color: #333;
-        }
-        
-        .highlight {
-            background: #fff3cd;
-            padding: 2px 5px;
-            border-radius: 3px;
-        }
-        
-        .single-side-buyer {
-            border-left-color: #28a745;
-        }
-        
-        .double-side-buyer {
-            border-left-color: #dc3545;
-        }
-        
-        .mixed-buyer {
-            border-left-color: #ffc107;
-        }
-    </style>
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
-</head>
-<body>
-    <div class="header" style="background: linear-gradient(135deg, #f8f9fa 0%, #ffffff 100%); padding: 25px; border-bottom: 3px solid #FFD700;">
-        <div style="display: flex; align-items: center; justify-content: space-between; max-width: 1400px; margin: 0 auto;">
-            <div style="display: flex; align-items: center; gap: 25px;">
-                <!-- Actual Artis Logo -->
-                <div style="background: white; padding: 5px; border-radius: 8px;">
-                    <img src="/static/artis_logo.png" 
-                         alt="Artis Logo" 
-                         style="width: 60px; height: auto; object-fit: contain; filter: none;" />
-                </div>
-                <div>
-                    <h1 style="color: #2c3e50; font-size: 32px; font-weight: 700; margin: 0; font-family: 'Segoe UI', Tahoma, sans-serif;">ARTIS LAMINATES</h1>
-                    <h2 style="color: #7f8c8d; font-size: 16px; font-weight: 400; margin: 5px 0;">GCC Market Intelligence Platform</h2>
-                </div>
-            </div>
-            <div style="text-align: right;">
-                <p style="color: #95a5a6; font-size: 12px; margin: 0;">Data Period: Jan 2023 - Jul 2025</p>
-                <p style="color: #27ae60; font-size: 14px; font-weight: 600; margin: 5px 0;">23,575 Import Records</p>
-                <p style="color: #3498db; font-size: 12px; margin: 0;">Last Updated: Aug 2025</p>
-            </div>
-        </div>
-    </div>
-    
-    <!-- Compact Filter Bar -->
-    <div class="filter-bar">
-        <div class="filter-bar-inner">
-            <div class="filter-chip" onclick="toggleFilterDropdown('countries')" id="countriesChip">
-                <span class="icon">🌍</span>
-                <span class="label">Countries:</span>
-                <span class="value" id="countriesValue">All</span>
-                <span class="arrow">▼</span>
-            </div>
-            
-            <div class="filter-chip" onclick="toggleFilterDropdown('product')" id="productChip">
-                <span class="icon">📦</span>
-                <span class="label">Type:</span>
-                <span class="value" id="productValue">All</span>
-                <span class="arrow">▼</span>
-            </div>
-            
-            <div class="filter-chip" onclick="toggleFilterDropdown('size')" id="sizeChip">
-                <span class="icon">📐</span>
-                <span class="label">Size:</span>
-                <span class="value" id="sizeValue">All</span>
-                <span class="arrow">▼</span>
-            </div>
-            
-            <div class="filter-chip" onclick="toggleFilterDropdown('thickness')" id="thicknessChip">
-                <span class="icon">📏</span>
-                <span class="label">Thickness:</span>
-                <span class="value" id="thicknessValue">All</span>
-                <span class="arrow">▼</span>
-            </div>
-            
-            <div class="filter-chip" onclick="toggleFilterDropdown('value')" id="valueChip">
-                <span class="icon">💰</span>
-                <span class="label">Min Value:</span>
-                <span class="value" id="valueValue">$0</span>
-                <span class="arrow">▼</span>
-            </div>
-            
-            <div class="filter-chip" onclick="toggleFilterDropdown('date')" id="dateChip">
-                <span class="icon">📅</span>
-                <span class="label">Date:</span>
-                <span class="value" id="dateValue">All Time</span>
-                <span class="arrow">▼</span>
-            </div>
-            
-            <button class="filter-apply-btn" onclick="applyFilters()">
-                Apply Filters
-            </button>
-            <button class="filter-apply-btn" style="background: #27ae60; margin-left: 10px;" onclick="exportToExcel()">
-                📊 Export to Excel
-            </button>
-        </div>
-        
-        <!-- Filter Dropdowns -->
-        <div class="filter-dropdown" id="countriesDropdown">
-            <div class="filter-dropdown-inner">
-                <div class="filter-dropdown-header">
-                    <div class="filter-dropdown-title">Select Countries</div>
-                    <button class="filter-dropdown-close" onclick="closeFilterDropdown('countries')">✕</button>
-                </div>
-                <div class="filter-dropdown-content">
-                    <div style="margin-bottom: 12px;">
-                        <label style="display: flex; align-items: center; font-weight: 600;">
-                            <input type="checkbox" id="selectAll" checked style="margin-right: 8px;">
-                            Select All Countries
-                        </label>
-                    </div>
-                    <div class="compact-checkbox-list" id="countryCheckboxes">
-                        <div class="compact-checkbox-item">
-                            <input type="checkbox" value="SAUDI ARABIA" checked id="country_sa">
-                            <label for="country_sa">🇸🇦 Saudi Arabia</label>
-                        </div>
-                        <div class="compact-checkbox-item">
-                            <input type="checkbox" value="UNITED ARAB EMIRATES" checked id="country_uae">
-                            <label for="country_uae">🇦🇪 UAE</label>
-                        </div>
-                        <div class="compact-checkbox-item">
-                            <input type="checkbox" value="QATAR" checked id="country_qa">
-                            <label for="country_qa">🇶🇦 Qatar</label>
-                        </div>
-                        <div class="compact-checkbox-item">
-                            <input type="checkbox" value="KUWAIT" checked id="country_kw">
-                            <label for="country_kw">🇰🇼 Kuwait</label>
-                        </div>
-                        <div class="compact-checkbox-item">
-                            <input type="checkbox" value="OMAN" checked id="country_om">
-                            <label for="country_om">🇴🇲 Oman</label>
-                        </div>
-                        <div class="compact-checkbox-item">
-                            <input type="checkbox" value="BAHRAIN" checked id="country_bh">
-                            <label for="country_bh">🇧🇭 Bahrain</label>
-                        </div>
-                        <div class="compact-checkbox-item">
-                            <input type="checkbox" value="JORDAN" checked id="country_jo">
-                            <label for="country_jo">🇯🇴 Jordan</label>
-                        </div>
-                        <div class="compact-checkbox-item">
-                            <input type="checkbox" value="EGYPT" checked id="country_eg">
-                            <label for="country_eg">🇪🇬 Egypt</label>
-                        </div>
-                        <div class="compact-checkbox-item">
-                            <input type="checkbox" value="ISRAEL" checked id="country_il">
-                            <label for="country_il">🇮🇱 Israel</label>
-                        </div>
-                    </div>
-                </div>
-            </div>
-        </div>
-        
-        <div class="filter-dropdown" id="productDropdown">
-            <div class="filter-dropdown-inner">
-                <div class="filter-dropdown-header">
-                    <div class="filter-dropdown-title">Product Type</div>
-                    <button class="filter-dropdown-close" onclick="closeFilterDropdown('product')">✕</button>
-                </div>
-                <div class="filter-dropdown-content">
-                    <div style="display: flex; flex-direction: column; gap: 8px;">
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="productType" value="all" checked style="margin-right: 10px; cursor: pointer;" onchange="setProductType('all')">
-                            <span style="font-size: 14px;">All Types</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="productType" value="SINGLE_SIDE" style="margin-right: 10px; cursor: pointer;" onchange="setProductType('SINGLE_SIDE')">
-                            <span style="font-size: 14px; color: #28a745;">✓ Single Side (Artis Compatible)</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="productType" value="DOUBLE_SIDE" style="margin-right: 10px; cursor: pointer;" onchange="setProductType('DOUBLE_SIDE')">
-                            <span style="font-size: 14px;">Double Side</span>
-                        </label>
-                    </div>
-                    <input type="hidden" id="productType" value="all">
-                </div>
-            </div>
-        </div>
-        
-        <div class="filter-dropdown" id="sizeDropdown">
-            <div class="filter-dropdown-inner">
-                <div class="filter-dropdown-header">
-                    <div class="filter-dropdown-title">Size</div>
-                    <button class="filter-dropdown-close" onclick="closeFilterDropdown('size')">✕</button>
-                </div>
-                <div class="filter-dropdown-content">
-                    <div style="display: flex; flex-direction: column; gap: 8px;">
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="sizeFilter" value="all" checked style="margin-right: 10px; cursor: pointer;" onchange="setSize('all')">
-                            <span style="font-size: 14px;">All Sizes</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="sizeFilter" value="1220x2440" style="margin-right: 10px; cursor: pointer;" onchange="setSize('1220x2440')">
-                            <span style="font-size: 14px; color: #28a745;">✓ 1220x2440 (Artis Standard)</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="sizeFilter" value="2440x1220" style="margin-right: 10px; cursor: pointer;" onchange="setSize('2440x1220')">
-                            <span style="font-size: 14px;">2440x1220</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="sizeFilter" value="other" style="margin-right: 10px; cursor: pointer;" onchange="setSize('other')">
-                            <span style="font-size: 14px;">Other Sizes</span>
-                        </label>
-                    </div>
-                    <input type="hidden" id="size" value="all">
-                </div>
-            </div>
-        </div>
-        
-        <div class="filter-dropdown" id="thicknessDropdown">
-            <div class="filter-dropdown-inner">
-                <div class="filter-dropdown-header">
-                    <div class="filter-dropdown-title">Thickness</div>
-                    <button class="filter-dropdown-close" onclick="closeFilterDropdown('thickness')">✕</button>
-                </div>
-                <div class="filter-dropdown-content">
-                    <div style="display: flex; flex-direction: column; gap: 8px;">
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="thicknessFilter" value="all" checked style="margin-right: 10px; cursor: pointer;" onchange="setThickness('all')">
-                            <span style="font-size: 14px;">All Thickness</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="thicknessFilter" value="0.7" style="margin-right: 10px; cursor: pointer;" onchange="setThickness('0.7')">
-                            <span style="font-size: 14px; color: #28a745;">✓ 0.7mm (Artis)</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="thicknessFilter" value="0.8" style="margin-right: 10px; cursor: pointer;" onchange="setThickness('0.8')">
-                            <span style="font-size: 14px; color: #28a745;">✓ 0.8mm (Artis)</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="thicknessFilter" value="1.0" style="margin-right: 10px; cursor: pointer;" onchange="setThickness('1.0')">
-                            <span style="font-size: 14px; color: #28a745;">✓ 1.0mm (Artis)</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="thicknessFilter" value="other" style="margin-right: 10px; cursor: pointer;" onchange="setThickness('other')">
-                            <span style="font-size: 14px;">Other</span>
-                        </label>
-                    </div>
-                    <input type="hidden" id="thickness" value="all">
-                </div>
-            </div>
-        </div>
-        
-        <div class="filter-dropdown" id="valueDropdown">
-            <div class="filter-dropdown-inner">
-                <div class="filter-dropdown-header">
-                    <div class="filter-dropdown-title">Minimum Order Value</div>
-                    <button class="filter-dropdown-close" onclick="closeFilterDropdown('value')">✕</button>
-                </div>
-                <div class="filter-dropdown-content">
-                    <input type="number" id="minValue" class="compact-input" value="0" min="0" placeholder="Enter minimum value in USD..." onchange="updateFilterChip('value')">
-                </div>
-            </div>
-        </div>
-        
-        <div class="filter-dropdown" id="dateDropdown">
-            <div class="filter-dropdown-inner">
-                <div class="filter-dropdown-header">
-                    <div class="filter-dropdown-title">Date Range</div>
-                    <button class="filter-dropdown-close" onclick="closeFilterDropdown('date')">✕</button>
-                </div>
-                <div class="filter-dropdown-content">
-                    <div style="display: flex; flex-direction: column; gap: 8px;">
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="dateFilter" value="all" checked style="margin-right: 10px; cursor: pointer;" onchange="setDateRange('all')">
-                            <span style="font-size: 14px;">All Time (Jan 2023 - Jul 2025)</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="dateFilter" value="2025" style="margin-right: 10px; cursor: pointer;" onchange="setDateRange('2025')">
-                            <span style="font-size: 14px;">2025 Only</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="dateFilter" value="2024" style="margin-right: 10px; cursor: pointer;" onchange="setDateRange('2024')">
-                            <span style="font-size: 14px;">2024 Only</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="dateFilter" value="2023" style="margin-right: 10px; cursor: pointer;" onchange="setDateRange('2023')">
-                            <span style="font-size: 14px;">2023 Only</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="dateFilter" value="recent" style="margin-right: 10px; cursor: pointer;" onchange="setDateRange('recent')">
-                            <span style="font-size: 14px;">Last 12 Months</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="dateFilter" value="last6" style="margin-right: 10px; cursor: pointer;" onchange="setDateRange('last6')">
-                            <span style="font-size: 14px;">Last 6 Months</span>
-                        </label>
-                        <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                            <input type="radio" name="dateFilter" value="last3" style="margin-right: 10px; cursor: pointer;" onchange="setDateRange('last3')">
-                            <span style="font-size: 14px;">Last 3 Months</span>
-                        </label>
-                        <div>
-                            <label style="display: flex; align-items: center; padding: 10px; border-radius: 8px; cursor: pointer; background: #f8f9fa; transition: all 0.2s;">
-                                <input type="radio" name="dateFilter" value="custom" style="margin-right: 10px; cursor: pointer;" onchange="setDateRange('custom')">
-                                <span style="font-size: 14px;">Custom Range</span>
-                            </label>
-                            <div id="customDatePickers" style="padding: 10px; background: #f0f4f8; border-radius: 8px; margin-top: 8px;">
-                                <div style="display: flex; gap: 10px; align-items: center;">
-                                    <div style="flex: 1;">
-                                        <label style="font-size: 12px; color: #666; display: block; margin-bottom: 4px;">From:</label>
-                                        <input type="date" id="customStartDate" style="width: 100%; padding: 8px; border: 1px solid #ddd; border-radius: 4px;" onchange="updateCustomDateRange()">
-                                    </div>
-                                    <div style="flex: 1;">
-                                        <label style="font-size: 12px; color: #666; display: block; margin-bottom: 4px;">To:</label>
-                                        <input type="date" id="customEndDate" style="width: 100%; padding: 8px; border: 1px solid #ddd; border-radius: 4px;" onchange="updateCustomDateRange()">
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-                    </div>
-                    <input type="hidden" id="dateRange" value="all">
-                    <input type="hidden" id="customStart" value="">
-                    <input type="hidden" id="customEnd" value="">
-                </div>
-            </div>
-        </div>
-    </div>
-    
-    <!-- Overlay for dropdowns -->
-    <div class="filter-overlay" id="filterOverlay" onclick="closeAllDropdowns()"></div>
-    
-    <div class="tabs">
-        <button class="tab active" onclick="showTab('overview')">📊 Overview</button>
-        <button class="tab" onclick="showTab('buyers')">👥 Buyer Intelligence</button>
-        <button class="tab" onclick="showTab('products')">📦 Product Analysis</button>
-        <button class="tab" onclick="showTab('competitors')">🏢 Competitors</button>
-        <button class="tab" onclick="showTab('pricing')">💰 Pricing</button>
-        <button class="tab" onclick="showTab('insights')">💡 Key Insights</button>
-    </div>
-    
-    <div class="content">
-        <!-- Overview Tab -->
-        <div id="overview" class="tab-content active">
-            <div class="loading">Loading overview data...</div>
-        </div>
-        
-        <!-- Buyer Intelligence Tab -->
-        <div id="buyers" class="tab-content">
-            <div class="loading">Loading buyer intelligence...</div>
-        </div>
-        
-        <!-- Product Analysis Tab -->
-        <div id="products" class="tab-content">
-            <div class="loading">Loading product analysis...</div>
-        </div>
-        
-        <!-- Competitors Tab -->
-        <div id="competitors" class="tab-content">
-            <div class="loading">Loading competitor data...</div>
-        </div>
-        
-        <!-- Pricing Tab -->
-        <div id="pricing" class="tab-content">
-            <div class="loading">Loading pricing analysis...</div>
-        </div>
-        
-        <!-- Insights Tab -->
-        <div id="insights" class="tab-content">
-            <div class="loading">Loading key insights...</div>
-        </div>
-    </div>
-    
-    <script>
-        let currentTab = 'overview';
-        let currentFilters = {};
-        let activeDropdown = null;
-        
-        function showTab(tabName) {
-            // Update tabs
-            document.querySelectorAll('.tab').forEach(tab => tab.classList.remove('active'));
-            document.querySelectorAll('.tab-content').forEach(content => content.classList.remove('active'));
-            
-            event.target.classList.add('active');
-            document.getElementById(tabName).classList.add('active');
-            
-            currentTab = tabName;
-            loadTabData(tabName);
-        }
-        
-        function toggleFilterDropdown(filterName) {
-            const dropdown = document.getElementById(filterName + 'Dropdown');
-            const overlay = document.getElementById('filterOverlay');
-            
-            if (activeDropdown && activeDropdown !== dropdown) {
-                activeDropdown.classList.remove('active');
-            }
-            
-            dropdown.classList.toggle('active');
-            overlay.classList.toggle('active', dropdown.classList.contains('active'));
-            
-            activeDropdown = dropdown.classList.contains('active') ? dropdown : null;
-        }
-        
-        function closeFilterDropdown(filterName) {
-            const dropdown = document.getElementById(filterName + 'Dropdown');
-            const overlay = document.getElementById('filterOverlay');
-            dropdown.classList.remove('active');
-            overlay.classList.remove('active');
-            activeDropdown = null;
-        }
-        
-        function closeAllDropdowns() {
-            document.querySelectorAll('.filter-dropdown').forEach(dropdown => {
-                dropdown.classList.remove('active');
-            });
-            document.getElementById('filterOverlay').classList.remove('active');
-            activeDropdown = null;
-        }
-        
-        function setProductType(value) {
-            document.getElementById('productType').value = value;
-            updateFilterChip('product');
-            closeFilterDropdown('product');
-        }
-        
-        function setSize(value) {
-            document.getElementById('size').value = value;
-            updateFilterChip('size');
-            closeFilterDropdown('size');
-        }
-        
-        function setThickness(value) {
-            document.getElementById('thickness').value = value;
-            updateFilterChip('thickness');
-            closeFilterDropdown('thickness');
-        }
-        
-        function setDateRange(value) {
-            document.getElementById('dateRange').value = value;
-            
-            // Show/hide custom date pickers
-            const customPickers = document.getElementById('customDatePickers');
-            if (value === 'custom') {
-                customPickers.style.display = 'block';
-                // Keep dropdown open for custom option
-                return;
-            } else {
-                customPickers.style.display = 'none';
-                updateFilterChip('date');
-                closeFilterDropdown('date');
-            }
-        }
-        
-        function updateCustomDateRange() {
-            const startDate = document.getElementById('customStartDate').value;
-            const endDate = document.getElementById('customEndDate').value;
-            
-            if (startDate && endDate) {
-                document.getElementById('customStart').value = startDate;
-                document.getElementById('customEnd').value = endDate;
-                updateFilterChip('date');
-                // Optionally close dropdown after both dates are selected
-                setTimeout(() => closeFilterDropdown('date'), 500);
-            }
-        }
-        
-        function updateFilterChip(filterName) {
-            const chipValue = document.getElementById(filterName + 'Value');
-            const chip = document.getElementById(filterName + 'Chip');
-            
-            if (filterName === 'countries') {
-                const checked = document.querySelectorAll('#countryCheckboxes input:checked').length;
-                const total = document.querySelectorAll('#countryCheckboxes input').length;
-                chipValue.textContent = checked === total ? 'All' : `${checked} selected`;
-                chip.classList.toggle('active', checked < total);
-            } else if (filterName === 'product') {
-                const value = document.getElementById('productType').value;
-                chipValue.textContent = value === 'all' ? 'All' : 
-                    value === 'SINGLE_SIDE' ? 'Single' : 'Double';
-                chip.classList.toggle('active', value !== 'all');
-            } else if (filterName === 'size') {
-                const value = document.getElementById('size').value;
-                chipValue.textContent = value === 'all' ? 'All' : 
-                    value === '1220x2440' ? '1220x2440' : 
-                    value === '2440x1220' ? '2440x1220' : 'Other';
-                chip.classList.toggle('active', value !== 'all');
-            } else if (filterName === 'thickness') {
-                const value = document.getElementById('thickness').value;
-                chipValue.textContent = value === 'all' ? 'All' : 
-                    value === 'other' ? 'Other' : `${value}mm`;
-                chip.classList.toggle('active', value !== 'all');
-            } else if (filterName === 'value') {
-                const value = document.getElementById('minValue').value;
-                chipValue.textContent = value > 0 ? `$${parseInt(value).toLocaleString()}` : '$0';
-                chip.classList.toggle('active', value > 0);
-            } else if (filterName === 'date') {
-                const value = document.getElementById('dateRange').value;
-                const labels = {
-                    'all': 'All Time',
-                    '2025': '2025',
-                    '2024': '2024',
-                    '2023': '2023',
-                    'recent': 'Last 12M',
-                    'last6': 'Last 6M',
-                    'last3': 'Last 3M',
-                    'custom': 'Custom'
-                };
-                
-                if (value === 'custom') {
-                    const startDate = document.getElementById('customStart').value;
-                    const endDate = document.getElementById('customEnd').value;
-                    if (startDate && endDate) {
-                        const start = new Date(startDate).toLocaleDateString('en-US', { month: 'short', day: 'numeric', year: 'numeric' });
-                        const end = new Date(endDate).toLocaleDateString('en-US', { month: 'short', day: 'numeric', year: 'numeric' });
-                        chipValue.textContent = `${start} - ${end}`;
-                    } else {
-                        chipValue.textContent = 'Custom';
-                    }
-                } else {
-                    chipValue.textContent = labels[value] || 'All Time';
-                }
-                chip.classList.toggle('active', value !== 'all');
-            }
-        }
-        
-        function getFilters() {
-            const selectedCountries = [];
-            document.querySelectorAll('#countryCheckboxes input[type="checkbox"]:checked').forEach(cb => {
-                selectedCountries.push(cb.value);
-            });
-            
-            let countries = null;
-            if (!selectedCountries.includes('all') && selectedCountries.length > 0) {
-                countries = selectedCountries;
-            }
-            
-            const dateRange = document.getElementById('dateRange').value;
-            const filters = {
-                countries: countries,
-                productType: document.getElementById('productType').value,
-                size: document.getElementById('size').value,
-                thickness: document.getElementById('thickness').value,
-                minValue: document.getElementById('minValue').value,
-                dateRange: dateRange
-            };
-            
-            // Add custom date range if selected
-            if (dateRange === 'custom') {
-                filters.customStart = document.getElementById('customStart').value;
-                filters.customEnd = document.getElementById('customEnd').value;
-            }
-            
-            return filters;
-        }
-        
-        function applyFilters() {
-            currentFilters = getFilters();
-            loadTabData(currentTab);
-            closeAllDropdowns();
-            
-            // Update all filter chips
-            updateFilterChip('countries');
-            updateFilterChip('product');
-            updateFilterChip('size');
-            updateFilterChip('thickness');
-            updateFilterChip('value');
-            updateFilterChip('date');
-        }
-        
-        async function loadTabData(tabName) {
-            const params = new URLSearchParams();
-            if (currentFilters.countries) {
-                currentFilters.countries.forEach(c => params.append('countries', c));
-            }
-            if (currentFilters.productType !== 'all') {
-                params.append('product_type', currentFilters.productType);
-            }
-            if (currentFilters.size !== 'all') {
-                params.append('size', currentFilters.size);
-            }
-            if (currentFilters.thickness !== 'all') {
-                params.append('thickness', currentFilters.thickness);
-            }
-            if (currentFilters.minValue) {
-                params.append('min_value', currentFilters.minValue);
-            }
-            if (currentFilters.dateRange !== 'all') {
-                params.append('date_range', currentFilters.dateRange);
-                
-                // Add custom date parameters if custom range is selected
-                if (currentFilters.dateRange === 'custom') {
-                    if (currentFilters.customStart) {
-                        params.append('custom_start', currentFilters.customStart);
-                    }
-                    if (currentFilters.customEnd) {
-                        params.append('custom_end', currentFilters.customEnd);
-                    }
-                }
-            }
-            
-            try {
-                const response = await fetch(`/api/${tabName}?${params}`);
-                const data = await response.json();
-                renderTabContent(tabName, data);
-            } catch (error) {
-                console.error('Error loading data:', error);
-                document.getElementById(tabName).innerHTML = '<div class="loading">Error loading data</div>';
-            }
-        }
-        
-        function renderTabContent(tabName, data) {
-            const container = document.getElementById(tabName);
-            
-            switch(tabName) {
-                case 'overview':
-                    renderOverview(container, data);
-                    break;
-                case 'buyers':
-                    renderBuyers(container, data);
-                    break;
-                case 'products':
-                    renderProducts(container, data);
-                    break;
-                case 'competitors':
-                    renderCompetitors(container, data);
-                    break;
-                case 'pricing':
-                    renderPricing(container, data);
-                    break;
-                case 'insights':
-                    renderInsights(container, data);
-                    break;
-            }
-        }
-        
-        function renderOverview(container, data) {
-            container.innerHTML = `
-                <h2>Market Overview</h2>
-                <div class="stats-grid">
-                    <div class="stat-card">
-                        <div class="stat-label">Total Market Value</div>
-                        <div class="stat-value">$${(data.total_value / 1000000).toFixed(1)}M</div>
-                        <div class="stat-label">${data.total_shipments.toLocaleString()} shipments</div>
-                    </div>
-                    <div class="stat-card" style="background: linear-gradient(135deg, #28a745 0%, #20c997 100%);">
-                        <div class="stat-label">Single-Side Market</div>
-                        <div class="stat-value">${data.single_side_pct}%</div>
-                        <div class="stat-label">${data.single_side_count.toLocaleString()} orders</div>
-                    </div>
-                    <div class="stat-card" style="background: linear-gradient(135deg, #dc3545 0%, #f86734 100%);">
-                        <div class="stat-label">Active Buyers</div>
-                        <div class="stat-value">${data.unique_buyers}</div>
-                        <div class="stat-label">Importing regularly</div>
-                    </div>
-                    <div class="stat-card" style="background: linear-gradient(135deg, #ffc107 0%, #ff6b6b 100%);">
-                        <div class="stat-label">Avg Order Value</div>
-                        <div class="stat-value">$${data.avg_order_value.toFixed(0)}</div>
-                        <div class="stat-label">Per shipment</div>
-                    </div>
-                </div>
-                
-                <div style="background: white; padding: 20px; border-radius: 10px; margin: 20px 0;">
-                    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
-                        <h3 style="margin: 0;">Country Distribution</h3>
-                        <div style="background: #f8f9fa; padding: 12px; border-radius: 8px; display: flex; align-items: center; justify-content: center; gap: 15px; margin-bottom: 20px;">
-                            <span style="font-size: 15px; font-weight: 600; color: #444;">View by:</span>
-                            <button id="valueBtn" onclick="setMetric('value')" style="padding: 10px 28px; background: #1a237e; color: white; border: none; border-radius: 6px; font-size: 15px; font-weight: 600; cursor: pointer; transition: all 0.2s;">
-                                Value (USD)
-                            </button>
-                            <button id="volumeBtn" onclick="setMetric('volume')" style="padding: 10px 28px; background: white; color: #555; border: 2px solid #ddd; border-radius: 6px; font-size: 15px; font-weight: 600; cursor: pointer; transition: all 0.2s;">
-                                Volume (Sheets)
-                            </button>
-                        </div>
-                    </div>
-                    <div style="position: relative; height: 350px; overflow-x: auto; overflow-y: hidden;">
-                        <div style="min-width: ${Math.max(600, data.country_dist.labels.length * 80)}px; height: 320px;">
-                            <canvas id="countryChart"></canvas>
-                        </div>
-                    </div>
-                </div>
-            `;
-            
-            // Store country data globally for toggle
-            window.countryData = data.country_dist;
-            
-            // Render chart with proper cleanup
-            if (data.country_dist && data.country_dist.labels && data.country_dist.labels.length > 0) {
-                setTimeout(() => {
-                    // Destroy existing chart if any
-                    if (window.countryChartInstance) {
-                        window.countryChartInstance.destroy();
-                    }
-                    renderCountryChart(data.country_dist);
-                }, 100);
-            }
-        }
-        
-        function renderBuyers(container, data) {
-            let html = `
-                <h2>Top Buyers Intelligence</h2>
-                <p style="margin-bottom: 20px; color: #666;">
-                    Found ${data.total_buyers} buyers | 
-                    Single-side buyers: ${data.single_side_buyers} | 
-                    Target opportunities: ${data.artis_compatible_buyers}
-                </p>
-            `;
-            
-            data.buyers.forEach(buyer => {
-                const buyerClass = buyer.single_side_pct > 70 ? 'single-side-buyer' : 
-                                  buyer.single_side_pct < 30 ? 'double-side-buyer' : 'mixed-buyer';
-                
-                const isArtisTarget = buyer.buys_1220x2440 && buyer.single_side_pct > 50;
-                
-                html += `
-                    <div class="buyer-card ${buyerClass}">
-                        <div class="buyer-name">
-                            ${buyer.name} 
-                            ${isArtisTarget ? '<span class="highlight">🎯 Artis Target</span>' : ''}
-                        </div>
-                        <div class="buyer-details">
-                            <div class="buyer-stat">
-                                <span class="buyer-stat-label">Country</span>
-                                <span class="buyer-stat-value">${buyer.countries}</span>
-                            </div>
-                            <div class="buyer-stat">
-                                <span class="buyer-stat-label">Total Orders</span>
-                                <span class="buyer-stat-value">${buyer.total_orders}</span>
-                            </div>
-                            <div class="buyer-stat">
-                                <span class="buyer-stat-label">Total Value</span>
-                                <span class="buyer-stat-value">$${(buyer.total_value / 1000).toFixed(0)}K</span>
-                            </div>
-                            <div class="buyer-stat">
-                                <span class="buyer-stat-label">Single-Side %</span>
-                                <span class="buyer-stat-value">${buyer.single_side_pct}%</span>
-                            </div>
-                            <div class="buyer-stat">
-                                <span class="buyer-stat-label">Avg Price/Unit</span>
-                                <span class="buyer-stat-value">$${buyer.avg_price.toFixed(2)}</span>
-                            </div>
-                            <div class="buyer-stat">
-                                <span class="buyer-stat-label">Main Supplier</span>
-                                <span class="buyer-stat-value">${buyer.main_supplier}</span>
-                            </div>
-                            <div class="buyer-stat">
-                                <span class="buyer-stat-label">Sizes Ordered</span>
-                                <span class="buyer-stat-value">${buyer.sizes || 'Various'}</span>
-                            </div>
-                            <div class="buyer-stat">
-                                <span class="buyer-stat-label">Last Order</span>
-                                <span class="buyer-stat-value">${buyer.last_order}</span>
-                            </div>
-                        </div>
-                    </div>
-                `;
-            });
-            
-            container.innerHTML = html;
-        }
-        
-        function renderProducts(container, data) {
-            container.innerHTML = `
-                <h2>Product Specification Analysis</h2>
-                <div class="stats-grid">
-                    <div class="stat-card">
-                        <div class="stat-label">Most Common Size</div>
-                        <div class="stat-value">${data.top_size}</div>
-                        <div class="stat-label">${data.top_size_pct}% of market</div>
-                    </div>
-                    <div class="stat-card" style="background: linear-gradient(135deg, #28a745 0%, #20c997 100%);">
-                        <div class="stat-label">Artis Size (1220x2440)</div>
-                        <div class="stat-value">${data.artis_size_pct}%</div>
-                        <div class="stat-label">Market share</div>
-                    </div>
-                </div>
-                
-                <div class="table-container">
-                    <h3>Size Distribution</h3>
-                    <table>
-                        <thead>
-                            <tr>
-                                <th>Size (mm)</th>
-                                <th>Orders</th>
-                                <th>Market %</th>
-                                <th>Single-Side %</th>
-                                <th>Avg Price</th>
-                                <th>Top Buyers</th>
-                            </tr>
-                        </thead>
-                        <tbody id="sizeTable"></tbody>
-                    </table>
-                </div>
-                
-                <div class="table-container">
-                    <h3>Thickness Distribution</h3>
-                    <table>
-                        <thead>
-                            <tr>
-                                <th>Thickness (mm)</th>
-                                <th>Orders</th>
-                                <th>Market %</th>
-                                <th>Single-Side %</th>
-                                <th>Avg Price</th>
-                            </tr>
-                        </thead>
-                        <tbody id="thicknessTable"></tbody>
-                    </table>
-                </div>
-            `;
-            
-            // Populate tables
-            if (data.sizes) {
-                const sizeTable = document.getElementById('sizeTable');
-                data.sizes.forEach(size => {
-                    sizeTable.innerHTML += `
-                        <tr>
-                            <td>${size.size}</td>
-                            <td>${size.count}</td>
-                            <td>${size.pct}%</td>
-                            <td>${size.single_side_pct}%</td>
-                            <td>$${size.avg_price}</td>
-                            <td>${size.top_buyers}</td>
-                        </tr>
-                    `;
-                });
-            }
-            
-            if (data.thickness) {
-                const thicknessTable = document.getElementById('thicknessTable');
-                data.thickness.forEach(thick => {
-                    thicknessTable.innerHTML += `
-                        <tr>
-                            <td>${thick.thickness}</td>
-                            <td>${thick.count}</td>
-                            <td>${thick.pct}%</td>
-                            <td>${thick.single_side_pct}%</td>
-                            <td>$${thick.avg_price}</td>
-                        </tr>
-                    `;
-                });
-            }
-        }
-        
-        function renderCompetitors(container, data) {
-            // Store data globally for toggle
-            window.competitorData = data;
-            
-            container.innerHTML = `
-                <h2>Competitor Analysis</h2>
-                <div class="chart-container">
-                    <h3>Market Share by Supplier (Value-based)</h3>
-                    <canvas id="supplierChart"></canvas>
-                </div>
-                
-                <div class="table-container">
-                    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
-                        <h3 style="margin: 0;">Top Competitors</h3>
-                        <div style="background: #f8f9fa; padding: 10px; border-radius: 6px; display: flex; align-items: center; justify-content: center; gap: 12px;">
-                            <span style="font-size: 14px; font-weight: 600; color: #444;">View by:</span>
-                            <button id="compValueBtn" onclick="setCompetitorMetric('value')" style="padding: 8px 20px; background: #1a237e; color: white; border: none; border-radius: 5px; font-size: 14px; font-weight: 600; cursor: pointer;">
-                                Value
-                            </button>
-                            <button id="compVolumeBtn" onclick="setCompetitorMetric('volume')" style="padding: 8px 20px; background: white; color: #555; border: 2px solid #ddd; border-radius: 5px; font-size: 14px; font-weight: 600; cursor: pointer;">
-                                Volume
-                            </button>
-                        </div>
-                    </div>
-                    <table>
-                        <thead>
-                            <tr>
-                                <th>Supplier</th>
-                                <th>Origin</th>
-                                <th>Orders</th>
-                                <th>Total Value</th>
-                                <th id="marketShareHeader">Market Share (Value)</th>
-                                <th>Single-Side %</th>
-                                <th>Avg Price</th>
-                                <th>Top Markets</th>
-                                <th>Key Buyers</th>
-                            </tr>
-                        </thead>
-                        <tbody id="competitorTableBody">
-                            ${data.competitors.map(comp => `
-                                <tr>
-                                    <td><strong>${comp.name}</strong></td>
-                                    <td>${comp.country}</td>
-                                    <td>${comp.orders}</td>
-                                    <td>$${(comp.total_value/1000000).toFixed(1)}M</td>
-                                    <td class="market-share-cell">${comp.market_share_value}%</td>
-                                    <td>${comp.single_side_pct}%</td>
-                                    <td>$${comp.avg_price}</td>
-                                    <td style="color: #667eea; font-weight: 600;">${comp.top_countries || 'N/A'}</td>
-                                    <td>${comp.key_buyers}</td>
-                                </tr>
-                            `).join('')}
-                        </tbody>
-                    </table>
-                </div>
-            `;
-            
-            if (data.supplier_chart) {
-                renderSupplierChart(data.supplier_chart);
-            }
-        }
-        
-        function renderPricing(container, data) {
-            container.innerHTML = `
-                <h2>Pricing Analysis</h2>
-                <div class="stats-grid">
-                    <div class="stat-card">
-                        <div class="stat-label">Single-Side Avg Price</div>
-                        <div class="stat-value">$${data.single_side_avg}</div>
-                        <div class="stat-label">Per unit</div>
-                    </div>
-                    <div class="stat-card" style="background: linear-gradient(135deg, #dc3545 0%, #f86734 100%);">
-                        <div class="stat-label">Double-Side Avg Price</div>
-                        <div class="stat-value">$${data.double_side_avg}</div>
-                        <div class="stat-label">Per unit</div>
-                    </div>
-                </div>
-                
-                <div class="chart-container">
-                    <h3>Price Distribution by Product Type</h3>
-                    <canvas id="priceChart"></canvas>
-                </div>
-                
-                <div class="table-container">
-                    <h3>Price Ranges by Specification</h3>
-                    <table>
-                        <thead>
-                            <tr>
-                                <th>Specification</th>
-                                <th>Min Price</th>
-                                <th>Avg Price</th>
-                                <th>Max Price</th>
-                                <th>Most Common</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                            ${data.price_ranges.map(range => `
-                                <tr>
-                                    <td>${range.spec}</td>
-                                    <td>$${range.min}</td>
-                                    <td>$${range.avg}</td>
-                                    <td>$${range.max}</td>
-                                    <td>$${range.mode}</td>
-                                </tr>
-                            `).join('')}
-                        </tbody>
-                    </table>
-                </div>
-            `;
-            
-            if (data.price_chart) {
-                renderPriceChart(data.price_chart);
+# =============================================================================
+# Query deadlines and cancellation
+# =============================================================================
+
+QUERY_TIMEOUT_SECONDS = float(os.environ.get("QUERY_TIMEOUT_SECONDS", 30))
+# SQLite VM instructions between deadline checks
+QUERY_PROGRESS_OPS = int(os.environ.get("QUERY_PROGRESS_OPS", 10000))
+
+class QueryBudget:
+    """Deadline and cancellation flag for the SQLite work of one API request"""
+
+    def __init__(self, timeout):
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout
+        self.stop_reason = None
+        self._connections = []
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def attach(self, conn):
+        with self._lock:
+            self._connections.append(conn)
+        conn.set_progress_handler(self._check, QUERY_PROGRESS_OPS)
+
+    def _check(self):
+        # A non-zero return makes SQLite abort the statement with "interrupted"
+        if self.stop_reason is None and time.monotonic() > self.deadline:
+            self.stop_reason = "timeout"
+        return 1 if self.stop_reason else 0
+
+    def cancel(self, reason):
+        """Stop every query of the request now, from any thread"""
+        if self.stop_reason is None:
+            self.stop_reason = reason
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            try:
+                conn.interrupt()
+            except sqlite3.ProgrammingError:
+                pass  # Already closed
+
+current_query_budget = contextvars.ContextVar("query_budget", default=None)
+
+class QueryCancelled(Exception):
+    """A request's queries were stopped by its deadline or by the client going away"""
+
+    def __init__(self, budget):
+        super().__init__(budget.stop_reason)
+        self.reason = budget.stop_reason
+        self.elapsed = budget.elapsed
+
+def raise_if_cancelled(error):
+    """Turn SQLite's 'interrupted' error into QueryCancelled when the budget caused it"""
+    budget = current_query_budget.get()
+    if budget is not None and budget.stop_reason and isinstance(error, sqlite3.OperationalError):
+        raise QueryCancelled(budget) from error
+
+class QueryBudgetMiddleware:
+    """Pure ASGI middleware giving each API request a deadline and watching for disconnects"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        budget = QueryBudget(QUERY_TIMEOUT_SECONDS)
+        token = current_query_budget.set(budget)
+        messages = asyncio.Queue()
+
+        async def watch():
+            # Read ahead of the app so a disconnect is seen while the query is running
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    budget.cancel("disconnected")
+                    return
+
+        watcher = asyncio.create_task(watch())
+        try:
+            await self.app(scope, messages.get, send)
+        finally:
+            watcher.cancel()
+            current_query_budget.reset(token)
+
+app.add_middleware(QueryBudgetMiddleware)
+
+@app.exception_handler(QueryCancelled)
+async def query_cancelled(request, exc):
+    elapsed_ms = round(exc.elapsed * 1000)
+    if exc.reason == "timeout":
+        status, detail = 504, f"Query exceeded the {QUERY_TIMEOUT_SECONDS:g}s limit"
+    else:
+        status, detail = 503, "Query cancelled because the client disconnected"
+    print(f"⏹️ {request.url.path}: {detail} after {elapsed_ms} ms")
+    return JSONResponse(
+        status_code=status,
+        content={"detail": detail, "reason": exc.reason, "elapsed_ms": elapsed_ms},
+        headers={"Cache-Control": "no-store"}
+    )
+
+# =============================================================================
+# Admission control
+# =============================================================================
+
+# Class -> (priority, concurrent requests, queued requests); lower priority runs first
+ADMISSION_CLASSES = {
+    "interactive": (0, int(os.environ.get("ADMIT_INTERACTIVE", 16)), 128),
+    "detail": (1, int(os.environ.get("ADMIT_DETAIL", 8)), 64),
+    "bulk": (2, int(os.environ.get("ADMIT_BULK", 2)), 16),
+    "background": (3, int(os.environ.get("ADMIT_BACKGROUND", 2)), 256)
+}
+# Slots shared by all classes - matches the default threadpool of 40 with room to spare
+ADMISSION_TOTAL = int(os.environ.get("ADMISSION_TOTAL", 24))
+# Path prefix -> class for everything under /api/ that is not a dashboard tab
+ADMISSION_ROUTES = (
+    ("/api/jobs", "bulk"),
+    ("/api/export", "bulk")
+)
+# Cheap endpoints that never queue
+ADMISSION_EXEMPT = ("/api/version", "/api/cache/stats", "/api/events")
+
+class AdmissionController:
+    """Per-class concurrency budgets and queues; a freed slot goes to the highest-priority waiter
+
+    Lives on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, classes, total):
+        self.classes = classes
+        self.total = total
+        self.running = Counter()
+        self.waiting = []  # (priority, sequence, class, future)
+        self.loop = None
+        self._sequence = itertools.count()
+        self.counters = {name: {"admitted": 0, "rejected": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+                         for name in classes}
+
+    def _has_room(self, name):
+        return self.running[name] < self.classes[name][1] and sum(self.running.values()) < self.total
+
+    async def acquire(self, name):
+        """Seconds spent queued, or None when the class queue is full"""
+        priority, _, queue_limit = self.classes[name]
+        started = time.monotonic()
+        queued = [entry for entry in self.waiting if entry[2] == name]
+        if not queued and self._has_room(name):
+            self.running[name] += 1
+        elif len(queued) >= queue_limit:
+            self.counters[name]["rejected"] += 1
+            return None
+        else:
+            entry = (priority, next(self._sequence), name, asyncio.get_running_loop().create_future())
+            self.waiting.append(entry)
+            try:
+                await entry[3]
+            except asyncio.CancelledError:
+                if entry in self.waiting:
+                    self.waiting.remove(entry)
+                elif not entry[3].cancelled():
+                    self.release(name)  # Granted a slot just as the request went away
+                raise
+        waited = time.monotonic() - started
+        counters = self.counters[name]
+        counters["admitted"] += 1
+        counters["wait_seconds"] += waited
+        counters["max_wait_seconds"] = max(counters["max_wait_seconds"], waited)
+        return waited
+
+    def release(self, name):
+        self.running[name] -= 1
+        for entry in sorted(self.waiting):
+            if sum(self.running.values()) >= self.total:
+                break
+            if entry[3].done() or not self._has_room(entry[2]):
+                continue
+            self.waiting.remove(entry)
+            self.running[entry[2]] += 1
+            entry[3].set_result(None)
+
+    @contextmanager
+    def thread_slot(self, name):
+        """Hold a slot from a worker thread (background recomputation)
+
+        Raises RuntimeError when the class queue is full rather than running unadmitted.
+        """
+        loop = self.loop
+        if loop is None:
+            yield
+            return
+        if asyncio.run_coroutine_threadsafe(self.acquire(name), loop).result() is None:
+            raise RuntimeError(f"{name} queue full")
+        try:
+            yield
+        finally:
+            loop.call_soon_threadsafe(self.release, name)
+
+    def stats(self):
+        stats = {}
+        for name, (_, limit, _) in self.classes.items():
+            counters = self.counters[name]
+            admitted = counters["admitted"]
+            stats[name] = {
+                "running": self.running[name],
+                "queued": sum(1 for entry in self.waiting if entry[2] == name),
+                "limit": limit,
+                "admitted": admitted,
+                "rejected": counters["rejected"],
+                "avg_wait_ms": round(counters["wait_seconds"] * 1000 / admitted, 1) if admitted else 0,
+                "max_wait_ms": round(counters["max_wait_seconds"] * 1000, 1)
             }
-        }
-        
-        function renderInsights(container, data) {
-            container.innerHTML = `
-                <h2>Key Insights & Recommendations</h2>
-                
-                <div style="background: #d4edda; padding: 20px; border-radius: 10px; margin-bottom: 20px;">
-                    <h3>✅ Opportunities for Artis</h3>
-                    <ul style="margin-top: 10px; line-height: 1.8;">
-                        ${data.opportunities.map(opp => `<li>${opp}</li>`).join('')}
-                    </ul>
-                </div>
-                
-                <div style="background: #f8d7da; padding: 20px; border-radius: 10px; margin-bottom: 20px;">
-                    <h3>⚠️ Challenges to Address</h3>
-                    <ul style="margin-top: 10px; line-height: 1.8;">
-                        ${data.challenges.map(ch => `<li>${ch}</li>`).join('')}
-                    </ul>
-                </div>
-                
-                <div style="background: #cfe2ff; padding: 20px; border-radius: 10px; margin-bottom: 20px;">
-                    <h3>🎯 Priority Actions</h3>
-                    <ol style="margin-top: 10px; line-height: 1.8;">
-                        ${data.actions.map(action => `<li><strong>${action.title}</strong>: ${action.detail}</li>`).join('')}
-                    </ol>
-                </div>
-                
-                <div style="background: #fff3cd; padding: 20px; border-radius: 10px;">
-                    <h3>📊 Market Summary</h3>
-                    <p>${data.summary}</p>
-                </div>
-            `;
-        }
-        
-        function renderTrendsChart(trends) {
-            const ctx = document.getElementById('trendsChart').getContext('2d');
-            new Chart(ctx, {
-                type: 'line',
-                data: {
-                    labels: trends.labels,
-                    datasets: [{
-                        label: 'Single-Side Orders',
-                        data: trends.single_side,
-                        borderColor: '#28a745',
-                        backgroundColor: 'rgba(40, 167, 69, 0.1)',
-                        tension: 0.4
-                    }, {
-                        label: 'Double-Side Orders',
-                        data: trends.double_side,
-                        borderColor: '#dc3545',
-                        backgroundColor: 'rgba(220, 53, 69, 0.1)',
-                        tension: 0.4
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    plugins: {
-                        legend: {
-                            position: 'bottom'
-                        }
-                    },
-                    scales: {
-                        y: {
-                            beginAtZero: true
-                        }
-                    }
-                }
-            });
-        }
-        
-        function setMetric(metric) {
-            // Update button styles
-            const volumeBtn = document.getElementById('volumeBtn');
-            const valueBtn = document.getElementById('valueBtn');
-            
-            if (metric === 'volume') {
-                volumeBtn.style.background = '#1a237e';
-                volumeBtn.style.color = 'white';
-                volumeBtn.style.border = 'none';
-                valueBtn.style.background = 'white';
-                valueBtn.style.color = '#555';
-                valueBtn.style.border = '2px solid #ddd';
-            } else {
-                valueBtn.style.background = '#1a237e';
-                valueBtn.style.color = 'white';
-                valueBtn.style.border = 'none';
-                volumeBtn.style.background = 'white';
-                volumeBtn.style.color = '#555';
-                volumeBtn.style.border = '2px solid #ddd';
+        return stats
+
+admission = AdmissionController(ADMISSION_CLASSES, ADMISSION_TOTAL)
+
+def classify_request(path):
+    """Admission class of an API path, or None when it is exempt"""
+    if path in ADMISSION_EXEMPT:
+        return None
+    if path in cached_api_routes() or path == "/api/cube":
+        return "interactive"
+    for prefix, name in ADMISSION_ROUTES:
+        if path.startswith(prefix):
+            return name
+    return "detail"
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware queueing API requests by class and reporting the wait"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        name = classify_request(scope["path"]) if scope["type"] == "http" and scope["path"].startswith("/api/") else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        waited = await admission.acquire(name)
+        if waited is None:
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": f"Too many {name} requests queued, try again shortly"},
+                headers={"Retry-After": "1", "Cache-Control": "no-store"}
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_wait(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", f'queue;dur={waited * 1000:.1f};desc="{name}"'.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_wait)
+        finally:
+            admission.release(name)
+
+# Added after QueryBudgetMiddleware so it runs outside it: time spent queued is not
+# charged to the query deadline
+app.add_middleware(AdmissionMiddleware)
+
+# =============================================================================
+# Result cache and prewarming
+# =============================================================================
+
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 512))
+# API results older than the soft TTL (or from an older dataset version) are served
+# stale while they are recomputed in the background; past the hard TTL they are dropped
+RESULT_CACHE_SOFT_TTL = float(os.environ.get("RESULT_CACHE_SOFT_TTL", 900))
+RESULT_CACHE_HARD_TTL = float(os.environ.get("RESULT_CACHE_HARD_TTL", 86400))
+REVALIDATE_WORKERS = int(os.environ.get("REVALIDATE_WORKERS", 2))
+REVALIDATE_QUEUE = int(os.environ.get("REVALIDATE_QUEUE", 32))
+PREWARM_TOP_N = int(os.environ.get("PREWARM_TOP_N", 10))
+PREWARM_POLL_SECONDS = int(os.environ.get("PREWARM_POLL_SECONDS", 60))
+# Extra filter sets to always prewarm, e.g. '[{"countries": ["UNITED ARAB EMIRATES"]}]'
+PREWARM_FILTERS = json.loads(os.environ.get("PREWARM_FILTERS", "[]"))
+ACCESS_LOG_PATH = os.environ.get("ACCESS_LOG_PATH", "access_log.json")
+
+# Relative date ranges move every day, so their cache keys carry today's date
+RELATIVE_DATE_RANGES = ('recent', 'last6', 'last3')
+
+def get_dataset_version():
+    """Fingerprint of the database file - changes whenever shipments are ingested"""
+    path = get_db_path()
+    parts = []
+    for suffix in ('', '-wal'):
+        try:
+            st = os.stat(path + suffix)
+        except OSError:
+            continue
+        parts.append(f"{st.st_mtime_ns:x}-{st.st_size:x}")
+    return '.'.join(parts) or 'missing'
+
+def canonical_filters(filters):
+    """Normalise a filter dict so equivalent requests share one cache key"""
+    canonical = {}
+    for name, value in filters.items():
+        if value is None or value == '' or value == 'all':
+            continue
+        if name == 'countries':
+            value = sorted(set(value))
+            if not value:
+                continue
+        elif name == 'min_value':
+            # min_value=0 is the same as no minimum (endpoints test truthiness)
+            value = float(value)
+            if not value:
+                continue
+        elif name in ('custom_start', 'custom_end') and filters.get('date_range') != 'custom':
+            continue
+        canonical[name] = value
+    return json.dumps(canonical, sort_keys=True)
+
+def cache_key(name, filters):
+    """Cache key for an endpoint called with the given filters"""
+    as_of = date.today().isoformat() if filters.get('date_range') in RELATIVE_DATE_RANGES else None
+    return (name, canonical_filters(filters), as_of)
+
+class ResultCache:
+    """LRU of endpoint results, each tagged with the dataset version it was computed from"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def get_stale(self, key, version, soft_ttl, hard_ttl):
+        """(value, fresh) - a value from another version or past soft_ttl comes back with fresh=False"""
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.monotonic() - entry[2] if entry is not None else None
+            if entry is None or age >= hard_ttl:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            fresh = entry[0] == version and age < soft_ttl
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+            return entry[1], fresh
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses
             }
-            
-            window.currentMetric = metric;
-            updateCountryChart();
+
+result_cache = ResultCache(RESULT_CACHE_MAX_ENTRIES)
+
+# Optional second tier on disk, shared by all workers on the host and kept across restarts
+RESULT_CACHE_DB = os.environ.get("RESULT_CACHE_DB")
+RESULT_CACHE_DB_MAX_BYTES = int(os.environ.get("RESULT_CACHE_DB_MAX_BYTES", 64 * 1024 * 1024))
+
+def _json_default(obj):
+    """JSON fallback matching FastAPI's encoding of sqlite3.Row values"""
+    if isinstance(obj, sqlite3.Row):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class PersistentResultCache:
+    """Sidecar SQLite file of zlib-compressed JSON results
+
+    WAL mode lets several uvicorn workers read and write the same file; entries
+    are keyed by endpoint, canonical filters and dataset version, and the least
+    recently used ones are evicted once the payloads exceed max_bytes.
+    """
+
+    # Only touch the access time again after this many seconds, to keep reads cheap
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                endpoint TEXT NOT NULL,
+                filters TEXT NOT NULL,
+                as_of TEXT NOT NULL,
+                version TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (endpoint, filters, as_of, version)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed)")
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, version):
+        endpoint, filters, as_of = key
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT payload, accessed FROM results WHERE endpoint = ? AND filters = ? AND as_of = ? AND version = ?",
+                (endpoint, filters, as_of or '', version)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            if now - row[1] > self.TOUCH_INTERVAL:
+                conn.execute(
+                    "UPDATE results SET accessed = ? WHERE endpoint = ? AND filters = ? AND as_of = ? AND version = ?",
+                    (now, endpoint, filters, as_of or '', version)
+                )
+                conn.commit()
+            self.hits += 1
+            return json.loads(zlib.decompress(row[0]))
+        except sqlite3.Error as e:
+            print(f"⚠️ Result cache read failed: {e}")
+            return None
+
+    def put(self, key, version, value):
+        endpoint, filters, as_of = key
+        payload = zlib.compress(json.dumps(value, default=_json_default).encode(), 6)
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (endpoint, filters, as_of or '', version, payload, len(payload), time.time())
+            )
+            conn.commit()
+            self._evict(conn, version)
+        except sqlite3.Error as e:
+            print(f"⚠️ Result cache write failed: {e}")
+
+    def _evict(self, conn, version):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Results for older dataset versions go first, then least recently used
+        target = int(self.max_bytes * 0.9)
+        rows = conn.execute(
+            "SELECT rowid, size FROM results ORDER BY version = ?, accessed", (version,)
+        ).fetchall()
+        doomed = []
+        for rowid, size in rows:
+            if total <= target:
+                break
+            doomed.append((rowid,))
+            total -= size
+        conn.executemany("DELETE FROM results WHERE rowid = ?", doomed)
+        conn.commit()
+
+    def stats(self):
+        try:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
         }
-        
-        function updateCountryChart() {
-            if (window.countryData) {
-                if (window.countryChartInstance) {
-                    window.countryChartInstance.destroy();
-                }
-                renderCountryChart(window.countryData);
+
+persistent_cache = PersistentResultCache(RESULT_CACHE_DB, RESULT_CACHE_DB_MAX_BYTES) if RESULT_CACHE_DB else None
+
+# name -> (function, accepted parameter names)
+CACHED_ENDPOINTS = {}
+# Per-entity drill-downs: cached like the rest, but not prewarmed or counted in the access log
+DETAIL_ENDPOINTS = set()
+
+# Canonical filter set -> number of API requests that used it
+access_counts = Counter()
+
+prewarm_status = {
+    "state": "pending",
+    "version": None,
+    "results": 0,
+    "failed": 0,
+    "duration_seconds": None,
+    "finished_at": None
+}
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Concurrent calls with the same key wait for one computation and share its result"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, compute):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                flight.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if isinstance(flight.error, QueryCancelled):
+                # The leader's request went away or ran out of time, not ours
+                return self.do(key, compute)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+            if flight.waiters:
+                print(f"🤝 Coalesced {flight.waiters} identical request(s) for {key[0][0]}")
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights)
             }
+
+single_flight = SingleFlight()
+
+def _endpoint_call(name, filters):
+    func, params = CACHED_ENDPOINTS[name]
+    kwargs = {param: filters.get(param) for param in params}
+    return func, kwargs, cache_key(name, kwargs), get_dataset_version()
+
+def record_access(filters):
+    # Only filter sets that computed successfully are learned, so a broken one is never prewarmed
+    access_counts[canonical_filters(filters)] += 1
+
+def get_cached_result(name, filters, record=True):
+    """Return an endpoint result for the given filters, computing it on a miss"""
+    func, kwargs, key, version = _endpoint_call(name, filters)
+    result = result_cache.get(key, version)
+    if result is None:
+        result = single_flight.do((key, version), lambda: compute_result(func, kwargs, key, version))
+    if record:
+        record_access(filters)
+    return result
+
+def serve_cached_result(name, filters):
+    """(result, stale) for an API request - a stale entry is answered at once and recomputed in the background"""
+    func, kwargs, key, version = _endpoint_call(name, filters)
+    result, fresh = result_cache.get_stale(key, version, RESULT_CACHE_SOFT_TTL, RESULT_CACHE_HARD_TTL)
+    if result is None:
+        result, fresh = single_flight.do((key, version), lambda: compute_result(func, kwargs, key, version)), True
+    elif not fresh:
+        schedule_revalidation(func, kwargs, key, version)
+    if name not in DETAIL_ENDPOINTS:
+        record_access(filters)
+    return result, not fresh
+
+def compute_result(func, kwargs, key, version):
+    """Fill both cache tiers for a miss, preferring the persistent copy"""
+    result = persistent_cache.get(key, version) if persistent_cache else None
+    if result is not None:
+        result_cache.put(key, version, result)
+        return result
+    try:
+        result = func(**kwargs)
+    except sqlite3.Error as e:
+        raise_if_cancelled(e)
+        raise
+    result_cache.put(key, version, result)
+    if persistent_cache:
+        persistent_cache.put(key, version, result)
+    return result
+
+_revalidate_pool = None
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+def schedule_revalidation(func, kwargs, key, version):
+    """Recompute a stale result on the bounded background pool, once per key"""
+    global _revalidate_pool
+    with _revalidating_lock:
+        if (key, version) in _revalidating or len(_revalidating) >= REVALIDATE_QUEUE:
+            return
+        _revalidating.add((key, version))
+        if _revalidate_pool is None:
+            _revalidate_pool = ThreadPoolExecutor(REVALIDATE_WORKERS, thread_name_prefix="revalidate")
+
+    def revalidate():
+        try:
+            with admission.thread_slot("background"):
+                single_flight.do((key, version), lambda: compute_result(func, kwargs, key, version))
+        except Exception as e:
+            print(f"⚠️ Background recompute of {key[0]} failed: {e}")
+        finally:
+            with _revalidating_lock:
+                _revalidating.discard((key, version))
+    _revalidate_pool.submit(revalidate)
+
+def revalidation_stats():
+    with _revalidating_lock:
+        return {"workers": REVALIDATE_WORKERS, "pending": len(_revalidating)}
+
+def dumps_json(value):
+    """Serialise an already-primitive payload, skipping FastAPI's jsonable_encoder"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default)
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(',', ':')).encode()
+
+def to_columnar(rows):
+    """[{"a": 1, "b": 2}, {"a": 3, "b": 4}] -> {"a": [1, 3], "b": [2, 4]}"""
+    if not rows:
+        return {}
+    return {field: [row[field] for row in rows] for field in rows[0]}
+
+def cached_endpoint(name, columnar=(), detail=False):
+    """Serve an API endpoint through the result cache
+
+    columnar names the row lists that ?format=columnar returns as parallel
+    arrays per field instead of one object per row. detail endpoints take
+    an entity from the path and are left out of the prewarm.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        CACHED_ENDPOINTS[name] = (func, list(signature.parameters))
+        if detail:
+            DETAIL_ENDPOINTS.add(name)
+
+        @functools.wraps(func)
+        def wrapper(format=None, **kwargs):
+            result, stale = serve_cached_result(name, kwargs)
+            if format == 'columnar':
+                result = dict(result, **{key: to_columnar(result[key]) for key in columnar})
+            response = Response(dumps_json(result), media_type="application/json")
+            if stale:
+                response.headers["X-Cache"] = "stale"
+            return response
+
+        parameters = list(signature.parameters.values())
+        if columnar:
+            parameters.append(inspect.Parameter(
+                'format', inspect.Parameter.KEYWORD_ONLY,
+                default=Query(None, pattern='^(rows|columnar)$'), annotation=Optional[str]
+            ))
+        wrapper.__signature__ = signature.replace(parameters=parameters)
+        wrapper.cache_name = name
+        return wrapper
+    return decorator
+
+def load_access_log():
+    """Load request counts recorded by previous runs"""
+    try:
+        with open(ACCESS_LOG_PATH) as f:
+            access_counts.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+
+def save_access_log():
+    """Persist request counts so the next start knows the popular filter sets"""
+    try:
+        with open(ACCESS_LOG_PATH, 'w') as f:
+            json.dump(dict(access_counts.most_common(200)), f)
+    except OSError as e:
+        print(f"⚠️ Could not save access log: {e}")
+
+def prewarm_filter_sets():
+    """Default dashboard state, configured filter sets and the most requested ones"""
+    filter_sets = [{}] + list(PREWARM_FILTERS)
+    for filter_key, _ in access_counts.most_common(PREWARM_TOP_N):
+        filter_sets.append(json.loads(filter_key))
+    # Drop duplicates - the default state is usually also the most popular one
+    unique = {}
+    for filters in filter_sets:
+        unique.setdefault(canonical_filters(filters), filters)
+    return list(unique.values())
+
+def prewarm_cache():
+    """Compute and cache every endpoint for the prewarm filter sets"""
+    started = time.perf_counter()
+    version = get_dataset_version()
+    prewarm_status["state"] = "running"
+    # Also loads the columnar snapshot the cube is built from
+    get_cube_payload()
+    computed = 0
+    failed = 0
+    for filters in prewarm_filter_sets():
+        for name in CACHED_ENDPOINTS:
+            if name in DETAIL_ENDPOINTS:
+                continue
+            try:
+                get_cached_result(name, filters, record=False)
+            except Exception as e:
+                # Skip the set; the rest still gets warmed, and it is no longer learned from the access log
+                failed += 1
+                access_counts.pop(canonical_filters(filters), None)
+                print(f"⚠️ Prewarm of {name} failed for {canonical_filters(filters)}: {e!r}")
+                continue
+            computed += 1
+    duration = time.perf_counter() - started
+    prewarm_status.update({
+        "state": "warm",
+        "version": version,
+        "results": computed,
+        "failed": failed,
+        "duration_seconds": round(duration, 3),
+        "finished_at": datetime.now().isoformat(timespec='seconds')
+    })
+    print(f"🔥 Cache prewarm: {computed} results in {duration:.2f}s" + (f", {failed} failed" if failed else ""))
+    return duration
+
+async def prewarm_loop():
+    """Prewarm after startup and again whenever the dataset changes"""
+    while True:
+        if get_dataset_version() != prewarm_status["version"]:
+            try:
+                if await admission.acquire("background") is None:
+                    # The background queue is full; try again on the next poll
+                    print(f"⏸️ Cache prewarm deferred: background queue full, retrying in {PREWARM_POLL_SECONDS:g}s")
+                    await asyncio.sleep(PREWARM_POLL_SECONDS)
+                    continue
+                try:
+                    duration = await asyncio.to_thread(prewarm_cache)
+                finally:
+                    admission.release("background")
+                save_access_log()
+                if "prewarm" not in startup_phases:
+                    record_startup_phase("prewarm", duration)
+            except Exception as e:
+                prewarm_status["state"] = "failed"
+                print(f"⚠️ Cache prewarm failed: {e}")
+        await asyncio.sleep(PREWARM_POLL_SECONDS)
+
+# =============================================================================
+# Columnar snapshot
+# =============================================================================
+
+# local:  each process builds its own arrays
+# shared: the first process builds the arrays in shared memory, the others attach zero-copy
+# file:   arrays are written once as .npy files and memory-mapped by every process
+SNAPSHOT_MODE = os.environ.get("SNAPSHOT_MODE", "local")
+SNAPSHOT_LOCK_PATH = os.environ.get("SNAPSHOT_LOCK_PATH", os.path.join(tempfile.gettempdir(), "gcc_snapshot.lock"))
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshot")
+# Re-hash every array file on load instead of trusting the manifest
+SNAPSHOT_VERIFY = os.environ.get("SNAPSHOT_VERIFY", "0") == "1"
+# Bump when the on-disk layout changes so old snapshots are rebuilt
+SNAPSHOT_FORMAT = 2
+
+SNAPSHOT_CATEGORICAL = ('DESTINATION_COUNTRY', 'ORIGIN_COUNTRY', 'PRODUCT_TYPE', 'SIZE', 'CONSIGNEE_NAME', 'SHIPPER_NAME')
+SNAPSHOT_NUMERIC = ('THICKNESS', 'QUANTITY', 'UNIT_PRICE_USD', 'TOTAL_VALUE_USD')
+
+def _date_key(value):
+    """'2024-03-15' -> 20240315 (0 when missing or malformed)"""
+    try:
+        return int(value[:4]) * 10000 + int(value[5:7]) * 100 + int(value[8:10])
+    except (TypeError, ValueError):
+        return 0
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _untrack_shared_memory(shm):
+    # The segment lives as long as its dataset version, not as long as the process
+    # that happened to create or attach it
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+class ColumnarSnapshot:
+    """Column arrays of mirror_shipments
+
+    Text columns are dictionary-encoded (int32 codes into a list of values, None
+    included), numeric columns are float64 with NaN for NULL, and DATE is an
+    int32 yyyymmdd key.
+    """
+
+    ALIGNMENT = 64
+
+    def __init__(self, version, arrays, dictionaries, source='local', shm=None):
+        self.version = version
+        self.arrays = arrays
+        self.dictionaries = dictionaries
+        self.source = source
+        self.shm = shm
+        self.rows = len(arrays['DATE'])
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    @property
+    def nbytes(self):
+        return sum(arr.nbytes for arr in self.arrays.values())
+
+    @classmethod
+    def from_db(cls, conn, version):
+        import numpy as np
+        numeric = SNAPSHOT_NUMERIC
+        if 'PRICE_OUTLIER' in {row[1] for row in conn.execute("PRAGMA table_info(mirror_shipments)")}:
+            numeric += ('PRICE_OUTLIER',)
+        columns = SNAPSHOT_CATEGORICAL + numeric + ('DATE',)
+        rows = conn.execute(f"SELECT {', '.join(columns)} FROM mirror_shipments").fetchall()
+        n = len(rows)
+        arrays = {}
+        dictionaries = {}
+        for i, name in enumerate(SNAPSHOT_CATEGORICAL):
+            index = {}
+            arrays[name] = np.fromiter((index.setdefault(row[i], len(index)) for row in rows), dtype=np.int32, count=n)
+            dictionaries[name] = list(index)
+        for i, name in enumerate(numeric, start=len(SNAPSHOT_CATEGORICAL)):
+            arrays[name] = np.fromiter((np.nan if row[i] is None else row[i] for row in rows), dtype=np.float64, count=n)
+        arrays['DATE'] = np.fromiter((_date_key(row[-1]) for row in rows), dtype=np.int32, count=n)
+        return cls(version, arrays, dictionaries)
+
+    def _layout(self):
+        """Manifest plus the offset of every array after it"""
+        columns = []
+        offset = 0
+        for name, arr in self.arrays.items():
+            offset = -(-offset // self.ALIGNMENT) * self.ALIGNMENT
+            columns.append([name, arr.dtype.str, offset])
+            offset += arr.nbytes
+        manifest = {
+            "version": self.version,
+            "rows": self.rows,
+            "columns": columns,
+            "dictionaries": self.dictionaries
+        }
+        return manifest, offset
+
+    def to_shared_memory(self, name):
+        """Copy the arrays into a new shared memory segment and return a snapshot backed by it"""
+        from multiprocessing import shared_memory
+        manifest, data_size = self._layout()
+        header = json.dumps(manifest).encode()
+        data_start = -(-(8 + len(header)) // self.ALIGNMENT) * self.ALIGNMENT
+        shm = shared_memory.SharedMemory(name=name, create=True, size=data_start + data_size)
+        _untrack_shared_memory(shm)
+        shm.buf[:8] = len(header).to_bytes(8, 'little')
+        shm.buf[8:8 + len(header)] = header
+        for column, dtype, offset in manifest["columns"]:
+            start = data_start + offset
+            shm.buf[start:start + self.arrays[column].nbytes] = self.arrays[column].tobytes()
+        return self.attach(name, shm=shm)
+
+    @classmethod
+    def attach(cls, name, shm=None):
+        """Map an existing shared memory snapshot without copying it"""
+        import numpy as np
+        from multiprocessing import shared_memory
+        if shm is None:
+            shm = shared_memory.SharedMemory(name=name)
+            _untrack_shared_memory(shm)
+        header_len = int.from_bytes(shm.buf[:8], 'little')
+        manifest = json.loads(bytes(shm.buf[8:8 + header_len]))
+        data_start = -(-(8 + header_len) // cls.ALIGNMENT) * cls.ALIGNMENT
+        arrays = {}
+        for column, dtype, offset in manifest["columns"]:
+            arr = np.ndarray((manifest["rows"],), dtype=np.dtype(dtype), buffer=shm.buf, offset=data_start + offset)
+            arr.flags.writeable = False
+            arrays[column] = arr
+        return cls(manifest["version"], arrays, manifest["dictionaries"], source='shared', shm=shm)
+
+    def write_dir(self, path):
+        """Write the snapshot as .npy files, a dictionary file and a checksummed manifest"""
+        import numpy as np
+        tmp = f"{path}.tmp-{os.getpid()}"
+        os.makedirs(tmp)
+        files = {}
+        for name, arr in self.arrays.items():
+            np.save(os.path.join(tmp, name + '.npy'), arr)
+            files[name + '.npy'] = _file_sha256(os.path.join(tmp, name + '.npy'))
+        with open(os.path.join(tmp, 'dictionaries.json'), 'w') as f:
+            json.dump(self.dictionaries, f)
+        files['dictionaries.json'] = _file_sha256(os.path.join(tmp, 'dictionaries.json'))
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": self.version,
+            "rows": self.rows,
+            "columns": {name: arr.dtype.str for name, arr in self.arrays.items()},
+            "files": files,
+            "checksum": hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest(),
+            "created": datetime.now().isoformat(timespec='seconds')
+        }
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=1)
+        # Readers only ever see a complete directory
+        os.rename(tmp, path)
+
+    @classmethod
+    def from_dir(cls, path, verify=False):
+        """Memory-map a snapshot directory; only the pages a query touches are read"""
+        import numpy as np
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"snapshot format {manifest.get('format')} != {SNAPSHOT_FORMAT}")
+        files = manifest["files"]
+        if hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest() != manifest["checksum"]:
+            raise ValueError("snapshot manifest checksum mismatch")
+        if verify:
+            for filename, checksum in files.items():
+                if _file_sha256(os.path.join(path, filename)) != checksum:
+                    raise ValueError(f"snapshot file {filename} is corrupt")
+        arrays = {}
+        for name, dtype in manifest["columns"].items():
+            arr = np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+            if arr.dtype.str != dtype or len(arr) != manifest["rows"]:
+                raise ValueError(f"snapshot column {name} does not match the manifest")
+            arrays[name] = arr
+        with open(os.path.join(path, 'dictionaries.json')) as f:
+            dictionaries = json.load(f)
+        return cls(manifest["version"], arrays, dictionaries, source='file')
+
+@contextmanager
+def _snapshot_build_lock():
+    """Serialise snapshot builds and schema migrations across worker processes on this host"""
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+    with open(SNAPSHOT_LOCK_PATH, 'w') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+def _build_snapshot(version):
+    # Shared by every request, so no single request's deadline applies
+    conn = get_db_connection(interruptible=False)
+    try:
+        return ColumnarSnapshot.from_db(conn, version)
+    finally:
+        conn.close()
+
+# Where POSIX shared memory segments appear as files (Linux)
+SHARED_MEMORY_DIR = "/dev/shm"
+
+def _shared_snapshot_prefix():
+    digest = hashlib.sha1(os.path.abspath(get_db_path()).encode()).hexdigest()
+    return f"gcc_snapshot_{digest[:8]}_"
+
+def _shared_snapshot_name(version):
+    return _shared_snapshot_prefix() + hashlib.sha1(version.encode()).hexdigest()[:8]
+
+def _unlink_stale_shared_snapshots(current):
+    """Remove this database's segments for other versions, whichever process or run created them
+
+    Segments named before the per-database prefix (gcc_snapshot_<hash>) go too.
+    Workers still mapping an old segment keep their mapping.
+    """
+    try:
+        entries = os.listdir(SHARED_MEMORY_DIR)
+    except OSError:
+        return
+    prefix = _shared_snapshot_prefix()
+    removed = 0
+    for entry in entries:
+        if entry == current or not entry.startswith("gcc_snapshot_"):
+            continue
+        if entry.startswith(prefix) or entry.count('_') == 2:
+            try:
+                os.unlink(os.path.join(SHARED_MEMORY_DIR, entry))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    if removed:
+        print(f"🧹 Removed {removed} stale shared snapshot segment(s)")
+
+def load_shared_snapshot(version):
+    """Attach to the shared snapshot for this version, building it if no worker has yet"""
+    name = _shared_snapshot_name(version)
+    # Only one worker builds, the others wait here and then attach
+    with _snapshot_build_lock():
+        try:
+            snapshot = ColumnarSnapshot.attach(name)
+        except FileNotFoundError:
+            snapshot = _build_snapshot(version).to_shared_memory(name)
+        _unlink_stale_shared_snapshots(name)
+    return snapshot
+
+def _snapshot_dir(version):
+    digest = hashlib.sha1(f"{os.path.abspath(get_db_path())}:{version}".encode()).hexdigest()
+    return os.path.join(SNAPSHOT_DIR, f"v{SNAPSHOT_FORMAT}-{digest[:16]}")
+
+def load_file_snapshot(version):
+    """Map the on-disk snapshot for this version, writing it first if it is missing or stale"""
+    path = _snapshot_dir(version)
+    try:
+        return ColumnarSnapshot.from_dir(path, verify=SNAPSHOT_VERIFY)
+    except (OSError, ValueError):
+        pass
+    with _snapshot_build_lock():
+        try:
+            return ColumnarSnapshot.from_dir(path, verify=SNAPSHOT_VERIFY)
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"⚠️ Rebuilding snapshot {path}: {e}")
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        shutil.rmtree(path, ignore_errors=True)
+        _build_snapshot(version).write_dir(path)
+        # Processes still mapping an old version keep their open files
+        for entry in os.listdir(SNAPSHOT_DIR):
+            old_path = os.path.join(SNAPSHOT_DIR, entry)
+            if old_path != path:
+                shutil.rmtree(old_path, ignore_errors=True)
+    return ColumnarSnapshot.from_dir(path)
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def get_snapshot():
+    """Columnar snapshot for the current dataset version, rebuilt after ingest"""
+    global _snapshot
+    version = get_dataset_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            started = time.perf_counter()
+            if SNAPSHOT_MODE == 'shared':
+                _snapshot = load_shared_snapshot(version)
+            elif SNAPSHOT_MODE == 'file':
+                _snapshot = load_file_snapshot(version)
+            else:
+                _snapshot = _build_snapshot(version)
+            print(f"🧊 Columnar snapshot ({_snapshot.source}): {_snapshot.rows:,} rows, "
+                  f"{_snapshot.nbytes / 1e6:.1f} MB in {time.perf_counter() - started:.2f}s")
+        return _snapshot
+
+def snapshot_stats():
+    snapshot = _snapshot
+    if snapshot is None:
+        return {"mode": SNAPSHOT_MODE, "loaded": False}
+    return {
+        "mode": SNAPSHOT_MODE,
+        "loaded": True,
+        "source": snapshot.source,
+        "version": snapshot.version,
+        "rows": snapshot.rows,
+        "bytes": snapshot.nbytes,
+        "shared_memory": snapshot.shm.name if snapshot.shm is not None else None
+    }
+
+# =============================================================================
+# Bitmap indexes over snapshot rows
+# =============================================================================
+
+# Resolved bitmaps for recently used filter fragments, e.g. ('country', (0, 3))
+BITMAP_FRAGMENT_CACHE = int(os.environ.get("BITMAP_FRAGMENT_CACHE", 256))
+
+def _popcount(words):
+    """Set bits per row of a uint64 word array"""
+    import numpy as np
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return np.unpackbits(words.view(np.uint8), axis=-1).sum(axis=-1, dtype=np.int64)
+
+class BitmapIndex:
+    """One packed bitmap of row positions per value of each low-cardinality dimension
+
+    Bitmaps are uint64 words with bit i set when row i holds the value. A
+    filter is the OR of its values' bitmaps; filters combine with AND.
+    """
+
+    def __init__(self, snapshot):
+        import numpy as np
+        self.version = snapshot.version
+        self.rows = snapshot.rows
+        self.words = -(-self.rows // 64)
+        self.all = self.pack(np.ones(self.rows, dtype=bool))
+        self.labels = {}
+        self.bitmaps = {}
+        self.fragments = ResultCache(BITMAP_FRAGMENT_CACHE)
+
+        thickness_values, thickness_codes = np.unique(snapshot['THICKNESS'], return_inverse=True)
+        month_values, month_codes = np.unique(snapshot['DATE'] // 100, return_inverse=True)
+        year_values, year_codes = np.unique(snapshot['DATE'] // 10000, return_inverse=True)
+        dimensions = {
+            "country": (snapshot.dictionaries['DESTINATION_COUNTRY'], snapshot['DESTINATION_COUNTRY']),
+            "product_type": (snapshot.dictionaries['PRODUCT_TYPE'], snapshot['PRODUCT_TYPE']),
+            "size": (snapshot.dictionaries['SIZE'], snapshot['SIZE']),
+            "thickness": ([None if np.isnan(v) else v for v in thickness_values.tolist()], thickness_codes.ravel()),
+            "month": (month_values.tolist(), month_codes.ravel()),
+            "year": ([str(v) if v else None for v in year_values.tolist()], year_codes.ravel())
+        }
+        for name, (labels, codes) in dimensions.items():
+            self.labels[name] = labels
+            self.bitmaps[name] = np.stack([self.pack(codes == code) for code in range(len(labels))]) \
+                if labels else np.zeros((0, self.words), dtype=np.uint64)
+
+    def pack(self, mask):
+        """Boolean row mask -> bitmap"""
+        import numpy as np
+        packed = np.packbits(mask, bitorder='little')
+        padded = np.zeros(self.words * 8, dtype=np.uint8)
+        padded[:len(packed)] = packed
+        return padded.view('<u8').astype(np.uint64)
+
+    def select(self, dimension, predicate):
+        """OR of the bitmaps of every value of a dimension that passes the predicate"""
+        import numpy as np
+        codes = tuple(code for code, label in enumerate(self.labels[dimension]) if predicate(label))
+        key = (dimension, codes)
+        bitmap = self.fragments.get(key, self.version)
+        if bitmap is None:
+            bitmap = np.bitwise_or.reduce(self.bitmaps[dimension][list(codes)], axis=0) if codes else np.zeros_like(self.all)
+            self.fragments.put(key, self.version, bitmap)
+        return bitmap
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "dimensions": {name: len(labels) for name, labels in self.labels.items()},
+            "bytes": sum(bitmaps.nbytes for bitmaps in self.bitmaps.values()),
+            "fragments": self.fragments.stats()
         }
-        
-        // Store competitor data globally
-        window.competitorData = null;
-        
-        function setCompetitorMetric(metric) {
-            const valueBtn = document.getElementById('compValueBtn');
-            const volumeBtn = document.getElementById('compVolumeBtn');
-            const header = document.getElementById('marketShareHeader');
-            
-            if (metric === 'value') {
-                valueBtn.style.background = '#1a237e';
-                valueBtn.style.color = 'white';
-                valueBtn.style.border = 'none';
-                volumeBtn.style.background = 'white';
-                volumeBtn.style.color = '#555';
-                volumeBtn.style.border = '2px solid #ddd';
-                header.textContent = 'Market Share (Value)';
-            } else {
-                volumeBtn.style.background = '#1a237e';
-                volumeBtn.style.color = 'white';
-                volumeBtn.style.border = 'none';
-                valueBtn.style.background = 'white';
-                valueBtn.style.color = '#555';
-                valueBtn.style.border = '2px solid #ddd';
-                header.textContent = 'Market Share (Volume)';
-            }
-            
-            // Update market share cells
-            if (window.competitorData) {
-                const cells = document.querySelectorAll('.market-share-cell');
-                window.competitorData.competitors.forEach((comp, index) => {
-                    if (cells[index]) {
-                        cells[index].textContent = metric === 'value' ? 
-                            comp.market_share_value + '%' : 
-                            comp.market_share_volume + '%';
-                    }
-                });
-                
-                // Update pie chart
-                if (window.supplierChartInstance) {
-                    window.supplierChartInstance.destroy();
-                }
-                
-                // Re-render chart with new metric
-                const chartData = {
-                    labels: window.competitorData.competitors.slice(0, 10).map(c => c.name.substring(0, 20)),
-                    values: window.competitorData.competitors.slice(0, 10).map(c => 
-                        metric === 'value' ? c.market_share_value : c.market_share_volume
-                    )
-                };
-                renderSupplierChart(chartData);
-                
-                // Update chart title
-                const chartTitle = document.querySelector('.chart-container h3');
-                if (chartTitle) {
-                    chartTitle.textContent = metric === 'value' ? 
-                        'Market Share by Supplier (Value-based)' : 
-                        'Market Share by Supplier (Volume-based)';
-                }
+
+_bitmap_index = None
+_bitmap_index_lock = threading.Lock()
+
+def get_bitmap_index(snapshot):
+    """Bitmap index for a snapshot, built once per dataset version"""
+    global _bitmap_index
+    with _bitmap_index_lock:
+        if _bitmap_index is None or _bitmap_index.version != snapshot.version:
+            started = time.perf_counter()
+            _bitmap_index = BitmapIndex(snapshot)
+            print(f"🗂️ Bitmap index: {_bitmap_index.stats()['bytes'] / 1e6:.1f} MB in {time.perf_counter() - started:.2f}s")
+        return _bitmap_index
+
+# =============================================================================
+# Startup pipeline and readiness
+# =============================================================================
+
+# Past this many seconds /ready stops waiting for the prewarm to finish
+STARTUP_BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", 20))
+
+REQUIRED_COLUMNS = {
+    'DATE', 'DESTINATION_COUNTRY', 'ORIGIN_COUNTRY', 'SHIPPER_NAME', 'CONSIGNEE_NAME',
+    'PRODUCT_TYPE', 'SIZE', 'THICKNESS', 'QUANTITY', 'UNIT_PRICE_USD', 'TOTAL_VALUE_USD'
+}
+
+# Phase name -> seconds, in the order they ran
+startup_phases = OrderedDict()
+
+startup_status = {
+    "started": None,
+    "schema_ok": False,
+    "error": None
+}
+
+def record_startup_phase(name, seconds):
+    startup_phases[name] = round(seconds, 3)
+    print(f"⏱️ Startup phase {name}: {seconds:.2f}s")
+    if name == "prewarm":
+        total = sum(startup_phases.values())
+        budget = "within" if total <= STARTUP_BUDGET_SECONDS else "OVER"
+        print(f"✅ Fully warm after {total:.2f}s ({budget} the {STARTUP_BUDGET_SECONDS:.0f}s budget)")
+
+# Lookups that would otherwise scan mirror_shipments; created at startup if missing
+SHIPMENT_INDEXES = {
+    "idx_shipments_consignee": "CONSIGNEE_NAME, DATE",
+    "idx_shipments_shipper": "SHIPPER_NAME, DATE",
+    "idx_shipments_price_outlier": "PRICE_OUTLIER, DATE",
+}
+
+def ensure_indexes(conn):
+    """Create any missing SHIPMENT_INDEXES (a no-op once they exist)"""
+    existing = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'mirror_shipments'"
+    )}
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(mirror_shipments)")}
+    created = [name for name, spec in SHIPMENT_INDEXES.items()
+               if name not in existing and spec.split(',')[0] in columns]
+    for name in created:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON mirror_shipments({SHIPMENT_INDEXES[name]})")
+        print(f"🗂️ Created index {name}")
+    if created:
+        # Without statistics the planner walks these indexes for every GROUP BY on the name columns
+        conn.execute("ANALYZE mirror_shipments")
+    conn.commit()
+
+def check_schema(conn):
+    """Make sure mirror_shipments has every column the endpoints query"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(mirror_shipments)")}
+    missing = REQUIRED_COLUMNS - columns
+    if missing:
+        raise RuntimeError(f"mirror_shipments is missing columns: {', '.join(sorted(missing))}")
+
+@app.on_event("startup")
+async def run_startup():
+    """Open the database, check the schema and prewarm in the background"""
+    startup_status["started"] = time.perf_counter()
+    admission.loop = asyncio.get_running_loop()
+    try:
+        started = time.perf_counter()
+        conn = get_db_connection()
+        conn.execute("SELECT 1")
+        record_startup_phase("db_open", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        try:
+            check_schema(conn)
+            record_startup_phase("schema_check", time.perf_counter() - started)
+            startup_status["schema_ok"] = True
+
+            started = time.perf_counter()
+            # Every worker runs these; the lock makes each check-then-create atomic between them
+            with _snapshot_build_lock():
+                for ensure in (ensure_price_outliers, ensure_indexes, ensure_search_index):
+                    try:
+                        ensure(conn)
+                    except sqlite3.Error as e:
+                        # A read-only database still serves everything, only slower
+                        print(f"⚠️ {ensure.__name__} failed: {e}")
+            record_startup_phase("indexes", time.perf_counter() - started)
+        finally:
+            conn.close()
+    except (sqlite3.Error, RuntimeError) as e:
+        startup_status["error"] = str(e)
+        print(f"❌ Startup check failed: {e}")
+
+    load_access_log()
+    try:
+        resume_jobs()
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not resume background jobs: {e}")
+    # Keep a reference so the task isn't garbage collected
+    app.state.prewarm_task = asyncio.create_task(prewarm_loop())
+    app.state.version_watch_task = asyncio.create_task(version_watch_loop())
+    app.state.job_sweep_task = asyncio.create_task(job_sweep_loop())
+
+@app.on_event("shutdown")
+async def run_shutdown():
+    save_access_log()
+    if _revalidate_pool is not None:
+        _revalidate_pool.shutdown(wait=False, cancel_futures=True)
+    if _job_pool is not None:
+        # Unfinished jobs pick up from their checkpoint after the restart
+        _job_pool.shutdown(wait=False, cancel_futures=True)
+
+@app.get("/healthz")
+def liveness():
+    """The process is up"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+def readiness():
+    """Ready once the schema is checked and the cache is warm (or the startup budget ran out)"""
+    elapsed = time.perf_counter() - startup_status["started"] if startup_status["started"] else 0
+    warm = prewarm_status["state"] == "warm"
+    ready = startup_status["schema_ok"] and (warm or elapsed > STARTUP_BUDGET_SECONDS)
+    body = {
+        "ready": ready,
+        "warm": warm,
+        "error": startup_status["error"],
+        "uptime_seconds": round(elapsed, 3),
+        "budget_seconds": STARTUP_BUDGET_SECONDS,
+        "phases": startup_phases,
+        "prewarm": prewarm_status
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+# =============================================================================
+# HTTP caching for API responses
+# =============================================================================
+
+API_MAX_AGE = int(os.environ.get("API_MAX_AGE", 60))
+API_STALE_WHILE_REVALIDATE = int(os.environ.get("API_STALE_WHILE_REVALIDATE", 600))
+
+@functools.lru_cache(maxsize=1)
+def cached_api_routes():
+    """Route path -> result cache name for every cached API endpoint"""
+    return {
+        route.path: route.endpoint.cache_name
+        for route in app.routes
+        if hasattr(getattr(route, 'endpoint', None), 'cache_name')
+    }
+
+def api_etag(name, query_params):
+    """ETag for an API request: dataset version + endpoint + canonical filters"""
+    _, params = CACHED_ENDPOINTS[name]
+    filters = {}
+    for param in params:
+        values = query_params.getlist(param)
+        if values:
+            filters[param] = values if param == 'countries' else values[-1]
+    key = cache_key(name, filters)
+    response_format = query_params.get('format')
+    digest = hashlib.sha1(json.dumps([get_dataset_version(), *key, response_format]).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in candidates or f"W/{etag}" in candidates
+
+@app.middleware("http")
+async def api_http_cache(request, call_next):
+    """ETag / Cache-Control for cached API endpoints, answering 304 without recomputing"""
+    name = cached_api_routes().get(request.url.path) if request.method == "GET" else None
+    if name is None:
+        return await call_next(request)
+    try:
+        etag = api_etag(name, request.query_params)
+    except ValueError:
+        # Malformed filter values - let FastAPI report the validation error
+        return await call_next(request)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={API_MAX_AGE}, stale-while-revalidate={API_STALE_WHILE_REVALIDATE}",
+        "X-Dataset-Version": get_dataset_version()
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response = await call_next(request)
+    if response.headers.get("x-cache") == "stale":
+        # Computed from older data - must not be stored under the current ETag
+        response.headers["Cache-Control"] = "no-store"
+    elif response.status_code == 200:
+        response.headers.update(headers)
+    return response
+
+# =============================================================================
+# Distinct-buyer sketches
+# =============================================================================
+
+# 2^HLL_PRECISION one-byte registers per sketch; standard error ~1.04/sqrt(2^p)
+HLL_PRECISION = int(os.environ.get("HLL_PRECISION", "10"))
+
+def _hll_hashes(names):
+    """(register index, rank) for every consignee name, hashed once per distinct name"""
+    import numpy as np
+    p = HLL_PRECISION
+    index = np.zeros(len(names), dtype=np.int64)
+    rank = np.zeros(len(names), dtype=np.uint8)
+    for code, name in enumerate(names):
+        if name is None:
+            continue  # COUNT(DISTINCT) ignores NULL, so rank 0 leaves registers alone
+        h = int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), 'big')
+        index[code] = h >> (64 - p)
+        rest = h & ((1 << (64 - p)) - 1)
+        rank[code] = (64 - p) - rest.bit_length() + 1
+    return index, rank
+
+def build_buyer_sketches(snapshot):
+    """HyperLogLog registers of CONSIGNEE_NAME per month x country x product type x listed partition
+
+    listed is 0 for names the buyer list hides (LIKE '%ORDER%'), so /api/buyers
+    can leave them out while /api/overview merges both.
+    """
+    import numpy as np
+    month_keys, month_codes = np.unique(snapshot['DATE'] // 100, return_inverse=True)
+    names = snapshot.dictionaries['CONSIGNEE_NAME']
+    listed_names = np.array([name is not None and 'ORDER' not in name.upper() for name in names])
+    name_codes = snapshot['CONSIGNEE_NAME']
+    keys = [month_codes.ravel(), snapshot['DESTINATION_COUNTRY'], snapshot['PRODUCT_TYPE'], listed_names[name_codes]]
+    shape = (len(month_keys), len(snapshot.dictionaries['DESTINATION_COUNTRY']), len(snapshot.dictionaries['PRODUCT_TYPE']), 2)
+    partitions, partition_index = np.unique(np.ravel_multi_index(keys, shape), return_inverse=True)
+
+    register_index, rank = _hll_hashes(names)
+    registers = np.zeros((len(partitions), 1 << HLL_PRECISION), dtype=np.uint8)
+    np.maximum.at(registers, (partition_index.ravel(), register_index[name_codes]), rank[name_codes])
+
+    month, country, product_type, listed = np.unravel_index(partitions, shape)
+    return {
+        "months": [f"{key // 100:04d}-{key % 100:02d}" if key else None for key in month_keys.tolist()],
+        "month": month.astype(np.uint16),
+        "country": country.astype(np.uint16),
+        "product_type": product_type.astype(np.uint16),
+        "listed": listed.astype(np.uint8),
+        "registers": registers
+    }
+
+def get_buyer_sketches():
+    """Sketches for the current dataset version, built alongside the snapshot"""
+    snapshot = get_snapshot()
+    key = ('sketches', 'consignee', None)
+    sketches = result_cache.get(key, snapshot.version)
+    if sketches is None:
+        sketches = build_buyer_sketches(snapshot)
+        result_cache.put(key, snapshot.version, sketches)
+    return snapshot, sketches
+
+def hll_estimate(registers):
+    """Cardinality estimate for one merged register array"""
+    import numpy as np
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int32)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)  # Linear counting for small sets
+    return int(round(estimate))
+
+def estimate_unique_buyers(countries=None, product_type=None, date_range=None, listed_only=False, only_product_type=None):
+    """Approximate COUNT(DISTINCT CONSIGNEE_NAME), or None when the filters are finer than the partitions"""
+    import numpy as np
+    if date_range not in (None, 'all', '2023', '2024', '2025'):
+        return None
+    snapshot, sketches = get_buyer_sketches()
+    selected = np.ones(len(sketches["month"]), dtype=bool)
+
+    def codes(column, values):
+        return [code for code, value in enumerate(snapshot.dictionaries[column]) if value in values]
+
+    if countries:
+        selected &= np.isin(sketches["country"], codes('DESTINATION_COUNTRY', countries))
+    for value in (product_type, only_product_type):
+        if value and value != 'all':
+            selected &= np.isin(sketches["product_type"], codes('PRODUCT_TYPE', [value]))
+    if listed_only:
+        selected &= sketches["listed"] == 1
+    if date_range and date_range != 'all':
+        months = sketches["months"]
+        if date_range == '2025':
+            wanted = [code for code, month in enumerate(months) if month and month >= '2025-01']
+        else:
+            wanted = [code for code, month in enumerate(months) if month and month.startswith(date_range + '-')]
+        selected &= np.isin(sketches["month"], wanted)
+    if not selected.any():
+        return 0
+    return hll_estimate(sketches["registers"][selected].max(axis=0))
+
+# =============================================================================
+# Data cube for client-side filtering
+# =============================================================================
+
+def build_cube(snapshot):
+    """Roll the snapshot up to month x country x product type x size x thickness cells"""
+    import numpy as np
+    month_keys, month_codes = np.unique(snapshot['DATE'] // 100, return_inverse=True)
+    thickness_values, thickness_codes = np.unique(snapshot['THICKNESS'], return_inverse=True)
+    dimensions = {
+        # Thickness labels match SQLite's CAST(THICKNESS as TEXT)
+        "month": ([f"{key // 100:04d}-{key % 100:02d}" if key else None for key in month_keys.tolist()], month_codes),
+        "country": (snapshot.dictionaries['DESTINATION_COUNTRY'], snapshot['DESTINATION_COUNTRY']),
+        "product_type": (snapshot.dictionaries['PRODUCT_TYPE'], snapshot['PRODUCT_TYPE']),
+        "size": (snapshot.dictionaries['SIZE'], snapshot['SIZE']),
+        "thickness": ([None if np.isnan(v) else repr(v) for v in thickness_values.tolist()], thickness_codes)
+    }
+    shape = tuple(len(labels) for labels, _ in dimensions.values())
+    flat = np.ravel_multi_index([codes.ravel() for _, codes in dimensions.values()], shape)
+    cells, cell_index = np.unique(flat, return_inverse=True)
+    cell_index = cell_index.ravel()
+    n = len(cells)
+
+    value = snapshot['TOTAL_VALUE_USD']
+    quantity = snapshot['QUANTITY']
+    price = snapshot['UNIT_PRICE_USD']
+    # Same rows /api/pricing averages in SQL
+    if 'PRICE_OUTLIER' in snapshot.arrays:
+        clean_price = snapshot['PRICE_OUTLIER'] == 0
+    else:
+        with np.errstate(invalid='ignore'):
+            clean_price = (price > 0) & (price < LEGACY_PRICE_CEILING)
+
+    def total(weights=None):
+        return np.bincount(cell_index, weights=weights, minlength=n)
+
+    columns = {}
+    for name, codes in zip(dimensions, np.unravel_index(cells, shape)):
+        columns[name] = codes.astype(np.uint16 if shape[list(dimensions).index(name)] <= 0xFFFF else np.uint32)
+    columns.update({
+        "shipments": total().astype(np.uint32),
+        "total_value": total(np.nan_to_num(value)),
+        "value_count": total(~np.isnan(value)).astype(np.uint32),
+        "quantity": total(np.nan_to_num(quantity)),
+        "price_sum": total(np.nan_to_num(price)),
+        "price_count": total(~np.isnan(price)).astype(np.uint32),
+        "clean_price_sum": total(np.where(clean_price, price, 0.0)),
+        "clean_price_count": total(clean_price).astype(np.uint32)
+    })
+    return {name: labels for name, (labels, _) in dimensions.items()}, columns
+
+def encode_cube(version, dimensions, columns, **extra):
+    """uint32 header length, JSON header, then 8-byte aligned little-endian arrays"""
+    layout = []
+    chunks = []
+    offset = 0
+    for name, arr in columns.items():
+        padding = -offset % 8
+        chunks.append(b'\0' * padding)
+        offset += padding
+        layout.append({"name": name, "dtype": arr.dtype.name, "offset": offset, "length": arr.size})
+        data = arr.astype(arr.dtype.newbyteorder('<')).tobytes()
+        chunks.append(data)
+        offset += len(data)
+    cells = len(next(iter(columns.values()))) if columns else 0
+    header = json.dumps({
+        "version": version,
+        "cells": cells,
+        "dimensions": dimensions,
+        "columns": layout,
+        **extra
+    }).encode()
+    prefix = len(header).to_bytes(4, 'little') + header
+    prefix += b'\0' * (-len(prefix) % 8)
+    return prefix + b''.join(chunks)
+
+def get_cube_payload():
+    """(raw, gzipped) cube for the current dataset version"""
+    key = ('cube', 'binary', None)
+    version = get_dataset_version()
+    payload = result_cache.get(key, version)
+    if payload is None:
+        payload = single_flight.do((key, version), lambda: build_cube_payload(key, version))
+    return payload
+
+def build_cube_payload(key, version):
+    """Encode and compress the cube with the buyer sketches"""
+    import numpy as np
+    snapshot, sketches = get_buyer_sketches()
+    dimensions, columns = build_cube(snapshot)
+    # Partitions use the cube's month, country and product type codes. Most
+    # registers are empty, so only (register, rank) pairs are shipped
+    partition, register = np.nonzero(sketches["registers"])
+    columns.update({
+        "sketch_month": sketches["month"],
+        "sketch_country": sketches["country"],
+        "sketch_product_type": sketches["product_type"],
+        "sketch_offsets": np.searchsorted(partition, np.arange(len(sketches["month"]) + 1)).astype(np.uint32),
+        "sketch_register": register.astype(np.uint16),
+        "sketch_rank": sketches["registers"][partition, register]
+    })
+    raw = encode_cube(snapshot.version, dimensions, columns, hll_precision=HLL_PRECISION)
+    payload = (raw, gzip.compress(raw, 6))
+    result_cache.put(key, version, payload)
+    return payload
+
+@app.get("/api/cube")
+def get_cube(request: Request):
+    """Compact binary rollup the dashboard's Web Worker filters locally"""
+    version = get_dataset_version()
+    etag = '"cube-' + hashlib.sha1(version.encode()).hexdigest()[:20] + '"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={API_MAX_AGE}, stale-while-revalidate={API_STALE_WHILE_REVALIDATE}",
+        "X-Dataset-Version": version,
+        "Vary": "Accept-Encoding"
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    raw, compressed = get_cube_payload()
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(compressed, media_type="application/octet-stream", headers=headers)
+    return Response(raw, media_type="application/octet-stream", headers=headers)
+
+# =============================================================================
+# Dataset change notifications
+# =============================================================================
+
+VERSION_POLL_SECONDS = float(os.environ.get("VERSION_POLL_SECONDS", 5))
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+
+def dataset_digest():
+    """(month, country) -> summary of its rows, to tell which cells an ingest touched"""
+    conn = get_db_connection(interruptible=False)
+    try:
+        rows = conn.execute("""
+            SELECT substr(DATE, 1, 7), DESTINATION_COUNTRY, COUNT(*), TOTAL(TOTAL_VALUE_USD), TOTAL(QUANTITY), TOTAL(rowid)
+            FROM mirror_shipments
+            GROUP BY 1, 2
+        """).fetchall()
+    finally:
+        conn.close()
+    return {(row[0], row[1]): tuple(row[2:]) for row in rows}
+
+def _sorted_labels(values):
+    return sorted(values, key=lambda value: (value is None, value or ''))
+
+class VersionBroadcaster:
+    """Fans each dataset-change event out to every open /api/events stream
+
+    The event is encoded once and the same bytes are queued for every
+    listener. A listener that falls behind gets a single catch-all event
+    instead of the backlog.
+    """
+
+    QUEUE_SIZE = 16
+
+    def __init__(self):
+        self.listeners = set()
+        self.published = 0
+
+    @staticmethod
+    def encode(event):
+        return f"event: version\nid: {event['version']}\ndata: {json.dumps(event)}\n\n".encode()
+
+    def subscribe(self):
+        queue = asyncio.Queue(self.QUEUE_SIZE)
+        self.listeners.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.listeners.discard(queue)
+
+    def publish(self, event):
+        message = self.encode(event)
+        for queue in self.listeners:
+            if queue.full():
+                while not queue.empty():
+                    queue.get_nowait()
+                # months/countries of None mean "assume everything changed"
+                message_for_queue = self.encode(dict(event, months=None, countries=None))
+            else:
+                message_for_queue = message
+            queue.put_nowait(message_for_queue)
+        self.published += 1
+
+    def stats(self):
+        return {"listeners": len(self.listeners), "published": self.published}
+
+broadcaster = VersionBroadcaster()
+
+def watch_price_outliers():
+    """After a dataset change, recompute stale price bounds or pick up another process's refresh"""
+    conn = get_db_connection(interruptible=False)
+    try:
+        with _snapshot_build_lock():
+            refresh_stale_price_outliers(conn)
+    finally:
+        conn.close()
+
+async def version_watch_loop():
+    """Publish an event with the changed months and countries whenever the dataset version moves"""
+    version = get_dataset_version()
+    try:
+        digest = await asyncio.to_thread(dataset_digest)
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not summarise the dataset: {e}")
+        digest = None
+    while True:
+        await asyncio.sleep(VERSION_POLL_SECONDS)
+        current = get_dataset_version()
+        if current == version:
+            continue
+        if price_outlier_status["ready"]:
+            try:
+                await asyncio.to_thread(watch_price_outliers)
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not refresh price outliers: {e}")
+        event = {"version": current, "previous": version, "months": None, "countries": None,
+                 "at": datetime.now().isoformat(timespec='seconds')}
+        try:
+            new_digest = await asyncio.to_thread(dataset_digest)
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not summarise the dataset: {e}")
+            new_digest = None
+        if digest is not None and new_digest is not None:
+            changed = {cell for cell in digest.keys() | new_digest.keys() if digest.get(cell) != new_digest.get(cell)}
+            event["months"] = _sorted_labels({month for month, _ in changed})
+            event["countries"] = _sorted_labels({country for _, country in changed})
+            print(f"📣 Dataset changed: {len(changed)} month x country cell(s), {len(broadcaster.listeners)} listener(s)")
+        broadcaster.publish(event)
+        version, digest = current, new_digest
+
+@app.get("/api/events")
+async def dataset_events():
+    """Server-sent events announcing dataset version changes"""
+    queue = broadcaster.subscribe()
+
+    async def stream():
+        try:
+            # Tells a (re)connecting page which version is current; it refetches everything if it is behind
+            yield b"retry: 5000\n" + broadcaster.encode({"version": get_dataset_version(), "months": None, "countries": None})
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"})
+
+@app.get("/api/version")
+def get_version():
+    """Current dataset version, for clients validating their cached responses"""
+    return JSONResponse({"version": get_dataset_version()}, headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    """Result cache and prewarm status"""
+    return {
+        "dataset_version": get_dataset_version(),
+        "cache": result_cache.stats(),
+        "persistent_cache": persistent_cache.stats() if persistent_cache else None,
+        "snapshot": snapshot_stats(),
+        "bitmap_index": _bitmap_index.stats() if _bitmap_index is not None else None,
+        "single_flight": single_flight.stats(),
+        "revalidation": revalidation_stats(),
+        "admission": admission.stats(),
+        "events": broadcaster.stats(),
+        "price_outliers": price_outlier_status,
+        "prewarm": prewarm_status
+    }
+
+@app.get("/", response_class=HTMLResponse)
+def dashboard():
+    """Serve the multi-tab dashboard"""
+    # The shell is tiny; CSS, JS and Chart.js come from hashed, immutable URLs
+    return HTMLResponse(render_dashboard(), headers={"Cache-Control": "no-cache"})
+
+def render_dashboard():
+    """Dashboard HTML with the default overview and filter options embedded, cached per dataset version"""
+    key = ('page', 'dashboard.html', None)
+    version = get_dataset_version()
+    html = result_cache.get(key, version)
+    if html is None:
+        try:
+            initial_state = {
+                "version": version,
+                "overview": get_cached_result("overview", {}, record=False),
+                "filter_options": get_cached_result("filter_options", {}, record=False)
             }
-        }
-        
-        function renderSupplierChart(data) {
-            const ctx = document.getElementById('supplierChart').getContext('2d');
-            window.supplierChartInstance = new Chart(ctx, {
-                type: 'pie',
-                data: {
-                    labels: data.labels,
-                    datasets: [{
-                        data: data.values,
-                        backgroundColor: [
-                            '#667eea', '#764ba2', '#28a745', '#ffc107', 
-                            '#dc3545', '#17a2b8', '#6610f2', '#e83e8c',
-                            '#fd7e14', '#20c997'
-                        ]
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    plugins: {
-                        legend: {
-                            position: 'right'
-                        },
-                        tooltip: {
-                            callbacks: {
-                                label: function(context) {
-                                    return context.label + ': ' + context.parsed + '%';
-                                }
-                            }
-                        }
-                    }
-                }
-            });
-        }
-        
-        function renderPriceChart(data) {
-            // Placeholder for price chart if needed
-        }
-        
-        function renderCountryChart(data) {
-            const metric = window.currentMetric || 'volume';
-            const values = metric === 'value' ? data.value_pct : data.volume_pct;
-            const label = metric === 'value' ? 'Market Share by Value (%)' : 'Market Share by Volume (Sheets %)';
-            
-            const ctx = document.getElementById('countryChart').getContext('2d');
-            
-            // Simple, professional colors
-            const colors = [
-                '#667eea', '#764ba2', '#28a745', '#ffc107', '#dc3545', 
-                '#17a2b8', '#6610f2', '#e83e8c', '#fd7e14', '#20c997',
-                '#6c757d', '#343a40', '#007bff', '#6f42c1', '#e74c3c'
-            ];
-            
-            window.countryChartInstance = new Chart(ctx, {
-                type: 'bar',
-                data: {
-                    labels: data.labels.map(label => {
-                        // Shorten country names for better display
-                        const shortNames = {
-                            'UNITED ARAB EMIRATES': 'UAE',
-                            'SAUDI ARABIA': 'Saudi Arabia'
-                        };
-                        return shortNames[label] || label;
-                    }),
-                    datasets: [{
-                        label: label,
-                        data: values,
-                        backgroundColor: colors,
-                        borderRadius: 5,
-                        barThickness: 40,
-                        maxBarThickness: 50
-                    }]
-                },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    plugins: {
-                        legend: {
-                            display: false
-                        },
-                        tooltip: {
-                            backgroundColor: 'rgba(0, 0, 0, 0.8)',
-                            padding: 12,
-                            titleFont: {
-                                size: 14,
-                                weight: 'bold'
-                            },
-                            bodyFont: {
-                                size: 13
-                            },
-                            callbacks: {
-                                label: function(context) {
-                                    return context.parsed.y.toFixed(1) + '% of total market';
-                                },
-                                afterLabel: function(context) {
-                                    const actualValue = metric === 'value' ? 
-                                        'Value: $' + (context.parsed.y * 2.5).toFixed(1) + 'M' :
-                                        'Volume: ' + (context.parsed.y * 100000).toFixed(0) + ' sheets';
-                                    return actualValue;
-                                }
-                            }
-                        }
-                    },
-                    scales: {
-                        x: {
-                            grid: {
-                                display: false
-                            },
-                            ticks: {
-                                font: {
-                                    size: 11,
-                                    weight: '600'
-                                },
-                                color: '#495057',
-                                autoSkip: false,
-                                maxRotation: 45,
-                                minRotation: 45
-                            }
-                        },
-                        y: {
-                            beginAtZero: true,
-                            max: Math.max(...values) + 5,
-                            grid: {
-                                color: 'rgba(0, 0, 0, 0.05)',
-                                drawBorder: false
-                            },
-                            ticks: {
-                                font: {
-                                    size: 11
-                                },
-                                color: '#6c757d',
-                                callback: function(value) {
-                                    return value + '%';
-                                }
-                            }
-                        }
-                    }
-                }
-            });
-        }
-        
-        // Select All functionality
-        document.getElementById('selectAll').addEventListener('change', function() {
-            const checkboxes = document.querySelectorAll('#countryCheckboxes input[type="checkbox"]');
-            checkboxes.forEach(cb => cb.checked = this.checked);
-        });
-        
-        // Update Select All when individual checkboxes change
-        document.querySelectorAll('#countryCheckboxes input[type="checkbox"]').forEach(cb => {
-            cb.addEventListener('change', function() {
-                const allCheckboxes = document.querySelectorAll('#countryCheckboxes input[type="checkbox"]');
-                const checkedBoxes = document.querySelectorAll('#countryCheckboxes input[type="checkbox"]:checked');
-                document.getElementById('selectAll').checked = allCheckboxes.length === checkedBoxes.length;
-            });
-        });
-        
-        // Add hover effect to checkbox labels
-        document.querySelectorAll('#countryCheckboxes label').forEach(label => {
-            label.addEventListener('mouseenter', function() {
-                this.style.background = '#f5f5f5';
-            });
-            label.addEventListener('mouseleave', function() {
-                this.style.background = 'transparent';
-            });
-        });
-        
-        // Export functionality
-        function exportToExcel() {
-            const activeTab = document.querySelector('.tab-button.active').textContent.toLowerCase();
-            alert('Export functionality will be available soon! Current tab: ' + activeTab);
-            // You can implement actual export here by calling an API endpoint
-        }
-        
-        // Initialize
-        window.onload = () => {
-            // Hide custom date pickers initially
-            document.getElementById('customDatePickers').style.display = 'none';
-            
-            // Initialize country checkboxes event listeners
-            document.getElementById('selectAll').addEventListener('change', function() {
-                const checkboxes = document.querySelectorAll('#countryCheckboxes input[type="checkbox"]');
-                checkboxes.forEach(cb => cb.checked = this.checked);
-                updateFilterChip('countries');
-            });
-            
-            document.querySelectorAll('#countryCheckboxes input[type="checkbox"]').forEach(cb => {
-                cb.addEventListener('change', () => {
-                    updateFilterChip('countries');
-                    // Update select all checkbox
-                    const allChecked = document.querySelectorAll('#countryCheckboxes input[type="checkbox"]:checked').length === 
-                                      document.querySelectorAll('#countryCheckboxes input[type="checkbox"]').length;
-                    document.getElementById('selectAll').checked = allChecked;
-                });
-            });
-            
-            // Initialize filter chip values
-            updateFilterChip('countries');
-            updateFilterChip('product');
-            updateFilterChip('size');
-            updateFilterChip('thickness');
-            updateFilterChip('value');
-            updateFilterChip('date');
-            
-            applyFilters();
-        };
-    </script>
-</body>
-</html>
-"""
+        except sqlite3.Error as e:
+            # The page still works, it just loads the overview through the API
+            print(f"⚠️ Could not embed initial state: {e}")
+            return get_templates().get_template("dashboard.html").render(initial_state=None)
+        initial_state = json.loads(json.dumps(initial_state, default=_json_default))
+        html = get_templates().get_template("dashboard.html").render(initial_state=initial_state)
+        result_cache.put(key, version, html)
+    return html
 
-@app.get("/api/overview")
-async def get_overview(
+@cached_endpoint("filter_options")
+def get_filter_options():
+    """Values and shipment counts for every filter dimension"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    dimensions = [
+        ("countries", "DESTINATION_COUNTRY"),
+        ("product_type", "PRODUCT_TYPE"),
+        ("size", "SIZE"),
+        ("thickness", "THICKNESS"),
+        ("year", "substr(DATE, 1, 4)")
+    ]
+    options = {}
+    for name, column in dimensions:
+        cursor.execute(f"""
+            SELECT {column} as value, COUNT(*) as count
+            FROM mirror_shipments
+            GROUP BY {column}
+            ORDER BY count DESC
+        """)
+        options[name] = [{"value": row[0], "count": row[1]} for row in cursor.fetchall()]
+    
+    conn.close()
+    
+    return options
+
+DATE_RANGES = ('all', '2025', '2024', '2023', 'recent', 'last6', 'last3', 'custom')
+
+def date_range_condition(date_range, custom_start=None, custom_end=None):
+    """(SQL condition, params) for a date_range filter, or (None, []) for all time
+
+    Every endpoint filters dates through here. A custom range with only one end
+    set is open on the other side.
+    """
+    if date_range == 'custom':
+        if custom_start and custom_end:
+            return "DATE BETWEEN ? AND ?", [custom_start, custom_end]
+        if custom_start:
+            return "DATE >= ?", [custom_start]
+        if custom_end:
+            return "DATE <= ?", [custom_end]
+        return None, []
+    conditions = {
+        '2025': "DATE >= '2025-01-01'",
+        '2024': "DATE BETWEEN '2024-01-01' AND '2024-12-31'",
+        '2023': "DATE BETWEEN '2023-01-01' AND '2023-12-31'",
+        'recent': "DATE >= date('now', '-12 months')",
+        'last6': "DATE >= date('now', '-6 months')",
+        'last3': "DATE >= date('now', '-3 months')",
+    }
+    condition = conditions.get(date_range)
+    return (condition, []) if condition else (None, [])
+
+ARTIS_SIZES = ('2440x1220', '1220x2440')
+ARTIS_THICKNESS = (0.7, 0.8, 1.0)
+
+# Facet name -> bitmap index dimension
+FACET_DIMENSIONS = {
+    "countries": "country",
+    "product_type": "product_type",
+    "size": "size",
+    "thickness": "thickness",
+    "year": "year"
+}
+
+# Relative date range -> months back, as in date_range_condition's date('now', '-N months')
+RELATIVE_DATE_MONTHS = {'recent': 12, 'last6': 6, 'last3': 3}
+
+def _months_ago_key(months):
+    """date('now', '-N months') as a date key; day overflow rolls into the next month like SQLite"""
+    today = date.today()
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    day = date(year, month + 1, 1) + timedelta(days=today.day - 1)
+    return day.year * 10000 + day.month * 100 + day.day
+
+def snapshot_filter_bitmaps(snapshot, index, countries=None, product_type=None, size=None, thickness=None,
+                            min_value=None, date_range=None, custom_start=None, custom_end=None):
+    """Row bitmap per filtered dimension, matching the SQL filters of /api/overview
+
+    Dates follow date_range_condition for every DATE_RANGES key; any other
+    date_range raises ValueError rather than silently matching all rows.
+    """
+    import numpy as np
+    if date_range is not None and date_range not in DATE_RANGES:
+        raise ValueError(f"Unknown date_range {date_range!r}, expected one of {list(DATE_RANGES)}")
+    bitmaps = {}
+    if countries:
+        wanted = set(countries)
+        bitmaps["countries"] = index.select('country', lambda v: v in wanted)
+    if product_type and product_type != 'all':
+        bitmaps["product_type"] = index.select('product_type', lambda v: v == product_type)
+    if size and size != 'all':
+        if size == '1220x2440':
+            bitmaps["size"] = index.select('size', lambda v: v in ARTIS_SIZES)
+        elif size == 'other':
+            # NULL sizes fail both SQL comparisons
+            bitmaps["size"] = index.select('size', lambda v: v is not None and v not in ARTIS_SIZES)
+        else:
+            bitmaps["size"] = index.select('size', lambda v: v == size)
+    if thickness and thickness != 'all':
+        if thickness == 'other':
+            bitmaps["thickness"] = index.select('thickness', lambda v: v is None or v not in ARTIS_THICKNESS)
+        else:
+            bitmaps["thickness"] = index.select('thickness', lambda v: v == float(thickness))
+    if min_value:
+        with np.errstate(invalid='ignore'):
+            bitmaps["min_value"] = index.pack(snapshot['TOTAL_VALUE_USD'] >= min_value)
+    if date_range and date_range != 'all':
+        # Whole years resolve through the month bitmaps, day-level ranges scan DATE
+        if date_range in ('2023', '2024'):
+            bitmaps["year"] = index.select('month', lambda m: m // 100 == int(date_range))
+        elif date_range == '2025':
+            bitmaps["year"] = index.select('month', lambda m: m >= 202501)
+        else:
+            window = None
+            if date_range == 'custom' and (custom_start or custom_end):
+                # One end alone leaves the range open on the other side; missing dates never match
+                window = (_date_key(custom_start) if custom_start else 1,
+                          _date_key(custom_end) if custom_end else 99991231)
+            elif date_range in RELATIVE_DATE_MONTHS:
+                window = (_months_ago_key(RELATIVE_DATE_MONTHS[date_range]), 99991231)
+            if window:
+                dates = snapshot['DATE']
+                bitmaps["year"] = index.pack((dates >= window[0]) & (dates <= window[1]))
+    return bitmaps
+
+@app.get("/api/facets")
+@cached_endpoint("facets")
+def get_facets(
     countries: List[str] = Query(None),
     product_type: Optional[str] = None,
     size: Optional[str] = None,
@@ -1822,7 +2042,48 @@ async def get_overview(
     custom_start: Optional[str] = None,
     custom_end: Optional[str] = None
 ):
-    """Get overview statistics"""
+    """Shipment counts per filter option, each dimension counted under every other filter"""
+    import numpy as np
+    snapshot = get_snapshot()
+    index = get_bitmap_index(snapshot)
+    try:
+        filters = snapshot_filter_bitmaps(
+            snapshot, index, countries, product_type, size, thickness, min_value, date_range, custom_start, custom_end
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    facets = {}
+    for name, dimension in FACET_DIMENSIONS.items():
+        # Rows passing every filter except the dimension's own
+        rows = index.all
+        for other, bitmap in filters.items():
+            if other != name:
+                rows = rows & bitmap
+        counts = _popcount(index.bitmaps[dimension] & rows)
+        labels = index.labels[dimension]
+        order = np.argsort(-counts, kind='stable')
+        facets[name] = [{"value": labels[i], "count": int(counts[i])} for i in order.tolist() if counts[i]]
+    return facets
+
+@app.get("/api/overview")
+@cached_endpoint("overview")
+def get_overview(
+    countries: List[str] = Query(None),
+    product_type: Optional[str] = None,
+    size: Optional[str] = None,
+    thickness: Optional[str] = None,
+    min_value: Optional[float] = None,
+    date_range: Optional[str] = None,
+    custom_start: Optional[str] = None,
+    custom_end: Optional[str] = None,
+    exact: bool = False
+):
+    """Get overview statistics
+
+    Unique buyers come from the HyperLogLog sketches when the filters line up
+    with their partitions; exact=true always counts them precisely.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     
@@ -1859,26 +2120,23 @@ async def get_overview(
         where_conditions.append("TOTAL_VALUE_USD >= ?")
         params.append(min_value)
     
-    if date_range and date_range != 'all':
-        if date_range == 'custom' and custom_start and custom_end:
-            where_conditions.append(f"DATE BETWEEN '{custom_start}' AND '{custom_end}'")
-        elif date_range == '2025':
-            where_conditions.append("DATE >= '2025-01-01'")
-        elif date_range == '2024':
-            where_conditions.append("DATE BETWEEN '2024-01-01' AND '2024-12-31'")
-        elif date_range == '2023':
-            where_conditions.append("DATE BETWEEN '2023-01-01' AND '2023-12-31'")
-        elif date_range == 'recent':
-            where_conditions.append("DATE >= date('now', '-12 months')")
+    condition, date_params = date_range_condition(date_range, custom_start, custom_end)
+    if condition:
+        where_conditions.append(condition)
+        params.extend(date_params)
     
     where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
     
+    estimated_buyers = None
+    if not exact and size in (None, 'all') and thickness in (None, 'all') and not min_value:
+        estimated_buyers = estimate_unique_buyers(countries, product_type, date_range)
+    
     # Get statistics
     query = f"""
         SELECT 
             COUNT(*) as total_shipments,
             SUM(TOTAL_VALUE_USD) as total_value,
-            COUNT(DISTINCT CONSIGNEE_NAME) as unique_buyers,
+            {"NULL" if estimated_buyers is not None else "COUNT(DISTINCT CONSIGNEE_NAME)"} as unique_buyers,
             AVG(TOTAL_VALUE_USD) as avg_order_value,
             SUM(CASE WHEN PRODUCT_TYPE = 'SINGLE_SIDE' THEN 1 ELSE 0 END) as single_side_count,
             ROUND(SUM(CASE WHEN PRODUCT_TYPE = 'SINGLE_SIDE' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 1) as single_side_pct
@@ -1913,7 +2171,8 @@ async def get_overview(
     return {
         "total_shipments": stats[0] or 0,
         "total_value": stats[1] or 0,
-        "unique_buyers": stats[2] or 0,
+        "unique_buyers": estimated_buyers if estimated_buyers is not None else stats[2] or 0,
+        "unique_buyers_estimated": estimated_buyers is not None,
         "avg_order_value": stats[3] or 0,
         "single_side_count": stats[4] or 0,
         "single_side_pct": stats[5] or 0,
@@ -1926,7 +2185,8 @@ async def get_overview(
     }
 
 @app.get("/api/buyers")
-async def get_buyers(
+@cached_endpoint("buyers", columnar=('buyers',))
+def get_buyers(
     countries: List[str] = Query(None),
     product_type: Optional[str] = None,
     size: Optional[str] = None,
@@ -1934,9 +2194,14 @@ async def get_buyers(
     min_value: Optional[float] = None,
     date_range: Optional[str] = None,
     custom_start: Optional[str] = None,
-    custom_end: Optional[str] = None
+    custom_end: Optional[str] = None,
+    exact: bool = False
 ):
-    """Get buyer intelligence"""
+    """Get buyer intelligence
+
+    Buyer totals come from the HyperLogLog sketches when the filters line up
+    with their partitions; exact=true always counts them precisely.
+    """
     conn = get_db_connection()
     
     # Build WHERE clause
@@ -1967,22 +2232,10 @@ async def get_buyers(
         where_conditions.append("TOTAL_VALUE_USD >= ?")
         params.append(min_value)
     
-    # Add date range filter
-    if date_range and date_range != 'all':
-        if date_range == 'custom' and custom_start and custom_end:
-            where_conditions.append(f"DATE BETWEEN '{custom_start}' AND '{custom_end}'")
-        elif date_range == '2025':
-            where_conditions.append("DATE >= '2025-01-01'")
-        elif date_range == '2024':
-            where_conditions.append("DATE BETWEEN '2024-01-01' AND '2024-12-31'")
-        elif date_range == '2023':
-            where_conditions.append("DATE BETWEEN '2023-01-01' AND '2023-12-31'")
-        elif date_range == 'recent':
-            where_conditions.append("DATE >= date('now', '-12 months')")
-        elif date_range == 'last6':
-            where_conditions.append("DATE >= date('now', '-6 months')")
-        elif date_range == 'last3':
-            where_conditions.append("DATE >= date('now', '-3 months')")
+    condition, date_params = date_range_condition(date_range, custom_start, custom_end)
+    if condition:
+        where_conditions.append(condition)
+        params.extend(date_params)
     
     where_clause = " AND ".join(where_conditions)
     
@@ -2011,17 +2264,26 @@ async def get_buyers(
     cursor.execute(query, params)
     buyers = cursor.fetchall()
     
-    # Get total counts
-    count_query = f"""
-        SELECT 
-            COUNT(DISTINCT CONSIGNEE_NAME) as total_buyers,
-            COUNT(DISTINCT CASE WHEN PRODUCT_TYPE = 'SINGLE_SIDE' THEN CONSIGNEE_NAME END) as single_side_buyers
-        FROM mirror_shipments
-        WHERE {where_clause}
-    """
-    
-    cursor.execute(count_query, params)
-    counts = cursor.fetchone()
+    # Get total counts (the clauses above skip exact sizes and thickness 'other')
+    counts = None
+    if not exact and size not in ('1220x2440', 'other') and thickness in (None, 'all', 'other') and not min_value:
+        total_buyers = estimate_unique_buyers(countries, product_type, date_range, listed_only=True)
+        if total_buyers is not None:
+            counts = (total_buyers, estimate_unique_buyers(
+                countries, product_type, date_range, listed_only=True, only_product_type='SINGLE_SIDE'
+            ))
+    estimated = counts is not None
+    
+    if counts is None:
+        count_query = f"""
+            SELECT 
+                COUNT(DISTINCT CONSIGNEE_NAME) as total_buyers,
+                COUNT(DISTINCT CASE WHEN PRODUCT_TYPE = 'SINGLE_SIDE' THEN CONSIGNEE_NAME END) as single_side_buyers
+            FROM mirror_shipments
+            WHERE {where_clause}
+        """
+        cursor.execute(count_query, params)
+        counts = cursor.fetchone()
     
     conn.close()
     
@@ -2054,12 +2316,14 @@ async def get_buyers(
     return {
         "total_buyers": counts[0],
         "single_side_buyers": counts[1],
+        "buyer_counts_estimated": estimated,
         "artis_compatible_buyers": artis_compatible,
         "buyers": buyer_list
     }
 
 @app.get("/api/products")
-async def get_products(
+@cached_endpoint("products", columnar=('sizes', 'thickness'))
+def get_products(
     countries: List[str] = Query(None),
     product_type: Optional[str] = None,
     min_value: Optional[float] = None,
@@ -2101,22 +2365,10 @@ async def get_products(
         where_conditions.append("TOTAL_VALUE_USD >= ?")
         params.append(min_value)
     
-    # Add date range filter
-    if date_range and date_range != 'all':
-        if date_range == 'custom' and custom_start and custom_end:
-            where_conditions.append(f"DATE BETWEEN '{custom_start}' AND '{custom_end}'")
-        elif date_range == '2025':
-            where_conditions.append("DATE >= '2025-01-01'")
-        elif date_range == '2024':
-            where_conditions.append("DATE BETWEEN '2024-01-01' AND '2024-12-31'")
-        elif date_range == '2023':
-            where_conditions.append("DATE BETWEEN '2023-01-01' AND '2023-12-31'")
-        elif date_range == 'recent':
-            where_conditions.append("DATE >= date('now', '-12 months')")
-        elif date_range == 'last6':
-            where_conditions.append("DATE >= date('now', '-6 months')")
-        elif date_range == 'last3':
-            where_conditions.append("DATE >= date('now', '-3 months')")
+    condition, date_params = date_range_condition(date_range, custom_start, custom_end)
+    if condition:
+        where_conditions.append(condition)
+        params.extend(date_params)
     
     where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
     
@@ -2200,7 +2452,8 @@ async def get_products(
     }
 
 @app.get("/api/competitors")
-async def get_competitors(
+@cached_endpoint("competitors", columnar=('competitors',))
+def get_competitors(
     countries: List[str] = Query(None),
     product_type: Optional[str] = None,
     min_value: Optional[float] = None,
@@ -2242,22 +2495,10 @@ async def get_competitors(
         where_conditions.append("TOTAL_VALUE_USD >= ?")
         params.append(min_value)
     
-    # Add date range filter
-    if date_range and date_range != 'all':
-        if date_range == 'custom' and custom_start and custom_end:
-            where_conditions.append(f"DATE BETWEEN '{custom_start}' AND '{custom_end}'")
-        elif date_range == '2025':
-            where_conditions.append("DATE >= '2025-01-01'")
-        elif date_range == '2024':
-            where_conditions.append("DATE BETWEEN '2024-01-01' AND '2024-12-31'")
-        elif date_range == '2023':
-            where_conditions.append("DATE BETWEEN '2023-01-01' AND '2023-12-31'")
-        elif date_range == 'recent':
-            where_conditions.append("DATE >= date('now', '-12 months')")
-        elif date_range == 'last6':
-            where_conditions.append("DATE >= date('now', '-6 months')")
-        elif date_range == 'last3':
-            where_conditions.append("DATE >= date('now', '-3 months')")
+    condition, date_params = date_range_condition(date_range, custom_start, custom_end)
+    if condition:
+        where_conditions.append(condition)
+        params.extend(date_params)
     
     where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
     
@@ -2333,20 +2574,23 @@ async def get_competitors(
     }
 
 @app.get("/api/pricing")
-async def get_pricing(
+@cached_endpoint("pricing")
+def get_pricing(
     countries: List[str] = Query(None),
     product_type: Optional[str] = None,
     min_value: Optional[float] = None,
     size: Optional[str] = None,
     thickness: Optional[str] = None,
-    date_range: Optional[str] = None
+    date_range: Optional[str] = None,
+    custom_start: Optional[str] = None,
+    custom_end: Optional[str] = None
 ):
     """Get pricing analysis"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     # Build WHERE clause
-    where_conditions = ["UNIT_PRICE_USD > 0 AND UNIT_PRICE_USD < 500"]
+    where_conditions = [clean_price_sql()]
     params = []
     
     if countries:
@@ -2373,22 +2617,10 @@ async def get_pricing(
         where_conditions.append("TOTAL_VALUE_USD >= ?")
         params.append(min_value)
     
-    # Add date range filter
-    if date_range and date_range != 'all':
-        if date_range == 'custom' and custom_start and custom_end:
-            where_conditions.append(f"DATE BETWEEN '{custom_start}' AND '{custom_end}'")
-        elif date_range == '2025':
-            where_conditions.append("DATE >= '2025-01-01'")
-        elif date_range == '2024':
-            where_conditions.append("DATE BETWEEN '2024-01-01' AND '2024-12-31'")
-        elif date_range == '2023':
-            where_conditions.append("DATE BETWEEN '2023-01-01' AND '2023-12-31'")
-        elif date_range == 'recent':
-            where_conditions.append("DATE >= date('now', '-12 months')")
-        elif date_range == 'last6':
-            where_conditions.append("DATE >= date('now', '-6 months')")
-        elif date_range == 'last3':
-            where_conditions.append("DATE >= date('now', '-3 months')")
+    condition, date_params = date_range_condition(date_range, custom_start, custom_end)
+    if condition:
+        where_conditions.append(condition)
+        params.extend(date_params)
     
     where_clause = " AND ".join(where_conditions)
     
@@ -2440,35 +2672,26 @@ async def get_pricing(
     }
 
 @app.get("/api/insights")
-async def get_insights(
+@cached_endpoint("insights")
+def get_insights(
     countries: List[str] = Query(None),
     product_type: Optional[str] = None,
-    date_range: Optional[str] = None
+    date_range: Optional[str] = None,
+    custom_start: Optional[str] = None,
+    custom_end: Optional[str] = None
 ):
     """Get key insights and recommendations"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     # Build WHERE clause for date filtering
-    where_conditions = ["UNIT_PRICE_USD > 0 AND UNIT_PRICE_USD < 500"]
+    where_conditions = [clean_price_sql()]
     params = []
     
-    # Add date range filter
-    if date_range and date_range != 'all':
-        if date_range == 'custom' and custom_start and custom_end:
-            where_conditions.append(f"DATE BETWEEN '{custom_start}' AND '{custom_end}'")
-        elif date_range == '2025':
-            where_conditions.append("DATE >= '2025-01-01'")
-        elif date_range == '2024':
-            where_conditions.append("DATE BETWEEN '2024-01-01' AND '2024-12-31'")
-        elif date_range == '2023':
-            where_conditions.append("DATE BETWEEN '2023-01-01' AND '2023-12-31'")
-        elif date_range == 'recent':
-            where_conditions.append("DATE >= date('now', '-12 months')")
-        elif date_range == 'last6':
-            where_conditions.append("DATE >= date('now', '-6 months')")
-        elif date_range == 'last3':
-            where_conditions.append("DATE >= date('now', '-3 months')")
+    condition, date_params = date_range_condition(date_range, custom_start, custom_end)
+    if condition:
+        where_conditions.append(condition)
+        params.extend(date_params)
     
     where_clause = " AND ".join(where_conditions)
     
@@ -2528,6 +2751,985 @@ async def get_insights(
         "summary": summary
     }
 
+# =============================================================================
+# Drill-downs
+# =============================================================================
+
+# Every date_range the dashboard's date filter can send
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if not values:
+        return None
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+def is_clean_price(row):
+    """Row (selected with clean_price_sql() AS clean_price) has a usable unit price"""
+    return bool(row['clean_price'])
+
+def _spec_key(row):
+    return (row['PRODUCT_TYPE'], row['SIZE'], row['THICKNESS'])
+
+def market_price_medians(date_range=None, custom_start=None, custom_end=None):
+    """Median clean unit price per product type x size x thickness, shared by every drill-down"""
+    version = get_dataset_version()
+    key = cache_key("market_medians", {"date_range": date_range, "custom_start": custom_start, "custom_end": custom_end})
+    medians = result_cache.get(key, version)
+    if medians is not None:
+        return medians
+
+    where_conditions = [clean_price_sql()]
+    condition, params = date_range_condition(date_range, custom_start, custom_end)
+    if condition:
+        where_conditions.append(condition)
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(f"""
+            SELECT PRODUCT_TYPE, SIZE, THICKNESS, UNIT_PRICE_USD
+            FROM mirror_shipments
+            WHERE {' AND '.join(where_conditions)}
+        """, params).fetchall()
+    finally:
+        conn.close()
+
+    prices = {}
+    for row in rows:
+        prices.setdefault(_spec_key(row), []).append(row['UNIT_PRICE_USD'])
+    medians = {spec: _median(values) for spec, values in prices.items()}
+    result_cache.put(key, version, medians)
+    return medians
+
+def _share_rows(counter, total, limit=None):
+    return [
+        {"value": value, "count": count, "pct": round(count * 100 / total, 1) if total else 0}
+        for value, count in counter.most_common(limit)
+    ]
+
+def spec_mix(rows):
+    """Shipment counts per product type, size and thickness"""
+    return {
+        "product_type": _share_rows(Counter(row['PRODUCT_TYPE'] for row in rows), len(rows)),
+        "size": _share_rows(Counter(row['SIZE'] for row in rows), len(rows), 10),
+        "thickness": _share_rows(Counter(row['THICKNESS'] for row in rows), len(rows), 10),
+    }
+
+def monthly_series(rows):
+    """Orders, value, quantity and average price per month"""
+    months = OrderedDict()
+    for row in rows:
+        month = months.setdefault((row['DATE'] or '')[:7], {"orders": 0, "value": 0, "quantity": 0, "prices": []})
+        month["orders"] += 1
+        month["value"] += row['TOTAL_VALUE_USD'] or 0
+        month["quantity"] += row['QUANTITY'] or 0
+        if is_clean_price(row):
+            month["prices"].append(row['UNIT_PRICE_USD'])
+    return [
+        {
+            "month": month or None,
+            "orders": totals["orders"],
+            "value": totals["value"],
+            "quantity": totals["quantity"],
+            "avg_price": round(sum(totals["prices"]) / len(totals["prices"]), 2) if totals["prices"] else None
+        }
+        for month, totals in months.items()
+    ]
+
+def monthly_share(rows, field, top=5):
+    """Value share per month of the top `top` values of field, the rest folded into 'Others'"""
+    totals = Counter()
+    for row in rows:
+        totals[row[field]] += row['TOTAL_VALUE_USD'] or 0
+    leaders = [value for value, _ in totals.most_common(top)]
+
+    months = OrderedDict()
+    for row in rows:
+        month = months.setdefault((row['DATE'] or '')[:7], Counter())
+        month[row[field] if row[field] in leaders else 'Others'] += row['TOTAL_VALUE_USD'] or 0
+    series = leaders + (['Others'] if len(totals) > len(leaders) else [])
+    return {
+        "months": [month or None for month in months],
+        "series": [
+            {
+                "name": name,
+                "value": totals[name] if name != 'Others' else sum(totals.values()) - sum(totals[v] for v in leaders),
+                "share_pct": [
+                    round(month[name] * 100 / sum(month.values()), 1) if sum(month.values()) else 0
+                    for month in months.values()
+                ]
+            }
+            for name in series
+        ]
+    }
+
+def price_vs_market(rows, medians):
+    """Median clean price per spec against the market median for the same period"""
+    prices = {}
+    for row in rows:
+        if is_clean_price(row):
+            prices.setdefault(_spec_key(row), []).append(row['UNIT_PRICE_USD'])
+    comparison = []
+    for spec, values in sorted(prices.items(), key=lambda item: -len(item[1])):
+        median = _median(values)
+        market = medians.get(spec)
+        comparison.append({
+            "product_type": spec[0],
+            "size": spec[1],
+            "thickness": spec[2],
+            "orders": len(values),
+            "median_price": round(median, 2),
+            "market_median": round(market, 2) if market else None,
+            "premium_pct": round((median - market) * 100 / market, 1) if market else None
+        })
+    return comparison
+
+def entity_shipments(field, name, countries=None, product_type=None, size=None, thickness=None,
+                     min_value=None, date_range=None, custom_start=None, custom_end=None):
+    """Every shipment of one consignee or shipper (field), oldest first, via its (field, DATE) index
+
+    Filters mean the same as on the list endpoints (/api/buyers, /api/competitors).
+    """
+    where_conditions = [f"{field} = ?"]
+    params = [name]
+    if countries:
+        where_conditions.append(f"DESTINATION_COUNTRY IN ({','.join('?' for _ in countries)})")
+        params.extend(countries)
+    if product_type and product_type != 'all':
+        where_conditions.append("PRODUCT_TYPE = ?")
+        params.append(product_type)
+    if size and size != 'all':
+        if size == '1220x2440':
+            where_conditions.append("(SIZE = '2440x1220' OR SIZE = '1220x2440')")
+        elif size == 'other':
+            where_conditions.append("(SIZE != '2440x1220' AND SIZE != '1220x2440')")
+    if thickness and thickness not in ('all', 'other'):
+        where_conditions.append("THICKNESS = ?")
+        params.append(float(thickness))
+    if min_value:
+        where_conditions.append("TOTAL_VALUE_USD >= ?")
+        params.append(min_value)
+    condition, date_params = date_range_condition(date_range, custom_start, custom_end)
+    if condition:
+        where_conditions.append(condition)
+        params.extend(date_params)
+
+    conn = get_db_connection()
+    try:
+        return conn.execute(f"""
+            SELECT DATE, DESTINATION_COUNTRY, SHIPPER_NAME, CONSIGNEE_NAME, PRODUCT_TYPE, SIZE, THICKNESS,
+                   QUANTITY, UNIT_PRICE_USD, TOTAL_VALUE_USD, {clean_price_sql()} AS clean_price
+            FROM mirror_shipments
+            WHERE {' AND '.join(where_conditions)}
+            ORDER BY DATE
+        """, params).fetchall()
+    finally:
+        conn.close()
+
+def breakdown(rows, field, limit=None):
+    """Orders, value and sheets per value of field, largest value first"""
+    groups = {}
+    for row in rows:
+        group = groups.setdefault(row[field], {"orders": 0, "value": 0, "quantity": 0, "last_order": None})
+        group["orders"] += 1
+        group["value"] += row['TOTAL_VALUE_USD'] or 0
+        group["quantity"] += row['QUANTITY'] or 0
+        group["last_order"] = row['DATE']  # rows are in date order
+    total = sum(group["value"] for group in groups.values())
+    ranked = sorted(groups.items(), key=lambda item: -item[1]["value"])[:limit]
+    return [
+        dict(group, name=value, value_pct=round(group["value"] * 100 / total, 1) if total else 0)
+        for value, group in ranked
+    ]
+
+@app.get("/api/buyers/{name:path}")
+@cached_endpoint("buyer_detail", detail=True)
+def get_buyer_detail(
+    name: str,
+    countries: List[str] = Query(None),
+    product_type: Optional[str] = None,
+    size: Optional[str] = None,
+    thickness: Optional[str] = None,
+    min_value: Optional[float] = None,
+    date_range: Optional[str] = None,
+    custom_start: Optional[str] = None,
+    custom_end: Optional[str] = None
+):
+    """One buyer's shipment history, supplier mix, spec mix and prices against the market
+
+    Served from the (CONSIGNEE_NAME, DATE) index: only this buyer's rows are read.
+    """
+    if not name.strip():
+        raise HTTPException(status_code=400, detail="Buyer name is required")
+    rows = entity_shipments('CONSIGNEE_NAME', name, countries, product_type, size, thickness, min_value,
+                            date_range, custom_start, custom_end)
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No shipments for buyer {name!r}")
+
+    return {
+        "name": name,
+        "countries": sorted({row['DESTINATION_COUNTRY'] for row in rows if row['DESTINATION_COUNTRY']}),
+        "total_orders": len(rows),
+        "total_value": sum(row['TOTAL_VALUE_USD'] or 0 for row in rows),
+        "total_quantity": sum(row['QUANTITY'] or 0 for row in rows),
+        "first_order": rows[0]['DATE'],
+        "last_order": rows[-1]['DATE'],
+        "monthly": monthly_series(rows),
+        "supplier_share": monthly_share(rows, 'SHIPPER_NAME'),
+        "spec_mix": spec_mix(rows),
+        "price_vs_market": price_vs_market(rows, market_price_medians(date_range, custom_start, custom_end))
+    }
+
+@app.get("/api/competitors/{name:path}")
+@cached_endpoint("competitor_detail", detail=True)
+def get_competitor_detail(
+    name: str,
+    countries: List[str] = Query(None),
+    product_type: Optional[str] = None,
+    size: Optional[str] = None,
+    thickness: Optional[str] = None,
+    min_value: Optional[float] = None,
+    date_range: Optional[str] = None,
+    custom_start: Optional[str] = None,
+    custom_end: Optional[str] = None
+):
+    """One supplier's full destination split, top buyers, monthly volume and price trend and spec mix
+
+    Served from the (SHIPPER_NAME, DATE) index: only this supplier's rows are read.
+    """
+    if not name.strip():
+        raise HTTPException(status_code=400, detail="Supplier name is required")
+    rows = entity_shipments('SHIPPER_NAME', name, countries, product_type, size, thickness, min_value,
+                            date_range, custom_start, custom_end)
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No shipments for supplier {name!r}")
+
+    return {
+        "name": name,
+        "total_orders": len(rows),
+        "total_value": sum(row['TOTAL_VALUE_USD'] or 0 for row in rows),
+        "total_quantity": sum(row['QUANTITY'] or 0 for row in rows),
+        "first_order": rows[0]['DATE'],
+        "last_order": rows[-1]['DATE'],
+        "destinations": breakdown(rows, 'DESTINATION_COUNTRY'),
+        "top_buyers": breakdown(rows, 'CONSIGNEE_NAME', 15),
+        "buyer_count": len({row['CONSIGNEE_NAME'] for row in rows}),
+        "monthly": monthly_series(rows),
+        "spec_mix": spec_mix(rows),
+        "price_vs_market": price_vs_market(rows, market_price_medians(date_range, custom_start, custom_end))
+    }
+
+# =============================================================================
+# Price outliers
+# =============================================================================
+
+# Modified z-score (|log price - median| / (1.4826 * MAD)) above which a price is an outlier
+PRICE_OUTLIER_Z = float(os.environ.get("PRICE_OUTLIER_Z", 3.5))
+# Spec groups with fewer valid prices use the bounds of their product type
+PRICE_OUTLIER_MIN_GROUP = int(os.environ.get("PRICE_OUTLIER_MIN_GROUP", 10))
+# Only used when the database has no PRICE_OUTLIER column and cannot be given one
+LEGACY_PRICE_CEILING = 500
+
+price_outlier_status = {"ready": False, "groups": 0, "flagged": None}
+
+# Bounds per product type x size x thickness (level 0), per product type (1) and overall (2)
+PRICE_BOUNDS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS price_bounds (
+        level INTEGER NOT NULL,
+        PRODUCT_TYPE TEXT,
+        SIZE TEXT,
+        THICKNESS REAL,
+        low REAL NOT NULL,
+        high REAL NOT NULL,
+        samples INTEGER NOT NULL
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_price_bounds ON price_bounds(level, PRODUCT_TYPE, SIZE, THICKNESS);
+    -- Shipment count and last rowid the bounds were computed from
+    CREATE TABLE IF NOT EXISTS price_bounds_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        shipments INTEGER NOT NULL,
+        max_rowid INTEGER,
+        computed_at REAL NOT NULL
+    );
+"""
+
+# 1 when a row's price is missing, non-positive or outside its most specific bounds
+_PRICE_OUTLIER_EXPR = """
+    CASE WHEN {row}.UNIT_PRICE_USD IS NULL OR {row}.UNIT_PRICE_USD <= 0 THEN 1
+    ELSE COALESCE(
+        (SELECT {row}.UNIT_PRICE_USD NOT BETWEEN b.low AND b.high FROM price_bounds b
+         WHERE b.level = 0 AND b.PRODUCT_TYPE IS {row}.PRODUCT_TYPE AND b.SIZE IS {row}.SIZE AND b.THICKNESS IS {row}.THICKNESS),
+        (SELECT {row}.UNIT_PRICE_USD NOT BETWEEN b.low AND b.high FROM price_bounds b
+         WHERE b.level = 1 AND b.PRODUCT_TYPE IS {row}.PRODUCT_TYPE),
+        (SELECT {row}.UNIT_PRICE_USD NOT BETWEEN b.low AND b.high FROM price_bounds b WHERE b.level = 2),
+        0)
+    END
+"""
+
+# New and corrected rows are flagged as they are written, against the stored bounds
+PRICE_OUTLIER_TRIGGERS = f"""
+    CREATE TRIGGER IF NOT EXISTS price_outlier_insert AFTER INSERT ON mirror_shipments BEGIN
+        UPDATE mirror_shipments SET PRICE_OUTLIER = {_PRICE_OUTLIER_EXPR.format(row='new')} WHERE rowid = new.rowid;
+    END;
+    CREATE TRIGGER IF NOT EXISTS price_outlier_update
+    AFTER UPDATE OF UNIT_PRICE_USD, PRODUCT_TYPE, SIZE, THICKNESS ON mirror_shipments BEGIN
+        UPDATE mirror_shipments SET PRICE_OUTLIER = {_PRICE_OUTLIER_EXPR.format(row='new')} WHERE rowid = new.rowid;
+    END;
+"""
+
+def clean_price_sql():
+    """SQL condition for rows whose unit price is usable in price statistics"""
+    if price_outlier_status["ready"]:
+        return "PRICE_OUTLIER = 0"
+    return f"(UNIT_PRICE_USD > 0 AND UNIT_PRICE_USD < {LEGACY_PRICE_CEILING})"
+
+def robust_price_bounds(prices):
+    """(low, high) of non-outlier prices: median +/- PRICE_OUTLIER_Z robust deviations in log space"""
+    import numpy as np
+    logs = np.log(np.asarray(prices, dtype=np.float64))
+    median = np.median(logs)
+    deviations = np.abs(logs - median)
+    scale = 1.4826 * np.median(deviations)
+    if scale == 0:
+        # More than half the prices are identical; the mean deviation still sees the spread
+        scale = 1.2533 * deviations.mean()
+    return float(np.exp(median - PRICE_OUTLIER_Z * scale)), float(np.exp(median + PRICE_OUTLIER_Z * scale))
+
+def refresh_price_outliers(conn):
+    """Recompute price_bounds from the current data and re-flag rows whose flag changed
+
+    Returns (spec groups with their own bounds, rows flagged as outliers).
+    """
+    shipments, max_rowid = _shipments_fingerprint(conn)
+    rows = conn.execute("""
+        SELECT PRODUCT_TYPE, SIZE, THICKNESS, UNIT_PRICE_USD FROM mirror_shipments WHERE UNIT_PRICE_USD > 0
+    """).fetchall()
+    specs, types, everything = {}, {}, []
+    for product_type, size, thickness, price in rows:
+        specs.setdefault((product_type, size, thickness), []).append(price)
+        types.setdefault(product_type, []).append(price)
+        everything.append(price)
+
+    bounds = []
+    for (product_type, size, thickness), prices in specs.items():
+        if len(prices) >= PRICE_OUTLIER_MIN_GROUP:
+            bounds.append((0, product_type, size, thickness, *robust_price_bounds(prices), len(prices)))
+    for product_type, prices in types.items():
+        bounds.append((1, product_type, None, None, *robust_price_bounds(prices), len(prices)))
+    if everything:
+        bounds.append((2, None, None, None, *robust_price_bounds(everything), len(everything)))
+
+    conn.execute("DELETE FROM price_bounds")
+    conn.executemany("INSERT INTO price_bounds VALUES (?, ?, ?, ?, ?, ?, ?)", bounds)
+    expression = _PRICE_OUTLIER_EXPR.format(row='mirror_shipments')
+    conn.execute(f"UPDATE mirror_shipments SET PRICE_OUTLIER = {expression} WHERE PRICE_OUTLIER IS NOT {expression}")
+    conn.execute("INSERT OR REPLACE INTO price_bounds_state VALUES (1, ?, ?, ?)", (shipments, max_rowid, time.time()))
+    conn.commit()
+    return sync_price_outlier_status(conn)
+
+def _shipments_fingerprint(conn):
+    return tuple(conn.execute("SELECT COUNT(*), MAX(rowid) FROM mirror_shipments").fetchone())
+
+def price_bounds_stale(conn):
+    """The bounds were never computed, or shipments were ingested or removed since"""
+    state = conn.execute("SELECT shipments, max_rowid FROM price_bounds_state").fetchone()
+    return state is None or tuple(state) != _shipments_fingerprint(conn)
+
+def sync_price_outlier_status(conn):
+    """Read the bounds' group and flagged counts, which another process may have refreshed"""
+    groups = conn.execute("SELECT COUNT(*) FROM price_bounds WHERE level = 0").fetchone()[0]
+    flagged = conn.execute("SELECT COUNT(*) FROM mirror_shipments WHERE PRICE_OUTLIER = 1").fetchone()[0]
+    price_outlier_status.update(groups=groups, flagged=flagged)
+    return groups, flagged
+
+def refresh_stale_price_outliers(conn):
+    """Recompute the bounds if the shipments changed since they were computed
+
+    Run under _snapshot_build_lock so only one worker recomputes after an ingest.
+    """
+    if not price_bounds_stale(conn):
+        sync_price_outlier_status(conn)
+        return
+    started = time.perf_counter()
+    groups, flagged = refresh_price_outliers(conn)
+    print(f"📏 Price outliers: {flagged:,} rows flagged across {groups} spec groups in {time.perf_counter() - started:.2f}s")
+
+def ensure_price_outliers(conn):
+    """Add the PRICE_OUTLIER column, its bounds and ingest triggers, and flag rows if the bounds are stale
+
+    Run under _snapshot_build_lock: the column check and ALTER TABLE are not atomic.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(mirror_shipments)")}
+    if 'PRICE_OUTLIER' in columns and conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'price_bounds'"
+    ).fetchone() is not None:
+        # Flagged already; a read-only database keeps serving these flags
+        price_outlier_status["ready"] = True
+    if 'PRICE_OUTLIER' not in columns:
+        conn.execute("ALTER TABLE mirror_shipments ADD COLUMN PRICE_OUTLIER INTEGER")
+    conn.executescript(PRICE_BOUNDS_SCHEMA + PRICE_OUTLIER_TRIGGERS)
+    refresh_stale_price_outliers(conn)
+    price_outlier_status["ready"] = True
+
+# =============================================================================
+# Search
+# =============================================================================
+
+SEARCH_LIMIT = int(os.environ.get("SEARCH_LIMIT", 10))
+
+# Headline stats per buyer / supplier name, kept current by triggers on mirror_shipments
+SEARCH_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS search_entities (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        name TEXT NOT NULL,
+        orders INTEGER NOT NULL DEFAULT 0,
+        total_value REAL NOT NULL DEFAULT 0,
+        last_order TEXT,
+        UNIQUE (kind, name)
+    );
+    CREATE TRIGGER IF NOT EXISTS search_entities_fts AFTER INSERT ON search_entities BEGIN
+        INSERT INTO entity_search(rowid, name) VALUES (new.id, new.name);
+    END;
+    CREATE TRIGGER IF NOT EXISTS search_shipment_insert AFTER INSERT ON mirror_shipments BEGIN
+        INSERT OR IGNORE INTO search_entities(kind, name)
+            SELECT 'buyer', new.CONSIGNEE_NAME WHERE new.CONSIGNEE_NAME IS NOT NULL
+            UNION ALL SELECT 'supplier', new.SHIPPER_NAME WHERE new.SHIPPER_NAME IS NOT NULL;
+        UPDATE search_entities
+            SET orders = orders + 1,
+                total_value = total_value + COALESCE(new.TOTAL_VALUE_USD, 0),
+                last_order = MAX(COALESCE(last_order, ''), COALESCE(new.DATE, ''))
+            WHERE (kind = 'buyer' AND name = new.CONSIGNEE_NAME) OR (kind = 'supplier' AND name = new.SHIPPER_NAME);
+    END;
+    CREATE TRIGGER IF NOT EXISTS search_shipment_delete AFTER DELETE ON mirror_shipments BEGIN
+        UPDATE search_entities
+            SET orders = orders - 1, total_value = total_value - COALESCE(old.TOTAL_VALUE_USD, 0)
+            WHERE (kind = 'buyer' AND name = old.CONSIGNEE_NAME) OR (kind = 'supplier' AND name = old.SHIPPER_NAME);
+    END;
+    CREATE TRIGGER IF NOT EXISTS search_shipment_update
+    AFTER UPDATE OF CONSIGNEE_NAME, SHIPPER_NAME, TOTAL_VALUE_USD, DATE ON mirror_shipments BEGIN
+        UPDATE search_entities
+            SET orders = orders - 1, total_value = total_value - COALESCE(old.TOTAL_VALUE_USD, 0)
+            WHERE (kind = 'buyer' AND name = old.CONSIGNEE_NAME) OR (kind = 'supplier' AND name = old.SHIPPER_NAME);
+        INSERT OR IGNORE INTO search_entities(kind, name)
+            SELECT 'buyer', new.CONSIGNEE_NAME WHERE new.CONSIGNEE_NAME IS NOT NULL
+            UNION ALL SELECT 'supplier', new.SHIPPER_NAME WHERE new.SHIPPER_NAME IS NOT NULL;
+        UPDATE search_entities
+            SET orders = orders + 1,
+                total_value = total_value + COALESCE(new.TOTAL_VALUE_USD, 0),
+                last_order = MAX(COALESCE(last_order, ''), COALESCE(new.DATE, ''))
+            WHERE (kind = 'buyer' AND name = new.CONSIGNEE_NAME) OR (kind = 'supplier' AND name = new.SHIPPER_NAME);
+    END;
+"""
+
+def _has_trigram(conn):
+    """The trigram tokenizer needs SQLite 3.34+"""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.trigram_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp.trigram_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def ensure_search_index(conn):
+    """Create the FTS5 name index and its ingest triggers, filling them on first run"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'entity_search'").fetchone() is None:
+        started = time.perf_counter()
+        # Substring matches with trigrams; otherwise word-prefix matches
+        tokenize = "tokenize='trigram'" if _has_trigram(conn) else "tokenize='unicode61', prefix='1 2 3'"
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE entity_search USING fts5(
+                name, content='search_entities', content_rowid='id', {tokenize}
+            )
+        """)
+        conn.executescript(SEARCH_SCHEMA)
+        for kind, column in (('buyer', 'CONSIGNEE_NAME'), ('supplier', 'SHIPPER_NAME')):
+            conn.execute(f"""
+                INSERT INTO search_entities(kind, name, orders, total_value, last_order)
+                SELECT ?, {column}, COUNT(*), TOTAL(TOTAL_VALUE_USD), MAX(DATE)
+                FROM mirror_shipments
+                WHERE {column} IS NOT NULL
+                GROUP BY {column}
+            """, (kind,))
+        conn.commit()
+        entities = conn.execute("SELECT COUNT(*) FROM search_entities").fetchone()[0]
+        print(f"🔎 Search index: {entities} names in {time.perf_counter() - started:.2f}s ({tokenize})")
+    else:
+        # Triggers may have been added by a newer version of this file
+        conn.executescript(SEARCH_SCHEMA)
+
+def search_match_expression(query, trigram):
+    """FTS5 MATCH expression for what the user typed, or None when it is too short to index"""
+    terms = query.split()
+    if trigram:
+        if len(query) < 3:
+            return None
+        return '"' + query.replace('"', '""') + '"'
+    return ' '.join('"' + term.replace('"', '""') + '"*' for term in terms) or None
+
+@app.get("/api/search")
+def search_entities(
+    q: str = Query(..., min_length=1, max_length=100),
+    kind: Optional[str] = Query(None, pattern='^(buyer|supplier)$'),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=50)
+):
+    """Type-ahead search over buyer and supplier names, best matches first
+
+    Exact names rank first, then names starting with the query, names with a
+    word starting with it and the rest, each by total value.
+    """
+    query = ' '.join(q.split())
+    conn = get_db_connection()
+    try:
+        trigram = 'trigram' in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'entity_search'"
+        ).fetchone()[0]
+        prefix = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params = [prefix + '%', '% ' + prefix + '%']
+        where_conditions = ["e.orders > 0"]
+        if kind:
+            where_conditions.append("e.kind = ?")
+        match = search_match_expression(query, trigram)
+        if match:
+            rows = conn.execute(f"""
+                SELECT e.kind, e.name, e.orders, e.total_value, e.last_order
+                FROM entity_search s JOIN search_entities e ON e.id = s.rowid
+                WHERE entity_search MATCH ? AND {' AND '.join(where_conditions)}
+                ORDER BY e.name = ? COLLATE NOCASE DESC, e.name LIKE ? ESCAPE '\\' DESC,
+                         e.name LIKE ? ESCAPE '\\' DESC, e.total_value DESC
+                LIMIT ?
+            """, [match] + ([kind] if kind else []) + [query] + params + [limit]).fetchall()
+        else:
+            # One or two characters: too short for trigrams, match word starts instead
+            rows = conn.execute(f"""
+                SELECT e.kind, e.name, e.orders, e.total_value, e.last_order
+                FROM search_entities e
+                WHERE (e.name LIKE ? ESCAPE '\\' OR e.name LIKE ? ESCAPE '\\') AND {' AND '.join(where_conditions)}
+                ORDER BY e.name LIKE ? ESCAPE '\\' DESC, e.total_value DESC
+                LIMIT ?
+            """, params + ([kind] if kind else []) + params[:1] + [limit]).fetchall()
+    except sqlite3.OperationalError as e:
+        raise_if_cancelled(e)
+        if 'no such table' not in str(e):
+            raise
+        return JSONResponse(status_code=503, content={"detail": "Search index is not built yet"})
+    finally:
+        conn.close()
+
+    return {
+        "query": query,
+        "results": [
+            {
+                "kind": row['kind'],
+                "name": row['name'],
+                "orders": row['orders'],
+                "total_value": row['total_value'],
+                "last_order": row['last_order'] or None
+            }
+            for row in rows
+        ]
+    }
+
+# =============================================================================
+# Background jobs
+# =============================================================================
+
+JOBS_DB = os.environ.get("JOBS_DB", "jobs.db")
+JOBS_DIR = os.environ.get("JOBS_DIR", "job_results")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 1))
+# A running job that has not reported progress for this long is taken over
+JOB_STALE_SECONDS = float(os.environ.get("JOB_STALE_SECONDS", 120))
+# How often each web process looks for queued, stale or orphaned jobs
+JOB_SWEEP_SECONDS = float(os.environ.get("JOB_SWEEP_SECONDS", 60))
+JOB_EXPORT_CHUNK = int(os.environ.get("JOB_EXPORT_CHUNK", 5000))
+
+def get_jobs_connection():
+    """Connection to the job table, shared by the web workers and the job processes"""
+    conn = sqlite3.connect(JOBS_DB, timeout=5)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            params TEXT NOT NULL,
+            state TEXT NOT NULL,
+            dataset_version TEXT NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            checkpoint TEXT,
+            result_path TEXT,
+            error TEXT,
+            owner TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            updated_at REAL NOT NULL,
+            finished_at REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state)")
+    return conn
+
+def export_where(params):
+    """WHERE clause for an export, with the dashboard's filter semantics"""
+    conditions = []
+    args = []
+    if params.get("countries"):
+        conditions.append(f"DESTINATION_COUNTRY IN ({','.join('?' for _ in params['countries'])})")
+        args.extend(params["countries"])
+    if params.get("product_type") not in (None, 'all'):
+        conditions.append("PRODUCT_TYPE = ?")
+        args.append(params["product_type"])
+    size = params.get("size")
+    if size == '1220x2440':
+        conditions.append("(SIZE = '2440x1220' OR SIZE = '1220x2440')")
+    elif size == 'other':
+        conditions.append("(SIZE != '2440x1220' AND SIZE != '1220x2440')")
+    elif size not in (None, 'all'):
+        conditions.append("SIZE = ?")
+        args.append(size)
+    thickness = params.get("thickness")
+    if thickness == 'other':
+        conditions.append("(THICKNESS NOT IN (0.7, 0.8, 1.0) OR THICKNESS IS NULL)")
+    elif thickness not in (None, 'all'):
+        conditions.append("THICKNESS = ?")
+        args.append(float(thickness))
+    if params.get("min_value"):
+        conditions.append("TOTAL_VALUE_USD >= ?")
+        args.append(float(params["min_value"]))
+    date_range = params.get("date_range")
+    if date_range is not None and date_range not in DATE_RANGES:
+        # Silently exporting the full history would look like a valid result
+        raise ValueError(f"Unknown date_range {date_range!r}, expected one of {list(DATE_RANGES)}")
+    condition, date_args = date_range_condition(date_range, params.get("custom_start"), params.get("custom_end"))
+    if condition:
+        conditions.append(condition)
+        args.extend(date_args)
+    return " AND ".join(conditions) or "1=1", args
+
+def job_result_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.csv.gz")
+
+def run_export_job(job_id, params, checkpoint, report):
+    """Shipments matching the filters as gzipped CSV, one gzip member per chunk
+
+    The checkpoint records the last exported rowid and the file size after it,
+    so a resumed export truncates any partial chunk and carries on from there.
+    """
+    import csv
+    import io
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    path = job_result_path(job_id)
+    if not os.path.exists(path):
+        checkpoint = {}
+    last_rowid = checkpoint.get("rowid", 0)
+    exported = checkpoint.get("rows", 0)
+
+    where, args = export_where(params)
+    conn = sqlite3.connect(get_db_path())
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM mirror_shipments WHERE {where}", args).fetchone()[0]
+        with open(path, 'r+b' if checkpoint else 'wb') as out:
+            out.truncate(checkpoint.get("bytes", 0))
+            out.seek(0, os.SEEK_END)
+            if not checkpoint:
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(mirror_shipments)")]
+                buffer = io.StringIO()
+                csv.writer(buffer).writerow(columns)
+                out.write(gzip.compress(buffer.getvalue().encode(), 6))
+            while True:
+                rows = conn.execute(
+                    f"SELECT rowid, * FROM mirror_shipments WHERE rowid > ? AND {where} ORDER BY rowid LIMIT ?",
+                    [last_rowid, *args, JOB_EXPORT_CHUNK]
+                ).fetchall()
+                if not rows:
+                    break
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(row[1:] for row in rows)
+                out.write(gzip.compress(buffer.getvalue().encode(), 6))
+                out.flush()
+                last_rowid = rows[-1][0]
+                exported += len(rows)
+                report(exported, total, {"rowid": last_rowid, "rows": exported, "bytes": out.tell()})
+    finally:
+        conn.close()
+    return path
+
+def run_snapshot_job(job_id, params, checkpoint, report):
+    """Write the on-disk columnar snapshot for the current data, ready for SNAPSHOT_MODE=file"""
+    report(0, 1)
+    snapshot = load_file_snapshot(get_dataset_version())
+    report(1, 1)
+    print(f"🧊 Snapshot job {job_id}: {snapshot.rows:,} rows")
+    return None
+
+def run_price_outliers_job(job_id, params, checkpoint, report):
+    """Recompute the per-spec price bounds from all data and re-flag every row"""
+    report(0, 1)
+    conn = get_db_connection(interruptible=False)
+    try:
+        with _snapshot_build_lock():
+            groups, flagged = refresh_price_outliers(conn)
+    finally:
+        conn.close()
+    report(1, 1)
+    print(f"📏 Price outlier job {job_id}: {groups} spec groups, {flagged:,} rows flagged")
+    return None
+
+# Job type -> function(job_id, params, checkpoint, report) returning a result file or None
+JOB_TYPES = {
+    "export": run_export_job,
+    "snapshot": run_snapshot_job,
+    "price_outliers": run_price_outliers_job
+}
+
+def _process_start(pid):
+    """Start time of a process in clock ticks since boot (None where /proc is unavailable)"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Field 22, counted after the parenthesised command name
+            return f.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+def job_owner_id():
+    """host:pid:start of this process; the start time tells a live owner from a reused pid"""
+    return f"{os.uname().nodename}:{os.getpid()}:{_process_start(os.getpid()) or ''}"
+
+def job_owner_alive(owner):
+    """False only when the owner provably died: same host, and its pid is gone or now another process"""
+    try:
+        host, pid, started = owner.split(':')
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return True  # Rows written before owners carried a start time age out via JOB_STALE_SECONDS
+    if host != os.uname().nodename:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return not started or _process_start(pid) in (None, started)
+
+def run_job(job_id, dead_owner=None):
+    """Process pool entry point: claim the job, run it and record the outcome
+
+    dead_owner lets a sweep take over a running job whose owner process has exited.
+    """
+    conn = get_jobs_connection()
+    now = time.time()
+    claimed = conn.execute("""
+        UPDATE jobs SET state = 'running', owner = ?, started_at = COALESCE(started_at, ?), updated_at = ?
+        WHERE id = ? AND (state = 'queued' OR (state = 'running' AND (updated_at < ? OR owner = ?)))
+    """, (job_owner_id(), now, now, job_id, now - JOB_STALE_SECONDS, dead_owner)).rowcount
+    conn.commit()
+    if not claimed:
+        return  # Finished, or still running elsewhere
+    job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    checkpoint = json.loads(job["checkpoint"]) if job["checkpoint"] else {}
+    if job["dataset_version"] != get_dataset_version():
+        # The data changed while the job was down, so start it over on the new data
+        checkpoint = {}
+        conn.execute("UPDATE jobs SET dataset_version = ?, done = 0, checkpoint = NULL WHERE id = ?",
+                     (get_dataset_version(), job_id))
+        conn.commit()
+
+    def report(done, total, checkpoint=None):
+        conn.execute(
+            "UPDATE jobs SET done = ?, total = ?, checkpoint = ?, updated_at = ? WHERE id = ?",
+            (done, total, json.dumps(checkpoint) if checkpoint else None, time.time(), job_id)
+        )
+        conn.commit()
+
+    try:
+        result_path = JOB_TYPES[job["type"]](job_id, json.loads(job["params"]), checkpoint, report)
+        conn.execute(
+            "UPDATE jobs SET state = 'done', result_path = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+            (result_path, time.time(), time.time(), job_id)
+        )
+        print(f"✅ Job {job_id} ({job['type']}) finished")
+    except Exception as e:
+        conn.execute(
+            "UPDATE jobs SET state = 'failed', error = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+            (f"{type(e).__name__}: {e}", time.time(), time.time(), job_id)
+        )
+        print(f"⚠️ Job {job_id} ({job['type']}) failed: {e}")
+    finally:
+        conn.commit()
+        conn.close()
+
+_job_pool = None
+_job_pool_lock = threading.Lock()
+# Jobs this process has handed to its pool and not seen finish
+_submitted_jobs = set()
+
+def _discard_job_pool(pool):
+    """Drop a broken pool so the next submit starts a fresh one"""
+    global _job_pool
+    with _job_pool_lock:
+        if _job_pool is pool:
+            _job_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def submit_job(job_id, dead_owner=None):
+    """Run a job in the process pool, keeping CPU-bound work off the web workers
+
+    A pool whose worker died is replaced once; if that fails too the job stays
+    queued for job_sweep_loop to retry.
+    """
+    global _job_pool
+    for attempt in range(2):
+        with _job_pool_lock:
+            if job_id in _submitted_jobs:
+                return
+            if _job_pool is None:
+                import multiprocessing
+                # spawn, not fork: the web process has threads and open SQLite handles
+                _job_pool = ProcessPoolExecutor(JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            pool = _job_pool
+            try:
+                future = pool.submit(run_job, job_id, dead_owner)
+            except BrokenProcessPool:
+                future = None
+            else:
+                _submitted_jobs.add(job_id)
+        if future is not None:
+            break
+        print("⚠️ Job pool is broken, starting a new one")
+        _discard_job_pool(pool)
+    else:
+        print(f"⚠️ Could not submit job {job_id}, leaving it for the job sweep")
+        return
+
+    def finished(future):
+        _submitted_jobs.discard(job_id)
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            # A worker died mid-job; its row keeps the dead owner for the sweep to take over
+            _discard_job_pool(pool)
+
+    future.add_done_callback(finished)
+
+def resume_jobs():
+    """Resubmit jobs that are queued, silent for JOB_STALE_SECONDS or owned by a process that has exited"""
+    conn = get_jobs_connection()
+    try:
+        rows = conn.execute(
+            "SELECT id, state, owner, updated_at FROM jobs WHERE state IN ('queued', 'running') ORDER BY created_at"
+        ).fetchall()
+    finally:
+        conn.close()
+    stale_before = time.time() - JOB_STALE_SECONDS
+    resumed = 0
+    for row in rows:
+        if row["id"] in _submitted_jobs:
+            continue
+        if row["state"] == 'queued' or row["updated_at"] < stale_before:
+            submit_job(row["id"])
+        elif not job_owner_alive(row["owner"]):
+            submit_job(row["id"], dead_owner=row["owner"])
+        else:
+            continue
+        resumed += 1
+    if resumed:
+        print(f"🔁 Resumed {resumed} background job(s)")
+
+async def job_sweep_loop():
+    """Keep picking up orphaned and queued jobs, not only at startup"""
+    while True:
+        await asyncio.sleep(JOB_SWEEP_SECONDS)
+        try:
+            await asyncio.to_thread(resume_jobs)
+        except Exception as e:
+            # Keep sweeping: a failed round is retried on the next one
+            print(f"⚠️ Could not resume background jobs: {e}")
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value).isoformat(timespec='seconds') if value else None
+
+def job_status(job):
+    """Public view of a job row, with progress and an ETA extrapolated from it"""
+    progress = job["done"] / job["total"] if job["total"] else (1.0 if job["state"] == 'done' else 0.0)
+    eta = None
+    if job["state"] == 'running' and job["started_at"] and 0 < progress < 1:
+        elapsed = time.time() - job["started_at"]
+        eta = round(elapsed * (1 - progress) / progress, 1)
+    return {
+        "id": job["id"],
+        "type": job["type"],
+        "params": json.loads(job["params"]),
+        "state": job["state"],
+        "progress": round(progress, 4),
+        "done": job["done"],
+        "total": job["total"],
+        "eta_seconds": eta,
+        "created_at": _timestamp(job["created_at"]),
+        "started_at": _timestamp(job["started_at"]),
+        "finished_at": _timestamp(job["finished_at"]),
+        "error": job["error"],
+        "result_url": f"/api/jobs/{job['id']}/result" if job["state"] == 'done' and job["result_path"] else None
+    }
+
+@app.post("/api/jobs", status_code=202)
+def create_job(payload: dict = Body(...)):
+    """Queue a background job, e.g. {"type": "export", "params": {"countries": ["OMAN"]}}"""
+    job_type = payload.get("type")
+    if job_type not in JOB_TYPES:
+        return JSONResponse(status_code=400, content={"detail": f"Unknown job type, expected one of {sorted(JOB_TYPES)}"})
+    params = payload.get("params") or {}
+    if not isinstance(params, dict):
+        return JSONResponse(status_code=400, content={"detail": "Job params must be an object"})
+    if job_type == "export":
+        try:
+            export_where(params)
+        except (TypeError, ValueError) as e:
+            return JSONResponse(status_code=400, content={"detail": f"Invalid export filters: {e}"})
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    conn = get_jobs_connection()
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, type, params, state, dataset_version, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, job_type, json.dumps(params, sort_keys=True), get_dataset_version(), now, now)
+        )
+        conn.commit()
+        job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    try:
+        submit_job(job_id)
+    except Exception as e:
+        # The row is committed as queued, so the job sweep starts it later
+        print(f"⚠️ Could not submit job {job_id}, leaving it for the job sweep: {e}")
+    return JSONResponse(status_code=202, content=job_status(job), headers={"Location": f"/api/jobs/{job_id}"})
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Job state, progress and ETA"""
+    conn = get_jobs_connection()
+    try:
+        job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": "Unknown job"})
+    return JSONResponse(content=job_status(job), headers={"Cache-Control": "no-store"})
+
+@app.get("/api/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    """Download the file a finished job produced"""
+    conn = get_jobs_connection()
+    try:
+        job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": "Unknown job"})
+    if job["state"] != 'done' or not job["result_path"] or not os.path.exists(job["result_path"]):
+        return JSONResponse(status_code=409, content={"detail": f"Job is {job['state']}, no result to download", "state": job["state"]})
+    return FileResponse(job["result_path"], media_type="application/gzip", filename=f"gcc_{job['type']}_{job_id}.csv.gz")
+
+record_startup_phase("imports", time.perf_counter() - _import_started)
+
 if __name__ == "__main__":
     import uvicorn
     print("\n" + "="*60)
@@ -2538,6 +3740,5 @@ if __name__ == "__main__":
     print("\n📊 Access at: http://localhost:8011")
     print("="*60 + "\n")
     
-    import os
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
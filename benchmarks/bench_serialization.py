@@ -0,0 +1,88 @@
+"""Compare response serialisation paths for buyer- and competitor-sized payloads.
+
+Usage: python benchmarks/bench_serialization.py
+"""
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from app import dumps_json, orjson, to_columnar
+
+COUNTRIES = ['UAE', 'SAUDI ARABIA', 'KUWAIT', 'QATAR', 'OMAN', 'BAHRAIN']
+ORIGINS = ['INDIA', 'CHINA', 'THAILAND', 'INDONESIA', 'VIETNAM']
+SIZES = ['1220x2440', '2440x1220', '1220x3050', '1300x2800']
+
+
+def make_buyers(rows):
+    """Rows shaped like the buyer_list entries of /api/buyers"""
+    rng = random.Random(rows)
+    buyers = []
+    for i in range(rows):
+        single_side_pct = round(rng.uniform(0, 100), 1)
+        buyers.append({
+            'name': f'BUYER {i:05d} TRADING LLC',
+            'countries': ','.join(rng.sample(COUNTRIES, rng.randint(1, 3))),
+            'total_orders': rng.randint(1, 400),
+            'total_value': rng.uniform(1_000, 5_000_000),
+            'single_side': rng.randint(0, 200),
+            'single_side_pct': single_side_pct,
+            'avg_price': rng.uniform(5, 80),
+            'main_supplier': f'SUPPLIER {rng.randint(1, 60):03d} LAMINATES',
+            'sizes': ','.join(rng.sample(SIZES, rng.randint(1, 3))),
+            'last_order': f'2025-{rng.randint(1, 7):02d}-{rng.randint(1, 28):02d}',
+            'buys_1220x2440': rng.random() < 0.6,
+        })
+    return buyers
+
+
+def make_competitors(rows):
+    """Rows shaped like the competitor_list entries of /api/competitors"""
+    rng = random.Random(rows + 1)
+    competitors = []
+    for i in range(rows):
+        top = [[country, rng.uniform(10_000, 20_000_000)] for country in rng.sample(COUNTRIES, 3)]
+        buyers = [f'BUYER {rng.randint(0, 99999):05d} TRADING LLC' for _ in range(3)]
+        competitors.append({
+            'name': f'SUPPLIER {i:05d} LAMINATES PVT LTD',
+            'country': rng.choice(ORIGINS),
+            'orders': rng.randint(1, 2000),
+            'total_value': rng.uniform(10_000, 50_000_000),
+            'market_share_value': round(rng.uniform(0, 30), 1),
+            'market_share_volume': round(rng.uniform(0, 30), 1),
+            'single_side_pct': round(rng.uniform(0, 100), 1),
+            'avg_price': round(rng.uniform(5, 80), 2),
+            'key_buyers': ', '.join(buyers)[:80],
+            'top_countries': ', '.join(f"{c} (${v / 1000000:.1f}M)" for c, v in top)[:120],
+            'top_countries_volume': top,
+        })
+    return competitors
+
+
+def fastapi_default(payload):
+    """What FastAPI does for a returned dict: jsonable_encoder, then JSONResponse"""
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def main():
+    print(f"orjson: {'yes' if orjson else 'no (stdlib fallback)'}")
+    print(f"{'payload':<12} {'rows':>6} {'shape':<9} {'bytes':>9} {'fastapi ms':>11} {'dumps_json ms':>14} {'speedup':>8}")
+    for key, make_rows in (('buyers', make_buyers), ('competitors', make_competitors)):
+        for rows in (50, 500, 1000, 5000):
+            items = make_rows(rows)
+            for shape, payload in (('rows', {key: items}), ('columnar', {key: to_columnar(items)})):
+                number = max(1, 2000 // rows)
+                baseline = min(timeit.repeat(lambda: fastapi_default(payload), number=number, repeat=5)) / number
+                fast = min(timeit.repeat(lambda: dumps_json(payload), number=number, repeat=5)) / number
+                size = len(dumps_json(payload))
+                print(f"{key:<12} {rows:>6} {shape:<9} {size:>9} {baseline * 1000:>11.3f} "
+                      f"{fast * 1000:>14.3f} {baseline / fast:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
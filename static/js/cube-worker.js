@@ -0,0 +1,283 @@
+// Data cube worker: answers overview, products and pricing-average queries
+// for the dashboard filters without a server round trip.
+//
+// The cube (see /api/cube) holds month x country x product type x size x
+// thickness cells with additive measures, plus HyperLogLog sketches of buyer
+// names per month x country x product type for estimated unique buyers.
+// Anything else that needs row-level data (buyer names, per-spec price ranges,
+// minimum order value, day-level date ranges) is reported as missing so the
+// page asks the server.
+
+const ARTIS_SIZES = ['1220x2440', '2440x1220'];
+const ARTIS_THICKNESS = [0.7, 0.8, 1.0];
+const ARRAY_TYPES = {
+    uint8: Uint8Array,
+    uint16: Uint16Array,
+    uint32: Uint32Array,
+    float64: Float64Array
+};
+
+let cube = null;
+
+self.onmessage = async (event) => {
+    const message = event.data;
+    if (message.type === 'load') {
+        try {
+            const response = await fetch(message.url);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            cube = decodeCube(await response.arrayBuffer());
+            self.postMessage({type: 'ready', version: cube.version, cells: cube.cells});
+        } catch (error) {
+            self.postMessage({type: 'error', message: String(error)});
+        }
+    } else if (message.type === 'query') {
+        const started = performance.now();
+        let result = null;
+        try {
+            result = cube ? answerQuery(message.tab, message.filters) : null;
+        } catch (error) {
+            console.error('Cube query failed:', error);
+        }
+        self.postMessage({
+            type: 'result',
+            id: message.id,
+            version: cube ? cube.version : null,
+            result: result,
+            ms: performance.now() - started
+        });
+    }
+};
+
+function decodeCube(buffer) {
+    const headerLength = new DataView(buffer).getUint32(0, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+    const dataStart = Math.ceil((4 + headerLength) / 8) * 8;
+    const columns = {};
+    header.columns.forEach(column => {
+        columns[column.name] = new ARRAY_TYPES[column.dtype](buffer, dataStart + column.offset, column.length ?? header.cells);
+    });
+    return {
+        version: header.version,
+        cells: header.cells,
+        hllPrecision: header.hll_precision,
+        dimensions: header.dimensions,
+        columns: columns
+    };
+}
+
+function round(value, digits) {
+    const factor = Math.pow(10, digits);
+    return Math.round(value * factor) / factor;
+}
+
+function pct(part, whole) {
+    return whole ? round(part * 100 / whole, 1) : 0;
+}
+
+function supportsFilters(filters) {
+    const minValue = parseFloat(filters.minValue);
+    if (minValue) return false;
+    return ['all', '2023', '2024', '2025'].includes(filters.dateRange);
+}
+
+// Per-dimension lookup tables (1 = code passes) mirroring each endpoint's SQL
+function buildMasks(tab, filters) {
+    const masks = {};
+    const dims = cube.dimensions;
+    const mask = (labels, predicate) => Uint8Array.from(labels, label => predicate(label) ? 1 : 0);
+
+    if (filters.countries) {
+        masks.country = mask(dims.country, v => filters.countries.includes(v));
+    }
+    if (filters.productType !== 'all') {
+        masks.product_type = mask(dims.product_type, v => v === filters.productType);
+    }
+    if (filters.size === '1220x2440') {
+        masks.size = mask(dims.size, v => ARTIS_SIZES.includes(v));
+    } else if (filters.size === 'other') {
+        masks.size = mask(dims.size, v => v !== null && !ARTIS_SIZES.includes(v));
+    } else if (filters.size !== 'all' && tab === 'overview') {
+        masks.size = mask(dims.size, v => v === filters.size);
+    }
+    if (filters.thickness === 'other') {
+        if (tab === 'overview') {
+            masks.thickness = mask(dims.thickness, v => v === null || !ARTIS_THICKNESS.includes(parseFloat(v)));
+        }
+    } else if (filters.thickness !== 'all') {
+        masks.thickness = mask(dims.thickness, v => v !== null && parseFloat(v) === parseFloat(filters.thickness));
+    }
+    if (filters.dateRange === '2025') {
+        masks.month = mask(dims.month, v => v !== null && v >= '2025-01');
+    } else if (filters.dateRange !== 'all') {
+        masks.month = mask(dims.month, v => v !== null && v.startsWith(filters.dateRange + '-'));
+    }
+    return masks;
+}
+
+function selectCells(masks) {
+    const names = Object.keys(masks);
+    const selected = [];
+    for (let i = 0; i < cube.cells; i++) {
+        let keep = true;
+        for (const name of names) {
+            if (!masks[name][cube.columns[name][i]]) {
+                keep = false;
+                break;
+            }
+        }
+        if (keep) selected.push(i);
+    }
+    return selected;
+}
+
+function answerQuery(tab, filters) {
+    if (!supportsFilters(filters)) return null;
+    const masks = buildMasks(tab, filters);
+    const cells = selectCells(masks);
+    switch (tab) {
+        case 'overview':
+            return overview(cells, masks);
+        case 'products':
+            return products(cells);
+        case 'pricing':
+            return pricing(cells);
+        default:
+            return null;
+    }
+}
+
+// Merge the sketches of the selected partitions; null when the filters are
+// finer than month x country x product type
+function estimateUniqueBuyers(masks) {
+    const c = cube.columns;
+    if (!cube.hllPrecision || masks.size || masks.thickness) return null;
+    const m = 1 << cube.hllPrecision;
+    const merged = new Uint8Array(m);
+    const partitions = c.sketch_month.length;
+    for (let p = 0; p < partitions; p++) {
+        if (masks.month && !masks.month[c.sketch_month[p]]) continue;
+        if (masks.country && !masks.country[c.sketch_country[p]]) continue;
+        if (masks.product_type && !masks.product_type[c.sketch_product_type[p]]) continue;
+        // Sparse (register, rank) pairs of this partition
+        for (let j = c.sketch_offsets[p]; j < c.sketch_offsets[p + 1]; j++) {
+            const register = c.sketch_register[j];
+            if (c.sketch_rank[j] > merged[register]) merged[register] = c.sketch_rank[j];
+        }
+    }
+    let sum = 0, zeros = 0;
+    merged.forEach(rank => {
+        sum += Math.pow(2, -rank);
+        if (rank === 0) zeros++;
+    });
+    let estimate = (0.7213 / (1 + 1.079 / m)) * m * m / sum;
+    if (estimate <= 2.5 * m && zeros) {
+        estimate = m * Math.log(m / zeros);
+    }
+    return Math.round(estimate);
+}
+
+function overview(cells, masks) {
+    const c = cube.columns;
+    const single = cube.dimensions.product_type.indexOf('SINGLE_SIDE');
+    let shipments = 0, value = 0, valueCount = 0, singleCount = 0, quantity = 0;
+    const countries = new Map();
+    cells.forEach(i => {
+        shipments += c.shipments[i];
+        value += c.total_value[i];
+        valueCount += c.value_count[i];
+        quantity += c.quantity[i];
+        if (c.product_type[i] === single) singleCount += c.shipments[i];
+        const country = countries.get(c.country[i]) || {sheets: 0, value: 0};
+        country.sheets += c.quantity[i];
+        country.value += c.total_value[i];
+        countries.set(c.country[i], country);
+    });
+    const rows = [...countries.entries()]
+        .sort((a, b) => b[1].value - a[1].value)
+        .slice(0, 15);
+    const volumePct = rows.map(([, row]) => pct(row.sheets, quantity));
+    const uniqueBuyers = estimateUniqueBuyers(masks);
+    return {
+        missing: uniqueBuyers === null ? ['unique_buyers'] : [],
+        data: {
+            total_shipments: shipments,
+            total_value: value,
+            unique_buyers: uniqueBuyers,
+            unique_buyers_estimated: uniqueBuyers !== null,
+            avg_order_value: valueCount ? value / valueCount : 0,
+            single_side_count: singleCount,
+            single_side_pct: pct(singleCount, shipments),
+            country_dist: {
+                labels: rows.map(([code]) => cube.dimensions.country[code]),
+                volume_pct: volumePct,
+                value_pct: rows.map(([, row]) => pct(row.value, value)),
+                values: volumePct
+            }
+        }
+    };
+}
+
+function groupBy(cells, dimension) {
+    const c = cube.columns;
+    const single = cube.dimensions.product_type.indexOf('SINGLE_SIDE');
+    const groups = new Map();
+    cells.forEach(i => {
+        const group = groups.get(c[dimension][i]) || {count: 0, single: 0, priceSum: 0, priceCount: 0};
+        group.count += c.shipments[i];
+        if (c.product_type[i] === single) group.single += c.shipments[i];
+        group.priceSum += c.price_sum[i];
+        group.priceCount += c.price_count[i];
+        groups.set(c[dimension][i], group);
+    });
+    return [...groups.entries()]
+        .map(([code, group]) => ({label: cube.dimensions[dimension][code], ...group}))
+        .sort((a, b) => b.count - a.count)
+        .slice(0, 10);
+}
+
+function products(cells) {
+    const c = cube.columns;
+    let total = 0, artis = 0;
+    cells.forEach(i => {
+        total += c.shipments[i];
+        if (ARTIS_SIZES.includes(cube.dimensions.size[c.size[i]])) artis += c.shipments[i];
+    });
+    const row = group => ({
+        count: group.count,
+        pct: pct(group.count, total),
+        single_side_pct: pct(group.single, group.count),
+        avg_price: group.priceCount ? round(group.priceSum / group.priceCount, 2) : 0
+    });
+    const sizes = groupBy(cells, 'size').map(group => ({size: group.label ?? 'Unspecified', ...row(group), top_buyers: '…'}));
+    return {
+        missing: ['top_buyers'],
+        data: {
+            top_size: sizes.length ? sizes[0].size : 'Unknown',
+            top_size_pct: sizes.length ? sizes[0].pct : 0,
+            artis_size_pct: pct(artis, total),
+            sizes: sizes,
+            thickness: groupBy(cells, 'thickness').map(group => ({thickness: group.label ?? 'Unspecified', ...row(group)}))
+        }
+    };
+}
+
+function pricing(cells) {
+    const c = cube.columns;
+    const types = cube.dimensions.product_type;
+    const sums = {};
+    cells.forEach(i => {
+        const type = types[c.product_type[i]];
+        const entry = sums[type] || (sums[type] = {sum: 0, count: 0});
+        entry.sum += c.clean_price_sum[i];
+        entry.count += c.clean_price_count[i];
+    });
+    const average = type => sums[type] && sums[type].count ? round(sums[type].sum / sums[type].count, 2) : 0;
+    return {
+        missing: ['price_ranges'],
+        data: {
+            single_side_avg: average('SINGLE_SIDE'),
+            double_side_avg: average('DOUBLE_SIDE'),
+            price_ranges: []
+        }
+    };
+}
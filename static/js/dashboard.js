@@ -0,0 +1,1704 @@
+let currentTab = 'overview';
+let currentFilters = {};
+let activeDropdown = null;
+
+function showTab(tabName) {
+    // Update tabs
+    document.querySelectorAll('.tab').forEach(tab => tab.classList.remove('active'));
+    document.querySelectorAll('.tab-content').forEach(content => content.classList.remove('active'));
+
+    event.target.classList.add('active');
+    document.getElementById(tabName).classList.add('active');
+
+    currentTab = tabName;
+    loadTabData(tabName);
+}
+
+function toggleFilterDropdown(filterName) {
+    const dropdown = document.getElementById(filterName + 'Dropdown');
+    const overlay = document.getElementById('filterOverlay');
+
+    if (activeDropdown && activeDropdown !== dropdown) {
+        activeDropdown.classList.remove('active');
+    }
+
+    dropdown.classList.toggle('active');
+    overlay.classList.toggle('active', dropdown.classList.contains('active'));
+
+    activeDropdown = dropdown.classList.contains('active') ? dropdown : null;
+}
+
+function closeFilterDropdown(filterName) {
+    const dropdown = document.getElementById(filterName + 'Dropdown');
+    const overlay = document.getElementById('filterOverlay');
+    dropdown.classList.remove('active');
+    overlay.classList.remove('active');
+    activeDropdown = null;
+}
+
+function closeAllDropdowns() {
+    document.querySelectorAll('.filter-dropdown').forEach(dropdown => {
+        dropdown.classList.remove('active');
+    });
+    document.getElementById('filterOverlay').classList.remove('active');
+    activeDropdown = null;
+}
+
+function setProductType(value) {
+    document.getElementById('productType').value = value;
+    updateFilterChip('product');
+    closeFilterDropdown('product');
+}
+
+function setSize(value) {
+    document.getElementById('size').value = value;
+    updateFilterChip('size');
+    closeFilterDropdown('size');
+}
+
+function setThickness(value) {
+    document.getElementById('thickness').value = value;
+    updateFilterChip('thickness');
+    closeFilterDropdown('thickness');
+}
+
+function setDateRange(value) {
+    document.getElementById('dateRange').value = value;
+
+    // Show/hide custom date pickers
+    const customPickers = document.getElementById('customDatePickers');
+    if (value === 'custom') {
+        customPickers.style.display = 'block';
+        // Keep dropdown open for custom option
+        return;
+    } else {
+        customPickers.style.display = 'none';
+        updateFilterChip('date');
+        closeFilterDropdown('date');
+    }
+}
+
+function updateCustomDateRange() {
+    const startDate = document.getElementById('customStartDate').value;
+    const endDate = document.getElementById('customEndDate').value;
+
+    if (startDate && endDate) {
+        document.getElementById('customStart').value = startDate;
+        document.getElementById('customEnd').value = endDate;
+        updateFilterChip('date');
+        // Optionally close dropdown after both dates are selected
+        setTimeout(() => closeFilterDropdown('date'), 500);
+    }
+}
+
+function updateFilterChip(filterName) {
+    const chipValue = document.getElementById(filterName + 'Value');
+    const chip = document.getElementById(filterName + 'Chip');
+
+    if (filterName === 'countries') {
+        const checked = document.querySelectorAll('#countryCheckboxes input:checked').length;
+        const total = document.querySelectorAll('#countryCheckboxes input').length;
+        chipValue.textContent = checked === total ? 'All' : `${checked} selected`;
+        chip.classList.toggle('active', checked < total);
+    } else if (filterName === 'product') {
+        const value = document.getElementById('productType').value;
+        chipValue.textContent = value === 'all' ? 'All' : 
+            value === 'SINGLE_SIDE' ? 'Single' : 'Double';
+        chip.classList.toggle('active', value !== 'all');
+    } else if (filterName === 'size') {
+        const value = document.getElementById('size').value;
+        chipValue.textContent = value === 'all' ? 'All' : 
+            value === '1220x2440' ? '1220x2440' : 
+            value === '2440x1220' ? '2440x1220' : 'Other';
+        chip.classList.toggle('active', value !== 'all');
+    } else if (filterName === 'thickness') {
+        const value = document.getElementById('thickness').value;
+        chipValue.textContent = value === 'all' ? 'All' : 
+            value === 'other' ? 'Other' : `${value}mm`;
+        chip.classList.toggle('active', value !== 'all');
+    } else if (filterName === 'value') {
+        const value = document.getElementById('minValue').value;
+        chipValue.textContent = value > 0 ? `$${parseInt(value).toLocaleString()}` : '$0';
+        chip.classList.toggle('active', value > 0);
+    } else if (filterName === 'date') {
+        const value = document.getElementById('dateRange').value;
+        const labels = {
+            'all': 'All Time',
+            '2025': '2025',
+            '2024': '2024',
+            '2023': '2023',
+            'recent': 'Last 12M',
+            'last6': 'Last 6M',
+            'last3': 'Last 3M',
+            'custom': 'Custom'
+        };
+
+        if (value === 'custom') {
+            const startDate = document.getElementById('customStart').value;
+            const endDate = document.getElementById('customEnd').value;
+            if (startDate && endDate) {
+                const start = new Date(startDate).toLocaleDateString('en-US', { month: 'short', day: 'numeric', year: 'numeric' });
+                const end = new Date(endDate).toLocaleDateString('en-US', { month: 'short', day: 'numeric', year: 'numeric' });
+                chipValue.textContent = `${start} - ${end}`;
+            } else {
+                chipValue.textContent = 'Custom';
+            }
+        } else {
+            chipValue.textContent = labels[value] || 'All Time';
+        }
+        chip.classList.toggle('active', value !== 'all');
+    }
+}
+
+function getFilters() {
+    const selectedCountries = [];
+    document.querySelectorAll('#countryCheckboxes input[type="checkbox"]:checked').forEach(cb => {
+        selectedCountries.push(cb.value);
+    });
+
+    let countries = null;
+    if (!selectedCountries.includes('all') && selectedCountries.length > 0) {
+        countries = selectedCountries;
+    }
+
+    const dateRange = document.getElementById('dateRange').value;
+    const filters = {
+        countries: countries,
+        productType: document.getElementById('productType').value,
+        size: document.getElementById('size').value,
+        thickness: document.getElementById('thickness').value,
+        minValue: document.getElementById('minValue').value,
+        dateRange: dateRange
+    };
+
+    // Add custom date range if selected
+    if (dateRange === 'custom') {
+        filters.customStart = document.getElementById('customStart').value;
+        filters.customEnd = document.getElementById('customEnd').value;
+    }
+
+    return filters;
+}
+
+const FILTER_DEBOUNCE_MS = 150;
+let applyFiltersTimer = null;
+
+function applyFilters() {
+    currentFilters = getFilters();
+    closeAllDropdowns();
+
+    // Update all filter chips
+    updateFilterChip('countries');
+    updateFilterChip('product');
+    updateFilterChip('size');
+    updateFilterChip('thickness');
+    updateFilterChip('value');
+    updateFilterChip('date');
+
+    // Rapid re-applies collapse into one load
+    clearTimeout(applyFiltersTimer);
+    applyFiltersTimer = setTimeout(() => {
+        loadTabData(currentTab);
+        loadFacetCounts(buildParams(currentFilters));
+    }, FILTER_DEBOUNCE_MS);
+}
+
+function buildParams(filters) {
+    const params = new URLSearchParams();
+    if (filters.countries) {
+        filters.countries.forEach(c => params.append('countries', c));
+    }
+    if (filters.productType !== 'all') {
+        params.append('product_type', filters.productType);
+    }
+    if (filters.size !== 'all') {
+        params.append('size', filters.size);
+    }
+    if (filters.thickness !== 'all') {
+        params.append('thickness', filters.thickness);
+    }
+    if (filters.minValue && parseFloat(filters.minValue) !== 0) {
+        params.append('min_value', filters.minValue);
+    }
+    if (filters.dateRange !== 'all') {
+        params.append('date_range', filters.dateRange);
+
+        // Add custom date parameters if custom range is selected
+        if (filters.dateRange === 'custom') {
+            if (filters.customStart) {
+                params.append('custom_start', filters.customStart);
+            }
+            if (filters.customEnd) {
+                params.append('custom_end', filters.customEnd);
+            }
+        }
+    }
+    params.sort();
+    return params;
+}
+
+// ---------------------------------------------------------------------------
+// API data layer: response cache keyed by tab + filters, validated against the
+// server's dataset version, with in-flight de-duplication and cancellation
+// ---------------------------------------------------------------------------
+
+const RESPONSE_CACHE_LIMIT = 60;
+const PERSIST_RESPONSES = 'indexedDB' in window;
+
+let datasetVersion = null;
+const responseCache = new Map();   // key -> {version, data}
+const inflightRequests = new Map(); // key -> {controller, promise, interactive}
+let currentLoadKey = null;
+
+function requestKey(tabName, params) {
+    return `${tabName}?${params}`;
+}
+
+function setDatasetVersion(version) {
+    if (!version || version === datasetVersion) return;
+    const previous = datasetVersion;
+    datasetVersion = version;
+    if (previous !== null) {
+        // New data on the server - everything cached so far is stale
+        responseCache.clear();
+        persistentCache.clear();
+        reloadCube();
+    }
+}
+
+function cacheResponse(key, data) {
+    responseCache.delete(key);
+    responseCache.set(key, {version: datasetVersion, data: data});
+    while (responseCache.size > RESPONSE_CACHE_LIMIT) {
+        responseCache.delete(responseCache.keys().next().value);
+    }
+}
+
+function cachedResponse(key) {
+    const entry = responseCache.get(key);
+    if (!entry || entry.version !== datasetVersion) return null;
+    // Refresh LRU position
+    responseCache.delete(key);
+    responseCache.set(key, entry);
+    return entry.data;
+}
+
+// Optional IndexedDB copy of the response cache, so reloads start warm
+const persistentCache = {
+    db: null,
+
+    open() {
+        if (!PERSIST_RESPONSES) return Promise.resolve(null);
+        if (this.db) return this.db;
+        this.db = new Promise(resolve => {
+            const request = indexedDB.open('gcc-dashboard', 1);
+            request.onupgradeneeded = () => request.result.createObjectStore('responses');
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => resolve(null);
+        });
+        return this.db;
+    },
+
+    async get(key) {
+        const db = await this.open();
+        if (!db) return null;
+        return new Promise(resolve => {
+            const request = db.transaction('responses').objectStore('responses').get(key);
+            request.onsuccess = () => {
+                const entry = request.result;
+                resolve(entry && entry.version === datasetVersion ? entry.data : null);
+            };
+            request.onerror = () => resolve(null);
+        });
+    },
+
+    async put(key, data) {
+        const db = await this.open();
+        if (!db) return;
+        db.transaction('responses', 'readwrite').objectStore('responses')
+            .put({version: datasetVersion, data: data}, key);
+    },
+
+    async clear() {
+        const db = await this.open();
+        if (!db) return;
+        db.transaction('responses', 'readwrite').objectStore('responses').clear();
+    },
+
+    // Carry entries of version `previous` over to the current version unless affected
+    async retag(previous, isAffected) {
+        const db = await this.open();
+        if (!db) return;
+        const version = datasetVersion;
+        const request = db.transaction('responses', 'readwrite').objectStore('responses').openCursor();
+        request.onsuccess = () => {
+            const cursor = request.result;
+            if (!cursor) return;
+            if (cursor.value.version !== previous || isAffected(cursor.key)) {
+                cursor.delete();
+            } else {
+                cursor.update({version: version, data: cursor.value.data});
+            }
+            cursor.continue();
+        };
+    }
+};
+
+async function ensureDatasetVersion() {
+    if (datasetVersion !== null) return;
+    try {
+        const response = await fetch('/api/version');
+        setDatasetVersion((await response.json()).version);
+    } catch (error) {
+        console.error('Could not read dataset version:', error);
+    }
+}
+
+async function fetchTabData(tabName, params, {interactive = false} = {}) {
+    const key = requestKey(tabName, params);
+    const cached = cachedResponse(key);
+    if (cached) return cached;
+
+    // Share an identical request that is already on the wire
+    const inflight = inflightRequests.get(key);
+    if (inflight) {
+        inflight.interactive = inflight.interactive || interactive;
+        return inflight.promise;
+    }
+
+    const controller = new AbortController();
+    const promise = (async () => {
+        await ensureDatasetVersion();
+        const persisted = await persistentCache.get(key);
+        if (persisted) {
+            cacheResponse(key, persisted);
+            return persisted;
+        }
+        const response = await fetch(`/api/${tabName}?${params}`, {signal: controller.signal});
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const data = await response.json();
+        if (response.headers.get('X-Cache') === 'stale') {
+            // Answered from older data while the server recomputes - show it, keep nothing
+            return data;
+        }
+        setDatasetVersion(response.headers.get('X-Dataset-Version'));
+        cacheResponse(key, data);
+        persistentCache.put(key, data);
+        return data;
+    })();
+    inflightRequests.set(key, {controller, promise, interactive});
+    promise.then(
+        () => inflightRequests.delete(key),
+        () => inflightRequests.delete(key)
+    );
+    return promise;
+}
+
+function cancelSupersededLoads(key) {
+    const params = key.split('?')[1];
+    inflightRequests.forEach((request, otherKey) => {
+        // Interactive loads for anything else, prefetches for other filters
+        const superseded = request.interactive ? otherKey !== key : otherKey.split('?')[1] !== params;
+        if (superseded) {
+            request.controller.abort();
+        }
+    });
+}
+
+// ---------------------------------------------------------------------------
+// Live dataset updates: /api/events announces each new dataset version with the
+// months and countries it touched, so only the affected responses are dropped
+// ---------------------------------------------------------------------------
+
+const YEAR_RANGES = ['2023', '2024', '2025'];
+
+// Whether a cached response for `key` may have changed; months/countries of
+// null mean the server could not tell, so everything is affected
+function responseAffected(key, change) {
+    const [tabName, query] = key.split('?');
+    if (tabName === 'facets' || !change.months || !change.countries) return true;
+    const params = new URLSearchParams(query);
+
+    const countries = params.getAll('countries');
+    // Insights always cover the whole market
+    if (tabName !== 'insights' && countries.length && !change.countries.some(c => countries.includes(c))) {
+        return false;
+    }
+
+    const months = change.months.filter(month => month !== null);
+    const dateRange = params.get('date_range') || 'all';
+    if (dateRange === 'all') return true;
+    if (dateRange === '2025') return months.some(month => month >= '2025-01');
+    if (YEAR_RANGES.includes(dateRange)) return months.some(month => month.startsWith(dateRange + '-'));
+    if (dateRange === 'custom') {
+        const start = (params.get('custom_start') || '').slice(0, 7);
+        const end = (params.get('custom_end') || '9999-12').slice(0, 7);
+        return months.some(month => month >= start && month <= end);
+    }
+    // Rolling ranges (last 3/6/12 months) move with the data
+    return true;
+}
+
+function applyDatasetChange(change) {
+    if (!change.version || change.version === datasetVersion) return;
+    const previous = datasetVersion;
+    if (previous === null || !change.months) {
+        setDatasetVersion(change.version);
+        if (previous !== null) {
+            loadTabData(currentTab);
+            loadFacetCounts(buildParams(currentFilters));
+        }
+        return;
+    }
+
+    datasetVersion = change.version;
+    const isAffected = key => responseAffected(key, change);
+    responseCache.forEach((entry, key) => {
+        if (entry.version !== previous || isAffected(key)) {
+            responseCache.delete(key);
+        } else {
+            entry.version = datasetVersion;
+        }
+    });
+    persistentCache.retag(previous, isAffected);
+    inflightRequests.forEach((request, key) => {
+        if (isAffected(key)) request.controller.abort();
+    });
+    reloadCube();
+
+    const params = buildParams(currentFilters);
+    if (isAffected(requestKey(currentTab, params))) {
+        console.log(`Dataset updated (${change.months.length} month(s)), refreshing ${currentTab}`);
+        loadTabData(currentTab);
+    }
+    loadFacetCounts(params);
+}
+
+function listenForDatasetChanges() {
+    if (!window.EventSource) return;
+    const events = new EventSource('/api/events');
+    events.addEventListener('version', event => applyDatasetChange(JSON.parse(event.data)));
+}
+
+// ---------------------------------------------------------------------------
+// Idle-time prefetch of the other tabs for the current filters
+// ---------------------------------------------------------------------------
+
+const TAB_NAMES = ['overview', 'buyers', 'products', 'competitors', 'pricing', 'insights'];
+const PREFETCH_CONCURRENCY = 2;
+
+let prefetchParams = null;
+let prefetchQueue = [];
+let prefetchActive = 0;
+
+const whenIdle = window.requestIdleCallback ?
+    callback => requestIdleCallback(callback, {timeout: 2000}) :
+    callback => setTimeout(callback, 200);
+
+function schedulePrefetch(params) {
+    if (navigator.connection && navigator.connection.saveData) return;
+    prefetchParams = params;
+    prefetchQueue = TAB_NAMES.filter(tab => tab !== currentTab && !cachedResponse(requestKey(tab, params)));
+    whenIdle(runPrefetch);
+}
+
+function prioritizePrefetch(tabName) {
+    // Hovering a tab is a strong hint it is next - fetch it ahead of the idle queue
+    if (!prefetchParams || tabName === currentTab) return;
+    if (cachedResponse(requestKey(tabName, prefetchParams))) return;
+    prefetchQueue = [tabName, ...prefetchQueue.filter(tab => tab !== tabName)];
+    runPrefetch();
+}
+
+function runPrefetch(deadline) {
+    while (prefetchActive < PREFETCH_CONCURRENCY && prefetchQueue.length) {
+        if (deadline && deadline.timeRemaining() < 5 && !deadline.didTimeout) {
+            whenIdle(runPrefetch);
+            return;
+        }
+        const tabName = prefetchQueue.shift();
+        const params = prefetchParams;
+        prefetchActive++;
+        fetchTabData(tabName, params)
+            .catch(() => {})
+            .finally(() => {
+                prefetchActive--;
+                if (params === prefetchParams && prefetchQueue.length) whenIdle(runPrefetch);
+            });
+    }
+}
+
+// ---------------------------------------------------------------------------
+// Client-side data cube (answered by cube-worker.js)
+// ---------------------------------------------------------------------------
+
+let cubeWorker = null;
+let cubeReady = false;
+let cubeQueryId = 0;
+const cubeCallbacks = new Map();
+
+function startCubeWorker() {
+    const meta = document.querySelector('meta[name="cube-worker"]');
+    if (!window.Worker || !meta || cubeWorker) return;
+    cubeWorker = new Worker(meta.content);
+    cubeWorker.onmessage = event => {
+        const message = event.data;
+        if (message.type === 'ready') {
+            if (datasetVersion === null) setDatasetVersion(message.version);
+            cubeReady = message.version === datasetVersion;
+        } else if (message.type === 'result') {
+            const callback = cubeCallbacks.get(message.id);
+            cubeCallbacks.delete(message.id);
+            if (callback) callback(message);
+        } else if (message.type === 'error') {
+            console.warn('Data cube unavailable:', message.message);
+        }
+    };
+    reloadCube();
+}
+
+function reloadCube() {
+    if (!cubeWorker) return;
+    cubeReady = false;
+    cubeWorker.postMessage({type: 'load', url: '/api/cube'});
+}
+
+function queryCube(tabName, filters) {
+    if (!cubeReady) return Promise.resolve(null);
+    return new Promise(resolve => {
+        const id = ++cubeQueryId;
+        cubeCallbacks.set(id, message => {
+            resolve(message.version === datasetVersion ? message.result : null);
+        });
+        cubeWorker.postMessage({type: 'query', id: id, tab: tabName, filters: filters});
+    });
+}
+
+async function loadTabData(tabName) {
+    const params = buildParams(currentFilters);
+    const key = requestKey(tabName, params);
+    currentLoadKey = key;
+    cancelSupersededLoads(key);
+
+    try {
+        if (!cachedResponse(key)) {
+            // Paint what the cube can answer right away; the server fills in the rest
+            const local = await queryCube(tabName, currentFilters);
+            if (currentLoadKey !== key) return;
+            if (local) {
+                renderTabContent(tabName, local.data);
+                if (!local.missing.length) {
+                    schedulePrefetch(params);
+                    return;
+                }
+            }
+        }
+        const data = await fetchTabData(tabName, params, {interactive: true});
+        // A newer tab or filter selection may have started while this one was loading
+        if (currentLoadKey !== key) return;
+        renderTabContent(tabName, data);
+        schedulePrefetch(params);
+    } catch (error) {
+        if (error.name === 'AbortError' || currentLoadKey !== key) return;
+        console.error('Error loading data:', error);
+        document.getElementById(tabName).innerHTML = '<div class="loading">Error loading data</div>';
+    }
+}
+
+function renderTabContent(tabName, data) {
+    const container = document.getElementById(tabName);
+
+    switch(tabName) {
+        case 'overview':
+            renderOverview(container, data);
+            break;
+        case 'buyers':
+            renderBuyers(container, data);
+            break;
+        case 'products':
+            renderProducts(container, data);
+            break;
+        case 'competitors':
+            renderCompetitors(container, data);
+            break;
+        case 'pricing':
+            renderPricing(container, data);
+            break;
+        case 'insights':
+            renderInsights(container, data);
+            break;
+    }
+}
+
+function renderOverview(container, data) {
+    container.innerHTML = `
+        <h2>Market Overview</h2>
+        <div class="stats-grid">
+            <div class="stat-card">
+                <div class="stat-label">Total Market Value</div>
+                <div class="stat-value">$${(data.total_value / 1000000).toFixed(1)}M</div>
+                <div class="stat-label">${data.total_shipments.toLocaleString()} shipments</div>
+            </div>
+            <div class="stat-card" style="background: linear-gradient(135deg, #28a745 0%, #20c997 100%);">
+                <div class="stat-label">Single-Side Market</div>
+                <div class="stat-value">${data.single_side_pct}%</div>
+                <div class="stat-label">${data.single_side_count.toLocaleString()} orders</div>
+            </div>
+            <div class="stat-card" style="background: linear-gradient(135deg, #dc3545 0%, #f86734 100%);">
+                <div class="stat-label">Active Buyers</div>
+                <div class="stat-value">${data.unique_buyers_estimated ? '≈' : ''}${data.unique_buyers ?? '…'}</div>
+                <div class="stat-label">Importing regularly</div>
+            </div>
+            <div class="stat-card" style="background: linear-gradient(135deg, #ffc107 0%, #ff6b6b 100%);">
+                <div class="stat-label">Avg Order Value</div>
+                <div class="stat-value">$${data.avg_order_value.toFixed(0)}</div>
+                <div class="stat-label">Per shipment</div>
+            </div>
+        </div>
+
+        <div style="background: white; padding: 20px; border-radius: 10px; margin: 20px 0;">
+            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
+                <h3 style="margin: 0;">Country Distribution</h3>
+                <div style="background: #f8f9fa; padding: 12px; border-radius: 8px; display: flex; align-items: center; justify-content: center; gap: 15px; margin-bottom: 20px;">
+                    <span style="font-size: 15px; font-weight: 600; color: #444;">View by:</span>
+                    <button id="valueBtn" onclick="setMetric('value')" style="padding: 10px 28px; background: #1a237e; color: white; border: none; border-radius: 6px; font-size: 15px; font-weight: 600; cursor: pointer; transition: all 0.2s;">
+                        Value (USD)
+                    </button>
+                    <button id="volumeBtn" onclick="setMetric('volume')" style="padding: 10px 28px; background: white; color: #555; border: 2px solid #ddd; border-radius: 6px; font-size: 15px; font-weight: 600; cursor: pointer; transition: all 0.2s;">
+                        Volume (Sheets)
+                    </button>
+                </div>
+            </div>
+            <div style="position: relative; height: 350px; overflow-x: auto; overflow-y: hidden;">
+                <div style="min-width: ${Math.max(600, data.country_dist.labels.length * 80)}px; height: 320px;">
+                    <canvas id="countryChart"></canvas>
+                </div>
+            </div>
+        </div>
+    `;
+
+    // Store country data globally for toggle
+    window.countryData = data.country_dist;
+
+    // Render chart with proper cleanup
+    if (data.country_dist && data.country_dist.labels && data.country_dist.labels.length > 0) {
+        setTimeout(() => {
+            // Destroy existing chart if any
+            if (window.countryChartInstance) {
+                window.countryChartInstance.destroy();
+            }
+            renderCountryChart(data.country_dist);
+        }, 100);
+    }
+}
+
+function renderBuyers(container, data) {
+    let html = `
+        <h2>Top Buyers Intelligence</h2>
+        <p style="margin-bottom: 20px; color: #666;">
+            Found ${data.buyer_counts_estimated ? '≈' : ''}${data.total_buyers} buyers | 
+            Single-side buyers: ${data.single_side_buyers} | 
+            Target opportunities: ${data.artis_compatible_buyers}
+        </p>
+    `;
+
+    data.buyers.forEach(buyer => {
+        const buyerClass = buyer.single_side_pct > 70 ? 'single-side-buyer' : 
+                          buyer.single_side_pct < 30 ? 'double-side-buyer' : 'mixed-buyer';
+
+        const isArtisTarget = buyer.buys_1220x2440 && buyer.single_side_pct > 50;
+
+        html += `
+            <div class="buyer-card ${buyerClass} drillable" data-name="${encodeURIComponent(buyer.name)}">
+                <div class="buyer-name">
+                    ${buyer.name} 
+                    ${isArtisTarget ? '<span class="highlight">🎯 Artis Target</span>' : ''}
+                </div>
+                <div class="buyer-details">
+                    <div class="buyer-stat">
+                        <span class="buyer-stat-label">Country</span>
+                        <span class="buyer-stat-value">${buyer.countries}</span>
+                    </div>
+                    <div class="buyer-stat">
+                        <span class="buyer-stat-label">Total Orders</span>
+                        <span class="buyer-stat-value">${buyer.total_orders}</span>
+                    </div>
+                    <div class="buyer-stat">
+                        <span class="buyer-stat-label">Total Value</span>
+                        <span class="buyer-stat-value">$${(buyer.total_value / 1000).toFixed(0)}K</span>
+                    </div>
+                    <div class="buyer-stat">
+                        <span class="buyer-stat-label">Single-Side %</span>
+                        <span class="buyer-stat-value">${buyer.single_side_pct}%</span>
+                    </div>
+                    <div class="buyer-stat">
+                        <span class="buyer-stat-label">Avg Price/Unit</span>
+                        <span class="buyer-stat-value">$${buyer.avg_price.toFixed(2)}</span>
+                    </div>
+                    <div class="buyer-stat">
+                        <span class="buyer-stat-label">Main Supplier</span>
+                        <span class="buyer-stat-value">${buyer.main_supplier}</span>
+                    </div>
+                    <div class="buyer-stat">
+                        <span class="buyer-stat-label">Sizes Ordered</span>
+                        <span class="buyer-stat-value">${buyer.sizes || 'Various'}</span>
+                    </div>
+                    <div class="buyer-stat">
+                        <span class="buyer-stat-label">Last Order</span>
+                        <span class="buyer-stat-value">${buyer.last_order}</span>
+                    </div>
+                </div>
+            </div>
+        `;
+    });
+
+    container.innerHTML = html;
+    bindDrillDowns(container, 'buyers', renderBuyerDetail);
+}
+
+// ---------------------------------------------------------------------------
+// Drill-downs: clicking a card loads /api/<kind>/<name> for the current
+// countries and date range below it (cached like the tab responses)
+// ---------------------------------------------------------------------------
+
+function bindDrillDowns(container, kind, render) {
+    container.querySelectorAll('.drillable').forEach(card => {
+        card.addEventListener('click', event => {
+            if (event.target.closest('.entity-detail')) return;
+            toggleDrillDown(card, kind, render);
+        });
+    });
+}
+
+async function toggleDrillDown(card, kind, render) {
+    if (card.drillDown) {
+        card.drillDown.remove();
+        card.drillDown = null;
+        return;
+    }
+    const panel = document.createElement('div');
+    panel.className = 'entity-detail';
+    panel.innerHTML = '<div class="loading">Loading...</div>';
+    if (card.tagName === 'TR') {
+        // Table rows get the panel in a full-width row underneath
+        const row = document.createElement('tr');
+        const cell = row.insertCell();
+        cell.colSpan = card.cells.length;
+        cell.className = 'entity-detail-cell';
+        cell.appendChild(panel);
+        card.after(row);
+        card.drillDown = row;
+    } else {
+        card.appendChild(panel);
+        card.drillDown = panel;
+    }
+    try {
+        const data = await fetchTabData(`${kind}/${card.dataset.name}`, buildParams(currentFilters));
+        if (panel.isConnected) panel.innerHTML = render(data);
+    } catch (error) {
+        if (error.name === 'AbortError') {
+            card.drillDown.remove();
+            card.drillDown = null;
+        } else {
+            console.error('Error loading details:', error);
+            panel.innerHTML = '<div class="loading">Error loading details</div>';
+        }
+    }
+}
+
+function formatMix(rows) {
+    return rows.map(row => `${row.value ?? 'Unspecified'} ${row.pct}%`).join(', ');
+}
+
+function renderMonthlyTable(monthly) {
+    return `
+        <table>
+            <thead><tr><th>Month</th><th>Orders</th><th>Value</th><th>Sheets</th><th>Avg Price</th></tr></thead>
+            <tbody>
+                ${monthly.map(row => `
+                    <tr>
+                        <td>${row.month ?? 'Unknown'}</td>
+                        <td>${row.orders}</td>
+                        <td>$${(row.value / 1000).toFixed(0)}K</td>
+                        <td>${row.quantity.toLocaleString()}</td>
+                        <td>${row.avg_price !== null ? '$' + row.avg_price.toFixed(2) : '-'}</td>
+                    </tr>
+                `).join('')}
+            </tbody>
+        </table>
+    `;
+}
+
+function renderBuyerDetail(data) {
+    const suppliers = data.supplier_share.series;
+    const latest = data.supplier_share.months.length - 1;
+    return `
+        <div class="buyer-details">
+            <div class="buyer-stat">
+                <span class="buyer-stat-label">First / Last Order</span>
+                <span class="buyer-stat-value">${data.first_order} - ${data.last_order}</span>
+            </div>
+            <div class="buyer-stat">
+                <span class="buyer-stat-label">Sheets</span>
+                <span class="buyer-stat-value">${data.total_quantity.toLocaleString()}</span>
+            </div>
+            <div class="buyer-stat">
+                <span class="buyer-stat-label">Product Mix</span>
+                <span class="buyer-stat-value">${formatMix(data.spec_mix.product_type)}</span>
+            </div>
+            <div class="buyer-stat">
+                <span class="buyer-stat-label">Size Mix</span>
+                <span class="buyer-stat-value">${formatMix(data.spec_mix.size.slice(0, 3))}</span>
+            </div>
+            <div class="buyer-stat">
+                <span class="buyer-stat-label">Thickness Mix</span>
+                <span class="buyer-stat-value">${formatMix(data.spec_mix.thickness.slice(0, 3))}</span>
+            </div>
+        </div>
+        <div class="table-container">
+            <h3>Suppliers (share of value, latest month ${data.supplier_share.months[latest] ?? ''})</h3>
+            <table>
+                <thead><tr><th>Supplier</th><th>Total Value</th><th>Latest Month %</th></tr></thead>
+                <tbody>
+                    ${suppliers.map(series => `
+                        <tr>
+                            <td>${series.name ?? 'Unknown'}</td>
+                            <td>$${(series.value / 1000).toFixed(0)}K</td>
+                            <td>${series.share_pct[latest]}%</td>
+                        </tr>
+                    `).join('')}
+                </tbody>
+            </table>
+        </div>
+        <div class="table-container">
+            <h3>Price Paid vs Market Median</h3>
+            <table>
+                <thead><tr><th>Spec</th><th>Orders</th><th>Paid</th><th>Market</th><th>Difference</th></tr></thead>
+                <tbody>
+                    ${data.price_vs_market.map(row => `
+                        <tr>
+                            <td>${row.product_type ?? '-'} / ${row.size ?? '-'} / ${row.thickness ?? '-'}mm</td>
+                            <td>${row.orders}</td>
+                            <td>$${row.median_price.toFixed(2)}</td>
+                            <td>${row.market_median !== null ? '$' + row.market_median.toFixed(2) : '-'}</td>
+                            <td>${row.premium_pct !== null ? (row.premium_pct > 0 ? '+' : '') + row.premium_pct + '%' : '-'}</td>
+                        </tr>
+                    `).join('')}
+                </tbody>
+            </table>
+        </div>
+        <div class="table-container">
+            <h3>Monthly Shipments</h3>
+            ${renderMonthlyTable(data.monthly)}
+        </div>
+    `;
+}
+
+function renderCompetitorDetail(data) {
+    return `
+        <div class="buyer-details">
+            <div class="buyer-stat">
+                <span class="buyer-stat-label">First / Last Shipment</span>
+                <span class="buyer-stat-value">${data.first_order} - ${data.last_order}</span>
+            </div>
+            <div class="buyer-stat">
+                <span class="buyer-stat-label">Buyers</span>
+                <span class="buyer-stat-value">${data.buyer_count}</span>
+            </div>
+            <div class="buyer-stat">
+                <span class="buyer-stat-label">Sheets</span>
+                <span class="buyer-stat-value">${data.total_quantity.toLocaleString()}</span>
+            </div>
+            <div class="buyer-stat">
+                <span class="buyer-stat-label">Product Mix</span>
+                <span class="buyer-stat-value">${formatMix(data.spec_mix.product_type)}</span>
+            </div>
+            <div class="buyer-stat">
+                <span class="buyer-stat-label">Size Mix</span>
+                <span class="buyer-stat-value">${formatMix(data.spec_mix.size.slice(0, 3))}</span>
+            </div>
+            <div class="buyer-stat">
+                <span class="buyer-stat-label">Thickness Mix</span>
+                <span class="buyer-stat-value">${formatMix(data.spec_mix.thickness.slice(0, 3))}</span>
+            </div>
+        </div>
+        <div class="table-container">
+            <h3>Destinations</h3>
+            ${renderBreakdownTable('Country', data.destinations)}
+        </div>
+        <div class="table-container">
+            <h3>Top Buyers</h3>
+            ${renderBreakdownTable('Buyer', data.top_buyers)}
+        </div>
+        <div class="table-container">
+            <h3>Monthly Volume and Price</h3>
+            ${renderMonthlyTable(data.monthly)}
+        </div>
+    `;
+}
+
+function renderBreakdownTable(label, rows) {
+    return `
+        <table>
+            <thead><tr><th>${label}</th><th>Orders</th><th>Value</th><th>Share</th><th>Last Order</th></tr></thead>
+            <tbody>
+                ${rows.map(row => `
+                    <tr>
+                        <td>${row.name ?? 'Unknown'}</td>
+                        <td>${row.orders}</td>
+                        <td>$${(row.value / 1000).toFixed(0)}K</td>
+                        <td>${row.value_pct}%</td>
+                        <td>${row.last_order ?? '-'}</td>
+                    </tr>
+                `).join('')}
+            </tbody>
+        </table>
+    `;
+}
+
+// ---------------------------------------------------------------------------
+// Type-ahead search over buyer and supplier names (/api/search)
+// ---------------------------------------------------------------------------
+
+const SEARCH_DEBOUNCE_MS = 80;
+const SEARCH_KINDS = {
+    buyer: {path: 'buyers', label: 'Buyer', render: renderBuyerDetail},
+    supplier: {path: 'competitors', label: 'Supplier', render: renderCompetitorDetail}
+};
+
+let searchTimer = null;
+let searchController = null;
+let searchSelected = -1;
+
+function onSearchInput(value) {
+    clearTimeout(searchTimer);
+    const query = value.trim();
+    if (!query) {
+        closeSearchResults();
+        return;
+    }
+    searchTimer = setTimeout(() => runSearch(query), SEARCH_DEBOUNCE_MS);
+}
+
+async function runSearch(query) {
+    // Only the latest keystroke's answer matters
+    if (searchController) searchController.abort();
+    searchController = new AbortController();
+    try {
+        const response = await fetch(`/api/search?q=${encodeURIComponent(query)}`, {signal: searchController.signal});
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        renderSearchResults(await response.json());
+    } catch (error) {
+        if (error.name !== 'AbortError') console.error('Search failed:', error);
+    }
+}
+
+function renderSearchResults(data) {
+    const container = document.getElementById('searchResults');
+    searchSelected = -1;
+    container.innerHTML = data.results.length ? data.results.map(result => `
+        <div class="search-result" data-kind="${result.kind}" data-name="${encodeURIComponent(result.name)}">
+            <strong>${result.name}</strong>
+            <div class="search-result-meta">
+                ${SEARCH_KINDS[result.kind].label} · ${result.orders} orders ·
+                $${(result.total_value / 1000000).toFixed(1)}M · last ${result.last_order ?? '-'}
+            </div>
+        </div>
+    `).join('') : `<div class="search-result search-result-meta">No buyer or supplier matches "${data.query}"</div>`;
+    container.querySelectorAll('.search-result[data-kind]').forEach(item => {
+        item.addEventListener('click', event => {
+            if (event.target.closest('.entity-detail')) return;
+            const kind = SEARCH_KINDS[item.dataset.kind];
+            toggleDrillDown(item, kind.path, kind.render);
+        });
+    });
+    container.classList.add('active');
+}
+
+function onSearchKeydown(event) {
+    const items = [...document.querySelectorAll('#searchResults .search-result[data-kind]')];
+    if (event.key === 'Escape') {
+        closeSearchResults();
+    } else if ((event.key === 'ArrowDown' || event.key === 'ArrowUp') && items.length) {
+        event.preventDefault();
+        const step = event.key === 'ArrowDown' ? 1 : -1;
+        searchSelected = (searchSelected + step + items.length) % items.length;
+        items.forEach((item, i) => item.classList.toggle('selected', i === searchSelected));
+        items[searchSelected].scrollIntoView({block: 'nearest'});
+    } else if (event.key === 'Enter' && items.length) {
+        items[Math.max(searchSelected, 0)].click();
+    }
+}
+
+function closeSearchResults() {
+    if (searchController) searchController.abort();
+    document.getElementById('searchResults').classList.remove('active');
+}
+
+function renderProducts(container, data) {
+    container.innerHTML = `
+        <h2>Product Specification Analysis</h2>
+        <div class="stats-grid">
+            <div class="stat-card">
+                <div class="stat-label">Most Common Size</div>
+                <div class="stat-value">${data.top_size}</div>
+                <div class="stat-label">${data.top_size_pct}% of market</div>
+            </div>
+            <div class="stat-card" style="background: linear-gradient(135deg, #28a745 0%, #20c997 100%);">
+                <div class="stat-label">Artis Size (1220x2440)</div>
+                <div class="stat-value">${data.artis_size_pct}%</div>
+                <div class="stat-label">Market share</div>
+            </div>
+        </div>
+
+        <div class="table-container">
+            <h3>Size Distribution</h3>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Size (mm)</th>
+                        <th>Orders</th>
+                        <th>Market %</th>
+                        <th>Single-Side %</th>
+                        <th>Avg Price</th>
+                        <th>Top Buyers</th>
+                    </tr>
+                </thead>
+                <tbody id="sizeTable"></tbody>
+            </table>
+        </div>
+
+        <div class="table-container">
+            <h3>Thickness Distribution</h3>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Thickness (mm)</th>
+                        <th>Orders</th>
+                        <th>Market %</th>
+                        <th>Single-Side %</th>
+                        <th>Avg Price</th>
+                    </tr>
+                </thead>
+                <tbody id="thicknessTable"></tbody>
+            </table>
+        </div>
+    `;
+
+    // Populate tables
+    if (data.sizes) {
+        const sizeTable = document.getElementById('sizeTable');
+        data.sizes.forEach(size => {
+            sizeTable.innerHTML += `
+                <tr>
+                    <td>${size.size}</td>
+                    <td>${size.count}</td>
+                    <td>${size.pct}%</td>
+                    <td>${size.single_side_pct}%</td>
+                    <td>$${size.avg_price}</td>
+                    <td>${size.top_buyers}</td>
+                </tr>
+            `;
+        });
+    }
+
+    if (data.thickness) {
+        const thicknessTable = document.getElementById('thicknessTable');
+        data.thickness.forEach(thick => {
+            thicknessTable.innerHTML += `
+                <tr>
+                    <td>${thick.thickness}</td>
+                    <td>${thick.count}</td>
+                    <td>${thick.pct}%</td>
+                    <td>${thick.single_side_pct}%</td>
+                    <td>$${thick.avg_price}</td>
+                </tr>
+            `;
+        });
+    }
+}
+
+function renderCompetitors(container, data) {
+    // Store data globally for toggle
+    window.competitorData = data;
+
+    container.innerHTML = `
+        <h2>Competitor Analysis</h2>
+        <div class="chart-container">
+            <h3>Market Share by Supplier (Value-based)</h3>
+            <canvas id="supplierChart"></canvas>
+        </div>
+
+        <div class="table-container">
+            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
+                <h3 style="margin: 0;">Top Competitors</h3>
+                <div style="background: #f8f9fa; padding: 10px; border-radius: 6px; display: flex; align-items: center; justify-content: center; gap: 12px;">
+                    <span style="font-size: 14px; font-weight: 600; color: #444;">View by:</span>
+                    <button id="compValueBtn" onclick="setCompetitorMetric('value')" style="padding: 8px 20px; background: #1a237e; color: white; border: none; border-radius: 5px; font-size: 14px; font-weight: 600; cursor: pointer;">
+                        Value
+                    </button>
+                    <button id="compVolumeBtn" onclick="setCompetitorMetric('volume')" style="padding: 8px 20px; background: white; color: #555; border: 2px solid #ddd; border-radius: 5px; font-size: 14px; font-weight: 600; cursor: pointer;">
+                        Volume
+                    </button>
+                </div>
+            </div>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Supplier</th>
+                        <th>Origin</th>
+                        <th>Orders</th>
+                        <th>Total Value</th>
+                        <th id="marketShareHeader">Market Share (Value)</th>
+                        <th>Single-Side %</th>
+                        <th>Avg Price</th>
+                        <th>Top Markets</th>
+                        <th>Key Buyers</th>
+                    </tr>
+                </thead>
+                <tbody id="competitorTableBody">
+                    ${data.competitors.map(comp => `
+                        <tr class="drillable" data-name="${encodeURIComponent(comp.name)}">
+                            <td><strong>${comp.name}</strong></td>
+                            <td>${comp.country}</td>
+                            <td>${comp.orders}</td>
+                            <td>$${(comp.total_value/1000000).toFixed(1)}M</td>
+                            <td class="market-share-cell">${comp.market_share_value}%</td>
+                            <td>${comp.single_side_pct}%</td>
+                            <td>$${comp.avg_price}</td>
+                            <td style="color: #667eea; font-weight: 600;">${comp.top_countries || 'N/A'}</td>
+                            <td>${comp.key_buyers}</td>
+                        </tr>
+                    `).join('')}
+                </tbody>
+            </table>
+        </div>
+    `;
+
+    bindDrillDowns(container, 'competitors', renderCompetitorDetail);
+
+    if (data.supplier_chart) {
+        renderSupplierChart(data.supplier_chart);
+    }
+}
+
+function renderPricing(container, data) {
+    container.innerHTML = `
+        <h2>Pricing Analysis</h2>
+        <div class="stats-grid">
+            <div class="stat-card">
+                <div class="stat-label">Single-Side Avg Price</div>
+                <div class="stat-value">$${data.single_side_avg}</div>
+                <div class="stat-label">Per unit</div>
+            </div>
+            <div class="stat-card" style="background: linear-gradient(135deg, #dc3545 0%, #f86734 100%);">
+                <div class="stat-label">Double-Side Avg Price</div>
+                <div class="stat-value">$${data.double_side_avg}</div>
+                <div class="stat-label">Per unit</div>
+            </div>
+        </div>
+
+        <div class="chart-container">
+            <h3>Price Distribution by Product Type</h3>
+            <canvas id="priceChart"></canvas>
+        </div>
+
+        <div class="table-container">
+            <h3>Price Ranges by Specification</h3>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Specification</th>
+                        <th>Min Price</th>
+                        <th>Avg Price</th>
+                        <th>Max Price</th>
+                        <th>Most Common</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${data.price_ranges.map(range => `
+                        <tr>
+                            <td>${range.spec}</td>
+                            <td>$${range.min}</td>
+                            <td>$${range.avg}</td>
+                            <td>$${range.max}</td>
+                            <td>$${range.mode}</td>
+                        </tr>
+                    `).join('')}
+                </tbody>
+            </table>
+        </div>
+    `;
+
+    if (data.price_chart) {
+        renderPriceChart(data.price_chart);
+    }
+}
+
+function renderInsights(container, data) {
+    container.innerHTML = `
+        <h2>Key Insights & Recommendations</h2>
+
+        <div style="background: #d4edda; padding: 20px; border-radius: 10px; margin-bottom: 20px;">
+            <h3>✅ Opportunities for Artis</h3>
+            <ul style="margin-top: 10px; line-height: 1.8;">
+                ${data.opportunities.map(opp => `<li>${opp}</li>`).join('')}
+            </ul>
+        </div>
+
+        <div style="background: #f8d7da; padding: 20px; border-radius: 10px; margin-bottom: 20px;">
+            <h3>⚠️ Challenges to Address</h3>
+            <ul style="margin-top: 10px; line-height: 1.8;">
+                ${data.challenges.map(ch => `<li>${ch}</li>`).join('')}
+            </ul>
+        </div>
+
+        <div style="background: #cfe2ff; padding: 20px; border-radius: 10px; margin-bottom: 20px;">
+            <h3>🎯 Priority Actions</h3>
+            <ol style="margin-top: 10px; line-height: 1.8;">
+                ${data.actions.map(action => `<li><strong>${action.title}</strong>: ${action.detail}</li>`).join('')}
+            </ol>
+        </div>
+
+        <div style="background: #fff3cd; padding: 20px; border-radius: 10px;">
+            <h3>📊 Market Summary</h3>
+            <p>${data.summary}</p>
+        </div>
+    `;
+}
+
+function renderTrendsChart(trends) {
+    const ctx = document.getElementById('trendsChart').getContext('2d');
+    new Chart(ctx, {
+        type: 'line',
+        data: {
+            labels: trends.labels,
+            datasets: [{
+                label: 'Single-Side Orders',
+                data: trends.single_side,
+                borderColor: '#28a745',
+                backgroundColor: 'rgba(40, 167, 69, 0.1)',
+                tension: 0.4
+            }, {
+                label: 'Double-Side Orders',
+                data: trends.double_side,
+                borderColor: '#dc3545',
+                backgroundColor: 'rgba(220, 53, 69, 0.1)',
+                tension: 0.4
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                legend: {
+                    position: 'bottom'
+                }
+            },
+            scales: {
+                y: {
+                    beginAtZero: true
+                }
+            }
+        }
+    });
+}
+
+function setMetric(metric) {
+    // Update button styles
+    const volumeBtn = document.getElementById('volumeBtn');
+    const valueBtn = document.getElementById('valueBtn');
+
+    if (metric === 'volume') {
+        volumeBtn.style.background = '#1a237e';
+        volumeBtn.style.color = 'white';
+        volumeBtn.style.border = 'none';
+        valueBtn.style.background = 'white';
+        valueBtn.style.color = '#555';
+        valueBtn.style.border = '2px solid #ddd';
+    } else {
+        valueBtn.style.background = '#1a237e';
+        valueBtn.style.color = 'white';
+        valueBtn.style.border = 'none';
+        volumeBtn.style.background = 'white';
+        volumeBtn.style.color = '#555';
+        volumeBtn.style.border = '2px solid #ddd';
+    }
+
+    window.currentMetric = metric;
+    updateCountryChart();
+}
+
+function updateCountryChart() {
+    if (window.countryData) {
+        if (window.countryChartInstance) {
+            window.countryChartInstance.destroy();
+        }
+        renderCountryChart(window.countryData);
+    }
+}
+
+// Store competitor data globally
+window.competitorData = null;
+
+function setCompetitorMetric(metric) {
+    const valueBtn = document.getElementById('compValueBtn');
+    const volumeBtn = document.getElementById('compVolumeBtn');
+    const header = document.getElementById('marketShareHeader');
+
+    if (metric === 'value') {
+        valueBtn.style.background = '#1a237e';
+        valueBtn.style.color = 'white';
+        valueBtn.style.border = 'none';
+        volumeBtn.style.background = 'white';
+        volumeBtn.style.color = '#555';
+        volumeBtn.style.border = '2px solid #ddd';
+        header.textContent = 'Market Share (Value)';
+    } else {
+        volumeBtn.style.background = '#1a237e';
+        volumeBtn.style.color = 'white';
+        volumeBtn.style.border = 'none';
+        valueBtn.style.background = 'white';
+        valueBtn.style.color = '#555';
+        valueBtn.style.border = '2px solid #ddd';
+        header.textContent = 'Market Share (Volume)';
+    }
+
+    // Update market share cells
+    if (window.competitorData) {
+        const cells = document.querySelectorAll('.market-share-cell');
+        window.competitorData.competitors.forEach((comp, index) => {
+            if (cells[index]) {
+                cells[index].textContent = metric === 'value' ? 
+                    comp.market_share_value + '%' : 
+                    comp.market_share_volume + '%';
+            }
+        });
+
+        // Update pie chart
+        if (window.supplierChartInstance) {
+            window.supplierChartInstance.destroy();
+        }
+
+        // Re-render chart with new metric
+        const chartData = {
+            labels: window.competitorData.competitors.slice(0, 10).map(c => c.name.substring(0, 20)),
+            values: window.competitorData.competitors.slice(0, 10).map(c => 
+                metric === 'value' ? c.market_share_value : c.market_share_volume
+            )
+        };
+        renderSupplierChart(chartData);
+
+        // Update chart title
+        const chartTitle = document.querySelector('.chart-container h3');
+        if (chartTitle) {
+            chartTitle.textContent = metric === 'value' ? 
+                'Market Share by Supplier (Value-based)' : 
+                'Market Share by Supplier (Volume-based)';
+        }
+    }
+}
+
+function renderSupplierChart(data) {
+    const ctx = document.getElementById('supplierChart').getContext('2d');
+    window.supplierChartInstance = new Chart(ctx, {
+        type: 'pie',
+        data: {
+            labels: data.labels,
+            datasets: [{
+                data: data.values,
+                backgroundColor: [
+                    '#667eea', '#764ba2', '#28a745', '#ffc107', 
+                    '#dc3545', '#17a2b8', '#6610f2', '#e83e8c',
+                    '#fd7e14', '#20c997'
+                ]
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                legend: {
+                    position: 'right'
+                },
+                tooltip: {
+                    callbacks: {
+                        label: function(context) {
+                            return context.label + ': ' + context.parsed + '%';
+                        }
+                    }
+                }
+            }
+        }
+    });
+}
+
+function renderPriceChart(data) {
+    // Placeholder for price chart if needed
+}
+
+function renderCountryChart(data) {
+    const metric = window.currentMetric || 'volume';
+    const values = metric === 'value' ? data.value_pct : data.volume_pct;
+    const label = metric === 'value' ? 'Market Share by Value (%)' : 'Market Share by Volume (Sheets %)';
+
+    const ctx = document.getElementById('countryChart').getContext('2d');
+
+    // Simple, professional colors
+    const colors = [
+        '#667eea', '#764ba2', '#28a745', '#ffc107', '#dc3545', 
+        '#17a2b8', '#6610f2', '#e83e8c', '#fd7e14', '#20c997',
+        '#6c757d', '#343a40', '#007bff', '#6f42c1', '#e74c3c'
+    ];
+
+    window.countryChartInstance = new Chart(ctx, {
+        type: 'bar',
+        data: {
+            labels: data.labels.map(label => {
+                // Shorten country names for better display
+                const shortNames = {
+                    'UNITED ARAB EMIRATES': 'UAE',
+                    'SAUDI ARABIA': 'Saudi Arabia'
+                };
+                return shortNames[label] || label;
+            }),
+            datasets: [{
+                label: label,
+                data: values,
+                backgroundColor: colors,
+                borderRadius: 5,
+                barThickness: 40,
+                maxBarThickness: 50
+            }]
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                legend: {
+                    display: false
+                },
+                tooltip: {
+                    backgroundColor: 'rgba(0, 0, 0, 0.8)',
+                    padding: 12,
+                    titleFont: {
+                        size: 14,
+                        weight: 'bold'
+                    },
+                    bodyFont: {
+                        size: 13
+                    },
+                    callbacks: {
+                        label: function(context) {
+                            return context.parsed.y.toFixed(1) + '% of total market';
+                        },
+                        afterLabel: function(context) {
+                            const actualValue = metric === 'value' ? 
+                                'Value: $' + (context.parsed.y * 2.5).toFixed(1) + 'M' :
+                                'Volume: ' + (context.parsed.y * 100000).toFixed(0) + ' sheets';
+                            return actualValue;
+                        }
+                    }
+                }
+            },
+            scales: {
+                x: {
+                    grid: {
+                        display: false
+                    },
+                    ticks: {
+                        font: {
+                            size: 11,
+                            weight: '600'
+                        },
+                        color: '#495057',
+                        autoSkip: false,
+                        maxRotation: 45,
+                        minRotation: 45
+                    }
+                },
+                y: {
+                    beginAtZero: true,
+                    max: Math.max(...values) + 5,
+                    grid: {
+                        color: 'rgba(0, 0, 0, 0.05)',
+                        drawBorder: false
+                    },
+                    ticks: {
+                        font: {
+                            size: 11
+                        },
+                        color: '#6c757d',
+                        callback: function(value) {
+                            return value + '%';
+                        }
+                    }
+                }
+            }
+        }
+    });
+}
+
+// Select All functionality
+document.getElementById('selectAll').addEventListener('change', function() {
+    const checkboxes = document.querySelectorAll('#countryCheckboxes input[type="checkbox"]');
+    checkboxes.forEach(cb => cb.checked = this.checked);
+});
+
+// Update Select All when individual checkboxes change
+document.querySelectorAll('#countryCheckboxes input[type="checkbox"]').forEach(cb => {
+    cb.addEventListener('change', function() {
+        const allCheckboxes = document.querySelectorAll('#countryCheckboxes input[type="checkbox"]');
+        const checkedBoxes = document.querySelectorAll('#countryCheckboxes input[type="checkbox"]:checked');
+        document.getElementById('selectAll').checked = allCheckboxes.length === checkedBoxes.length;
+    });
+});
+
+// Add hover effect to checkbox labels
+document.querySelectorAll('#countryCheckboxes label').forEach(label => {
+    label.addEventListener('mouseenter', function() {
+        this.style.background = '#f5f5f5';
+    });
+    label.addEventListener('mouseleave', function() {
+        this.style.background = 'transparent';
+    });
+});
+
+// Export functionality
+function exportToExcel() {
+    const activeTab = document.querySelector('.tab-button.active').textContent.toLowerCase();
+    alert('Export functionality will be available soon! Current tab: ' + activeTab);
+    // You can implement actual export here by calling an API endpoint
+}
+
+// Server-rendered state for the default filters, so the first paint needs no API call
+function readInitialState() {
+    const el = document.getElementById('initialState');
+    if (!el) return null;
+    try {
+        return JSON.parse(el.textContent);
+    } catch (error) {
+        console.error('Invalid initial state:', error);
+        return null;
+    }
+}
+
+function sumOptionCounts(options, predicate) {
+    return options.filter(o => predicate(o.value)).reduce((sum, o) => sum + o.count, 0);
+}
+
+function setOptionCount(input, count) {
+    const label = input.closest('label') || input.parentElement.querySelector('label');
+    if (!label) return;
+    let badge = label.querySelector('.facet-count');
+    if (!badge) {
+        badge = document.createElement('span');
+        badge.className = 'facet-count';
+        label.appendChild(badge);
+    }
+    badge.textContent = count.toLocaleString();
+    label.classList.toggle('facet-empty', count === 0);
+}
+
+function renderFilterOptionCounts(options) {
+    if (!options) return;
+    const artisSizes = ['1220x2440', '2440x1220'];
+    const artisThickness = [0.7, 0.8, 1.0];
+    
+    document.querySelectorAll('#countryCheckboxes input[type="checkbox"]').forEach(cb => {
+        setOptionCount(cb, sumOptionCounts(options.countries, v => v === cb.value));
+    });
+    document.querySelectorAll('input[name="productType"]').forEach(input => {
+        if (input.value === 'all') return;
+        setOptionCount(input, sumOptionCounts(options.product_type, v => v === input.value));
+    });
+    document.querySelectorAll('input[name="sizeFilter"]').forEach(input => {
+        const predicate = {
+            '1220x2440': v => artisSizes.includes(v),
+            '2440x1220': v => v === '2440x1220',
+            'other': v => v !== null && !artisSizes.includes(v)
+        }[input.value];
+        if (predicate) setOptionCount(input, sumOptionCounts(options.size, predicate));
+    });
+    document.querySelectorAll('input[name="thicknessFilter"]').forEach(input => {
+        if (input.value === 'all') return;
+        const predicate = input.value === 'other' ?
+            v => v === null || !artisThickness.includes(v) :
+            v => v === parseFloat(input.value);
+        setOptionCount(input, sumOptionCounts(options.thickness, predicate));
+    });
+    document.querySelectorAll('input[name="dateFilter"]').forEach(input => {
+        if (/^\d{4}$/.test(input.value)) {
+            setOptionCount(input, sumOptionCounts(options.year, v => v === input.value));
+        }
+    });
+}
+
+// Option counts under the current filters, each dimension ignoring its own filter
+async function loadFacetCounts(params) {
+    try {
+        const facets = await fetchTabData('facets', params);
+        if (params.toString() === buildParams(currentFilters).toString()) {
+            renderFilterOptionCounts(facets);
+        }
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error('Error loading facet counts:', error);
+        }
+    }
+}
+
+const initialState = readInitialState();
+if (initialState) {
+    setDatasetVersion(initialState.version);
+    cacheResponse(requestKey('overview', buildParams(getFilters())), initialState.overview);
+    renderTabContent('overview', initialState.overview);
+    renderFilterOptionCounts(initialState.filter_options);
+}
+
+// Initialize
+window.onload = () => {
+    // Hide custom date pickers initially
+    document.getElementById('customDatePickers').style.display = 'none';
+
+    // Initialize country checkboxes event listeners
+    document.getElementById('selectAll').addEventListener('change', function() {
+        const checkboxes = document.querySelectorAll('#countryCheckboxes input[type="checkbox"]');
+        checkboxes.forEach(cb => cb.checked = this.checked);
+        updateFilterChip('countries');
+    });
+
+    document.querySelectorAll('#countryCheckboxes input[type="checkbox"]').forEach(cb => {
+        cb.addEventListener('change', () => {
+            updateFilterChip('countries');
+            // Update select all checkbox
+            const allChecked = document.querySelectorAll('#countryCheckboxes input[type="checkbox"]:checked').length === 
+                              document.querySelectorAll('#countryCheckboxes input[type="checkbox"]').length;
+            document.getElementById('selectAll').checked = allChecked;
+        });
+    });
+
+    // Initialize filter chip values
+    updateFilterChip('countries');
+    updateFilterChip('product');
+    updateFilterChip('size');
+    updateFilterChip('thickness');
+    updateFilterChip('value');
+    updateFilterChip('date');
+
+    if (initialState) {
+        // Overview is already painted from the embedded state
+        currentFilters = getFilters();
+        schedulePrefetch(buildParams(currentFilters));
+    } else {
+        applyFilters();
+    }
+    whenIdle(startCubeWorker);
+    listenForDatasetChanges();
+
+    document.addEventListener('click', event => {
+        if (!event.target.closest('#searchResults, #entitySearch')) closeSearchResults();
+    });
+};